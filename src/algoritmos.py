@@ -1,10 +1,18 @@
+import os
+import sys
 import heapq
+import threading
+import time
 from queue import Queue
+import numpy as np
+from espacial import IndiceKD
+from problema import MODO_MICRO, TEMPO_OPERACAO
 
 
-def heuristica_taxi(estado, cidade):
+def _estimar_custo_restante(estado, estimativa):
     """
-    Estima o custo restante até ao objetivo.
+    Estima o custo restante até ao objetivo, usando 'estimativa(u, v)' como
+    distância entre dois nós.
     1. Soma distância de cada passageiro pendente (Origem -> Destino).
     2. Soma distância do táxi livre mais próximo até ao passageiro.
     """
@@ -12,13 +20,13 @@ def heuristica_taxi(estado, cidade):
     
     # 1. Pedidos pendentes
     for pedido in estado.pedidos_pendentes:
-        dist_viagem = cidade.get_heuristic(pedido.origem, pedido.destino)
+        dist_viagem = estimativa(pedido.origem, pedido.destino)
         custo_estimado += dist_viagem
         
         min_dist_taxi = float('inf')
         for v in estado.veiculos:
             if not v.ocupado:
-                d = cidade.get_heuristic(v.local, pedido.origem)
+                d = estimativa(v.local, pedido.origem)
                 if d < min_dist_taxi:
                     min_dist_taxi = d
         
@@ -29,11 +37,370 @@ def heuristica_taxi(estado, cidade):
     for v in estado.veiculos:
         if v.ocupado and v.passageiros_a_bordo:
             pedido = v.passageiros_a_bordo[0]
-            dist_restante = cidade.get_heuristic(v.local, pedido.destino)
+            dist_restante = estimativa(v.local, pedido.destino)
             custo_estimado += dist_restante
 
     return custo_estimado
 
+def _estimar_custo_restante_lote(estados, cidade, limites):
+    """
+    _estimar_custo_restante para vários estados de uma vez (ex: os sucessores
+    de uma expansão). 'limites(a, b)' recebe arrays de ids densos dos nós e
+    devolve a estimativa elemento a elemento. Devolve uma lista de floats.
+    """
+    indice = cidade.indexar()
+    num_veiculos = len(estados[0].veiculos)
+
+    # Veículos: (estados x veículos) com local, se está livre e destino a bordo (-1 = nenhum)
+    locais, livres, destinos = [], [], []
+    # Pedidos pendentes: uma coluna por pedido distinto no lote + máscara de quais estão em cada estado
+    colunas, origens, destinos_pedido = {}, [], []
+    linhas_pend, colunas_pend = [], []
+    for s, estado in enumerate(estados):
+        for v in estado.veiculos:
+            locais.append(indice[v.local])
+            livres.append(not v.ocupado)
+            destinos.append(indice[v.passageiros_a_bordo[0].destino] if v.ocupado and v.passageiros_a_bordo else -1)
+        for p in estado.pedidos_pendentes:
+            c = colunas.get(p.id)
+            if c is None:
+                c = colunas[p.id] = len(origens)
+                origens.append(indice[p.origem])
+                destinos_pedido.append(indice[p.destino])
+            linhas_pend.append(s)
+            colunas_pend.append(c)
+
+    forma = (len(estados), num_veiculos)
+    locais = np.array(locais, dtype=np.int64).reshape(forma)
+    livres = np.array(livres, dtype=bool).reshape(forma)
+    destinos = np.array(destinos, dtype=np.int64).reshape(forma)
+    total = np.zeros(len(estados))
+
+    # 1. Pedidos pendentes: viagem + táxi livre mais próximo
+    if origens:
+        origens = np.array(origens, dtype=np.int64)
+        pendente = np.zeros((len(estados), len(origens)), dtype=bool)
+        pendente[linhas_pend, colunas_pend] = True
+
+        viagem = limites(origens, np.array(destinos_pedido, dtype=np.int64))
+        aproximacao = limites(locais[:, :, None], origens[None, None, :])
+        aproximacao = np.where(livres[:, :, None], aproximacao, np.inf).min(axis=1)
+        aproximacao[~np.isfinite(aproximacao)] = 0.0
+        total += np.where(pendente, viagem[None, :] + aproximacao, 0.0).sum(axis=1)
+
+    # 2. Pedidos a bordo
+    a_bordo = destinos >= 0
+    if a_bordo.any():
+        restante = limites(locais, np.where(a_bordo, destinos, locais))
+        total += np.where(a_bordo, restante, 0.0).sum(axis=1)
+
+    return total.tolist()
+
+def _estimar_custo_restante_kd(estado, cidade):
+    """
+    _estimar_custo_restante em linha reta para frotas grandes: o táxi livre mais
+    próximo de cada pedido vem de uma KD-tree sobre os táxis livres, O(P log V)
+    em vez de O(P x V).
+    """
+    total = 0.0
+    pendentes = estado.pedidos_pendentes
+    if pendentes:
+        origens = cidade.indices([p.origem for p in pendentes])
+        destinos = cidade.indices([p.destino for p in pendentes])
+        total += cidade.distancias_euclidianas(origens, destinos).sum()
+        livres = [v.local for v in estado.veiculos if not v.ocupado]
+        if livres:
+            arvore = IndiceKD(livres, cidade.coords[cidade.indices(livres)])
+            total += arvore.distancias_minimas(cidade.coords[origens]).sum() / cidade.ESCALA_COORDENADAS
+
+    a_bordo = [v for v in estado.veiculos if v.ocupado and v.passageiros_a_bordo]
+    if a_bordo:
+        locais = cidade.indices([v.local for v in a_bordo])
+        destinos = cidade.indices([v.passageiros_a_bordo[0].destino for v in a_bordo])
+        total += cidade.distancias_euclidianas(locais, destinos).sum()
+    return float(total)
+
+def _custos_unitarios(estado, cidade):
+    """
+    Custo mínimo por km de cada veículo (nas unidades de calcular_custo_acao,
+    com o tempo no menor min/km da rede) e o custo fixo de recolher ou entregar.
+    """
+    ritmo = cidade.pesos_arestas().ritmo_minimo()
+    por_tipo = {}
+    por_km = []
+    for v in estado.veiculos:
+        custo = por_tipo.get(v.tipo)
+        if custo is None: custo = por_tipo[v.tipo] = estado.calcular_custo_acao(v, 1.0, ritmo)[0]
+        por_km.append(custo)
+    operacao = estado.calcular_custo_acao(estado.veiculos[0], 0, TEMPO_OPERACAO)[0] if estado.veiculos else 0.0
+    return por_km, operacao
+
+def _limite_custo_restante(estado, cidade, limite):
+    """
+    Limite inferior do custo que falta até ao objetivo, nas unidades de
+    calcular_custo_acao; 'limite(u, v)' é um limite inferior dos km de u a v.
+    1. Cada pedido pendente: a viagem origem -> destino ao custo por km mais
+       barato da frota, mais recolher e entregar.
+    2. Cada passageiro a bordo: o resto da viagem ao custo do táxi, mais entregar.
+    3. Km em vazio: o maior, entre os pendentes, da distância até à origem a
+       partir do ponto mais próximo onde um táxi pode ficar livre (táxi livre,
+       destino de quem vai a bordo ou destino de outro pendente).
+    Somar (3) por pedido também seria admissível, mas deixava de ser consistente
+    e o A* não reabre estados fechados.
+    """
+    por_km, operacao = _custos_unitarios(estado, cidade)
+    minimo_km = min(por_km, default=0.0)
+    total = 0.0
+    fontes = []
+    for v, custo_km in zip(estado.veiculos, por_km):
+        if v.ocupado and v.passageiros_a_bordo:
+            destino = v.passageiros_a_bordo[0].destino
+            total += custo_km * limite(v.local, destino) + operacao
+            fontes.append(destino)
+        elif not v.ocupado:
+            fontes.append(v.local)
+
+    pendentes = estado.pedidos_pendentes
+    vazio = 0.0
+    for i, pedido in enumerate(pendentes):
+        total += minimo_km * limite(pedido.origem, pedido.destino) + 2 * operacao
+        aproximacao = min((limite(f, pedido.origem) for f in fontes), default=float('inf'))
+        for j, outro in enumerate(pendentes):
+            if j != i: aproximacao = min(aproximacao, limite(outro.destino, pedido.origem))
+        if aproximacao != float('inf') and aproximacao > vazio: vazio = aproximacao
+
+    return total + minimo_km * vazio
+
+def _limite_custo_restante_lote(estados, cidade, limites):
+    """_limite_custo_restante para vários estados de uma vez ('limites' sobre arrays de ids densos)."""
+    indice = cidade.indexar()
+    num_veiculos = len(estados[0].veiculos)
+
+    # Veículos: (estados x veículos) com local, custo por km, se está livre e destino a bordo (-1 = nenhum)
+    locais, livres, destinos, por_km, operacao = [], [], [], [], 0.0
+    colunas, origens, destinos_pedido = {}, [], []
+    linhas_pend, colunas_pend = [], []
+    for s, estado in enumerate(estados):
+        custos, operacao = _custos_unitarios(estado, cidade)
+        por_km.extend(custos)
+        for v in estado.veiculos:
+            locais.append(indice[v.local])
+            livres.append(not v.ocupado)
+            destinos.append(indice[v.passageiros_a_bordo[0].destino] if v.ocupado and v.passageiros_a_bordo else -1)
+        for p in estado.pedidos_pendentes:
+            c = colunas.get(p.id)
+            if c is None:
+                c = colunas[p.id] = len(origens)
+                origens.append(indice[p.origem])
+                destinos_pedido.append(indice[p.destino])
+            linhas_pend.append(s)
+            colunas_pend.append(c)
+
+    forma = (len(estados), num_veiculos)
+    locais = np.array(locais, dtype=np.int64).reshape(forma)
+    livres = np.array(livres, dtype=bool).reshape(forma)
+    destinos = np.array(destinos, dtype=np.int64).reshape(forma)
+    por_km = np.array(por_km, dtype=float).reshape(forma)
+    minimo_km = por_km.min(axis=1) if num_veiculos else np.zeros(len(estados))
+    total = np.zeros(len(estados))
+
+    # 2. Passageiros a bordo
+    a_bordo = destinos >= 0
+    if a_bordo.any():
+        restante = limites(locais, np.where(a_bordo, destinos, locais))
+        total += np.where(a_bordo, por_km * restante + operacao, 0.0).sum(axis=1)
+
+    # 1. e 3. Pedidos pendentes: viagem e o maior troço em vazio
+    if origens:
+        origens = np.array(origens, dtype=np.int64)
+        destinos_pedido = np.array(destinos_pedido, dtype=np.int64)
+        pendente = np.zeros((len(estados), len(origens)), dtype=bool)
+        pendente[linhas_pend, colunas_pend] = True
+
+        viagem = limites(origens, destinos_pedido)
+        total += np.where(pendente, minimo_km[:, None] * viagem[None, :] + 2 * operacao, 0.0).sum(axis=1)
+
+        fontes = np.where(livres, locais, destinos)
+        aproximacao = limites(fontes[:, :, None], origens[None, None, :])
+        aproximacao = np.where((livres | a_bordo)[:, :, None], aproximacao, np.inf).min(axis=1)
+        # Destinos de outros pendentes do mesmo estado; por blocos de estados para limitar o tensor
+        entre_pedidos = limites(destinos_pedido[:, None], origens[None, :])
+        np.fill_diagonal(entre_pedidos, np.inf)
+        passo = max(1, MAXIMO_LOTE // (len(origens) ** 2))
+        for inicio in range(0, len(estados), passo):
+            bloco = slice(inicio, inicio + passo)
+            aproximacao[bloco] = np.minimum(aproximacao[bloco], np.where(
+                pendente[bloco, :, None], entre_pedidos[None, :, :], np.inf).min(axis=1))
+        aproximacao = np.where(pendente & np.isfinite(aproximacao), aproximacao, 0.0)
+        total += minimo_km * aproximacao.max(axis=1)
+
+    return total.tolist()
+
+# A partir deste tamanho de frota a heuristica_taxi usa a KD-tree
+LIMIAR_KD = 32
+
+
+def heuristica_taxi(estado, cidade):
+    """
+    Heurística com distância em linha reta (Euclidiana). Soma km a custos e conta
+    a aproximação uma vez por pedido: guia bem a pesquisa, mas não é admissível.
+    """
+    if len(estado.veiculos) >= LIMIAR_KD:
+        return _estimar_custo_restante_kd(estado, cidade)
+    return _estimar_custo_restante(estado, cidade.get_heuristic)
+
+def heuristica_alt(estado, cidade):
+    """
+    Heurística admissível e consistente: _limite_custo_restante com os limites
+    ALT (landmarks + desigualdade triangular), bem mais apertados que a linha
+    reta em ruas de sentido único. Com ela o A* devolve o plano ótimo.
+    """
+    return _limite_custo_restante(estado, cidade, cidade.get_heuristic_alt)
+
+# Versões vetorizadas das heurísticas (avaliam todos os sucessores de uma expansão)
+HEURISTICAS_LOTE = {
+    heuristica_taxi: lambda estados, cidade: _estimar_custo_restante_lote(estados, cidade, cidade.distancias_euclidianas),
+    heuristica_alt: lambda estados, cidade: _limite_custo_restante_lote(estados, cidade, cidade.limites_alt),
+}
+# Heurísticas que nunca sobrestimam o custo restante (o A* anytime só garante limites com estas)
+HEURISTICAS_ADMISSIVEIS = frozenset({heuristica_alt})
+
+
+# Abaixo deste nº de pares (estados x veículos x pedidos) o custo fixo do NumPy não compensa;
+# acima de MAXIMO_LOTE o tensor fica grande demais e avalia-se estado a estado
+LIMIAR_LOTE = 256
+MAXIMO_LOTE = 4_000_000
+
+
+def avaliar_heuristica(funcao_heuristica, estados, cidade):
+    """Lista com h de cada estado; usa a versão em lote quando existe e compensa."""
+    if isinstance(funcao_heuristica, _HeuristicaCronometrada):
+        return funcao_heuristica.lote(estados, cidade)
+    lote = HEURISTICAS_LOTE.get(funcao_heuristica)
+    if lote is not None and estados:
+        e = estados[0]
+        if LIMIAR_LOTE <= len(estados) * len(e.veiculos) * (len(e.pedidos_pendentes) + 1) <= MAXIMO_LOTE:
+            return lote(estados, cidade)
+    return [funcao_heuristica(e, cidade) for e in estados]
+
+# =============================================================================
+# Estatísticas das pesquisas
+# =============================================================================
+# Chaves do dict 'estatisticas' que se somam / em que fica o máximo ao juntar pesquisas
+ESTATISTICAS_SOMA = ('expansoes', 'gerados', 'duplicados', 'chamadas_heuristica', 'tempo_heuristica',
+                     'tempo_sucessores', 'tempo')
+ESTATISTICAS_MAXIMO = ('pico_abertos', 'pico_fechados', 'pico_nos', 'pico_memoria_mb')
+AMOSTRA_MEMORIA = 256  # expansões entre leituras do RSS
+
+
+def memoria_rss_mb():
+    """RSS atual do processo (MB), via /proc; sem /proc, o pico do getrusage."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return 0.0
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return pico / 2 ** 20 if sys.platform == 'darwin' else pico / 1024
+
+
+def agregar_estatisticas(total, estatisticas):
+    """Junta o dict 'estatisticas' de uma pesquisa em 'total' (somas e máximos)."""
+    for chave in ESTATISTICAS_SOMA:
+        if chave in estatisticas: total[chave] = total.get(chave, 0) + estatisticas[chave]
+    for chave in ESTATISTICAS_MAXIMO:
+        if chave in estatisticas: total[chave] = max(total.get(chave, 0), estatisticas[chave])
+    total['pesquisas'] = total.get('pesquisas', 0) + estatisticas.get('pesquisas', 1)
+    return total
+
+
+class _HeuristicaCronometrada:
+    """Heurística que soma o tempo e o nº de estados avaliados no _Medidor."""
+    __slots__ = ('funcao', 'medidor')
+
+    def __init__(self, funcao, medidor):
+        self.funcao = funcao
+        self.medidor = medidor
+
+    def __call__(self, estado, cidade):
+        t = time.perf_counter()
+        h = self.funcao(estado, cidade)
+        self.medidor.tempo_heuristica += time.perf_counter() - t
+        self.medidor.chamadas_heuristica += 1
+        return h
+
+    def lote(self, estados, cidade):
+        t = time.perf_counter()
+        hs = avaliar_heuristica(self.funcao, estados, cidade)
+        self.medidor.tempo_heuristica += time.perf_counter() - t
+        self.medidor.chamadas_heuristica += len(estados)
+        return hs
+
+
+class _Medidor:
+    """
+    Recolhe as estatísticas de uma pesquisa. Os planeadores só o criam quando
+    recebem o dict 'estatisticas'; sem ele não há medições (um só teste por
+    expansão).
+    """
+
+    def __init__(self):
+        self.t0 = time.perf_counter()
+        self.expansoes = 0
+        self.gerados = 0
+        self.chamadas_heuristica = 0
+        self.tempo_heuristica = 0.0
+        self.tempo_sucessores = 0.0
+        self.pico_abertos = 0
+        self.pico_fechados = 0
+        self.memoria_base = self.pico_memoria = memoria_rss_mb()
+
+    def cronometrar(self, funcao_heuristica):
+        return _HeuristicaCronometrada(funcao_heuristica, self)
+
+    def expandir(self, estado, cidade, modo, abertos=0, fechados=0):
+        """gera_sucessores cronometrado; regista o tamanho da fronteira e do fechado nesse momento."""
+        if abertos > self.pico_abertos: self.pico_abertos = abertos
+        if fechados > self.pico_fechados: self.pico_fechados = fechados
+        self.expansoes += 1
+        if self.expansoes % AMOSTRA_MEMORIA == 0: self._amostrar_memoria()
+        t = time.perf_counter()
+        filhos = estado.gera_sucessores(cidade, modo)
+        self.tempo_sucessores += time.perf_counter() - t
+        self.gerados += len(filhos)
+        return filhos
+
+    def _amostrar_memoria(self):
+        self.pico_memoria = max(self.pico_memoria, memoria_rss_mb())
+
+    def publicar(self, estatisticas, duplicados, **extras):
+        """
+        Escreve no dict: expansoes, gerados, duplicados (sucessores descartados
+        sem entrar na fronteira: já vistos ou podados), pico_abertos / pico_fechados, pico_nos,
+        chamadas_heuristica, tempo_heuristica, tempo_sucessores, pico_memoria_mb
+        (crescimento do RSS) e tempo; 'extras' acrescenta ou substitui chaves.
+        """
+        self._amostrar_memoria()
+        estatisticas.update({
+            'expansoes': self.expansoes,
+            'gerados': self.gerados,
+            'duplicados': duplicados,
+            'pico_abertos': self.pico_abertos,
+            'pico_fechados': self.pico_fechados,
+            'pico_nos': self.pico_abertos + self.pico_fechados,
+            'chamadas_heuristica': self.chamadas_heuristica,
+            'tempo_heuristica': self.tempo_heuristica,
+            'tempo_sucessores': self.tempo_sucessores,
+            'pico_memoria_mb': self.pico_memoria - self.memoria_base,
+            'tempo': time.perf_counter() - self.t0,
+        })
+        estatisticas.update(extras)
+
+
 def reconstruir_caminho(estado_final):
     """Percorre os 'pais' de trás para a frente."""
     caminho = []
@@ -46,36 +413,48 @@ def reconstruir_caminho(estado_final):
 # =============================================================================
 # 1. PESQUISA EM LARGURA (BFS)
 # =============================================================================
-def bfs(estado_inicial, cidade):
+def bfs(estado_inicial, cidade, modo=MODO_MICRO, parar=None, estatisticas=None):
     # BFS usa Queue (FIFO), não precisa de Heap
+    medidor = _Medidor() if estatisticas is not None else None
     visited = set()
     fila = Queue()
 
     fila.put(estado_inicial)
     visited.add(estado_inicial)
+    resultado = None
 
     while not fila.empty():
+        if parar is not None and parar.is_set(): break
         estado_atual = fila.get()
 
         if estado_atual.is_objetivo():
-            return reconstruir_caminho(estado_atual), estado_atual.custo_acumulado
+            resultado = estado_atual
+            break
 
-        for filho in estado_atual.gera_sucessores(cidade):
+        filhos = estado_atual.gera_sucessores(cidade, modo) if medidor is None else \
+            medidor.expandir(estado_atual, cidade, modo, fila.qsize(), len(visited))
+        for filho in filhos:
             filho.pai = estado_atual
             if filho not in visited:
                 fila.put(filho)
                 visited.add(filho)
 
-    return None
+    if medidor is not None: medidor.publicar(estatisticas, medidor.gerados - (len(visited) - 1))
+    if resultado is None: return None
+    return reconstruir_caminho(resultado), resultado.custo_acumulado
 
 # =============================================================================
 # 2. PESQUISA EM PROFUNDIDADE (DFS)
 # =============================================================================
-def dfs(estado_inicial, cidade):
+def dfs(estado_inicial, cidade, modo=MODO_MICRO, parar=None, estatisticas=None):
     """
     Versão iterativa do DFS usando uma pilha (LIFO).
     Evita o RecursionError do Python em mapas grandes.
+    'modo' escolhe os sucessores: MODO_MICRO (aresta a aresta) ou MODO_MACRO.
+    'parar' (opcional) é um token com is_set(); se ativado, a pesquisa desiste.
+    'estatisticas' (dict opcional) recebe as medições da pesquisa (ver _Medidor.publicar).
     """
+    medidor = _Medidor() if estatisticas is not None else None
     visitados = set()
     # Em Python, uma lista funciona como uma pilha se usarmos append() e pop()
     pilha = [] 
@@ -85,16 +464,20 @@ def dfs(estado_inicial, cidade):
     # Dicionário para acesso rápido aos visitados para evitar ciclos
     # Guardamos o hash para poupar memória, ou o próprio objeto se o __eq__ for robusto
     visitados.add(estado_inicial)
+    resultado = None
 
     while pilha:
+        if parar is not None and parar.is_set(): break
         # Pop do último elemento (LIFO - Last In, First Out)
         estado_atual = pilha.pop()
 
         if estado_atual.is_objetivo():
-            return reconstruir_caminho(estado_atual), estado_atual.custo_acumulado
+            resultado = estado_atual
+            break
 
         # Gerar sucessores
-        sucessores = estado_atual.gera_sucessores(cidade)
+        sucessores = estado_atual.gera_sucessores(cidade, modo) if medidor is None else \
+            medidor.expandir(estado_atual, cidade, modo, len(pilha), len(visitados))
         
         for filho in sucessores:
             # Verificação de ciclo básica
@@ -103,16 +486,21 @@ def dfs(estado_inicial, cidade):
                 visitados.add(filho)
                 pilha.append(filho)
 
-    return None
+    if medidor is not None: medidor.publicar(estatisticas, medidor.gerados - (len(visitados) - 1))
+    if resultado is None: return None
+    return reconstruir_caminho(resultado), resultado.custo_acumulado
 
 # =============================================================================
 # 3. ALGORITMO A* (A-Star) - OTIMIZADO COM HEAPQ
 # =============================================================================
-def a_star(estado_inicial, cidade, funcao_heuristica):
+def a_star(estado_inicial, cidade, funcao_heuristica, modo=MODO_MICRO, parar=None, estatisticas=None):
     # A PriorityQueue (heap) ordena automaticamente pelo primeiro elemento do tuple
     # Guardamos: (f, contador, estado)
     # O 'contador' serve apenas para desempatar se f for igual, evitando erro de comparação
-    
+    # 'estatisticas' (dict opcional) recebe as medições da pesquisa (ver _Medidor.publicar)
+    medidor = _Medidor() if estatisticas is not None else None
+    if medidor is not None: funcao_heuristica = medidor.cronometrar(funcao_heuristica)
+
     count = 0
     open_list = [] # A nossa Heap
     
@@ -125,24 +513,30 @@ def a_star(estado_inicial, cidade, funcao_heuristica):
     heapq.heappush(open_list, (f, count, estado_inicial))
     
     # Dicionários para acesso rápido (O(1))
-    open_set_hashes = {estado_inicial} 
     closed_list = set()
     
     # Dicionário para guardar o melhor g encontrado até agora para cada estado
     # Isto é CRUCIAL para a performance do A*
     g_score = {estado_inicial: g}
+    resultado = None
 
     while open_list:
+        if parar is not None and parar.is_set(): break
         # Pop do estado com MENOR f (Instantâneo O(1))
         f_atual, _, n = heapq.heappop(open_list)
-        open_set_hashes.remove(n)
+        # Um caminho melhor para o mesmo estado entra de novo na heap; a entrada antiga é ignorada
+        if n in closed_list or n.custo_acumulado > g_score[n]: continue
 
         if n.is_objetivo():
-            return reconstruir_caminho(n), n.custo_acumulado
+            resultado = n
+            break
 
         closed_list.add(n)
 
-        for filho in n.gera_sucessores(cidade):
+        novos = []
+        filhos = n.gera_sucessores(cidade, modo) if medidor is None else \
+            medidor.expandir(n, cidade, modo, len(open_list), len(closed_list))
+        for filho in filhos:
             filho.pai = n
             
             # Se já fechámos este nó, ignorar
@@ -158,25 +552,31 @@ def a_star(estado_inicial, cidade, funcao_heuristica):
             
             # Se é um caminho melhor (ou novo), registamos
             g_score[filho] = new_g
-            h = funcao_heuristica(filho, cidade)
-            f = new_g + h
-            
-            # Adicionar à Heap se não estiver lá
-            if filho not in open_set_hashes:
-                count += 1
-                heapq.heappush(open_list, (f, count, filho))
-                open_set_hashes.add(filho)
+            novos.append(filho)
+
+        # h de todos os sucessores numa só chamada (vetorizada)
+        for filho, h in zip(novos, avaliar_heuristica(funcao_heuristica, novos, cidade)):
+            f = filho.custo_acumulado + h
+            count += 1
+            heapq.heappush(open_list, (f, count, filho))
 
-    return None
+    if medidor is not None: medidor.publicar(estatisticas, medidor.gerados - count)
+    if resultado is None: return None
+    return reconstruir_caminho(resultado), resultado.custo_acumulado
 
 # =============================================================================
 # 4. ALGORITMO GREEDY (GULOSO) - OTIMIZADO COM HEAPQ
 # =============================================================================
-def greedy(estado_inicial, cidade, funcao_heuristica):
+def greedy(estado_inicial, cidade, funcao_heuristica, modo=MODO_MICRO, parar=None, estatisticas=None):
     """
     Versão Otimizada com Heap.
     Ordena apenas pelo h(n).
+    'modo' escolhe os sucessores: MODO_MICRO (aresta a aresta) ou MODO_MACRO.
+    'parar' (opcional) é um token com is_set(); se ativado, a pesquisa desiste.
+    'estatisticas' (dict opcional) recebe as medições da pesquisa (ver _Medidor.publicar).
     """
+    medidor = _Medidor() if estatisticas is not None else None
+    if medidor is not None: funcao_heuristica = medidor.cronometrar(funcao_heuristica)
     count = 0
     open_list = []
     
@@ -186,29 +586,501 @@ def greedy(estado_inicial, cidade, funcao_heuristica):
     
     open_set_hashes = {estado_inicial}
     closed_list = set()
+    resultado = None
 
     while open_list:
+        if parar is not None and parar.is_set(): break
         # Pop do menor h
         h_atual, _, n = heapq.heappop(open_list)
         open_set_hashes.remove(n)
 
         if n.is_objetivo():
-            return reconstruir_caminho(n), n.custo_acumulado
+            resultado = n
+            break
 
         closed_list.add(n)
 
-        for filho in n.gera_sucessores(cidade):
+        novos = {}
+        filhos = n.gera_sucessores(cidade, modo) if medidor is None else \
+            medidor.expandir(n, cidade, modo, len(open_list), len(closed_list))
+        for filho in filhos:
             filho.pai = n
             
             if filho in closed_list:
                 continue
             
-            if filho not in open_set_hashes:
-                # Calcular h para ordenar
-                h = funcao_heuristica(filho, cidade)
+            if filho not in open_set_hashes and filho not in novos:
+                novos[filho] = None
+
+        # Calcular h para ordenar (todos os sucessores numa só chamada)
+        novos = list(novos)
+        for filho, h in zip(novos, avaliar_heuristica(funcao_heuristica, novos, cidade)):
+            count += 1
+            heapq.heappush(open_list, (h, count, filho))
+            open_set_hashes.add(filho)
+
+    if medidor is not None: medidor.publicar(estatisticas, medidor.gerados - count)
+    if resultado is None: return None
+    return reconstruir_caminho(resultado), resultado.custo_acumulado
+
+
+# =============================================================================
+# 5. A* ANYTIME (Weighted A* com fator decrescente, estilo ARA*)
+# =============================================================================
+class PlanoAnytime:
+    """
+    Recipiente partilhado (thread-safe) com o melhor plano completo encontrado
+    até agora pelo a_star_anytime, e o respetivo limite de sub-otimalidade
+    (custo <= epsilon * ótimo, assumindo heurística admissível).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.caminho = None
+        self.custo = float('inf')
+        self.epsilon = float('inf')
+        self.solucoes = 0
+
+    def publicar(self, caminho, custo, epsilon):
+        with self._lock:
+            self.caminho = caminho
+            self.custo = custo
+            self.epsilon = epsilon
+            self.solucoes += 1
+
+    def melhorar_limite(self, epsilon):
+        with self._lock:
+            self.epsilon = min(self.epsilon, epsilon)
+
+    def melhor(self):
+        """(caminho, custo, epsilon) do melhor plano, ou None se ainda não houver."""
+        with self._lock:
+            if self.caminho is None: return None
+            return self.caminho, self.custo, self.epsilon
+
+
+def _limite_epsilon(custo, nos, abertos, inconsistentes, h_de):
+    """
+    Limite de sub-otimalidade do ARA*: o ótimo nunca é inferior ao menor g + h
+    (h admissível, sem peso) entre os estados em OPEN e INCONS, nem ao incumbente
+    (os estados podados tinham g + h >= incumbente).
+    """
+    lb = custo
+    for estado in (abertos, inconsistentes):
+        for s in estado:
+            f = nos[s].custo_acumulado + h_de[s]
+            if f < lb: lb = f
+    if lb <= 0: return float('inf')
+    return max(1.0, custo / lb)
+
+
+def a_star_anytime(estado_inicial, cidade, funcao_heuristica, modo=MODO_MICRO, pesos=(5.0, 3.0, 2.0, 1.5, 1.0),
+                   plano=None, parar=None, estatisticas=None):
+    """
+    ARA*: A* pesado (f = g + w*h) para cada w em 'pesos', por ordem decrescente,
+    reaproveitando a pesquisa anterior. Um estado que melhora depois de fechado
+    vai para INCONS e volta a OPEN na iteração seguinte; os estados com
+    g + h >= custo do melhor plano são podados, por isso só se publicam planos
+    estritamente melhores.
+    - plano: PlanoAnytime onde é publicado o melhor plano a cada melhoria, com
+      epsilon = custo / min(g + h em OPEN e INCONS). O limite só é garantido com
+      heurísticas admissíveis (HEURISTICAS_ADMISSIVEIS); com as outras fica inf.
+    - parar: threading.Event; quando ativado a pesquisa termina e devolve o melhor.
+    - estatisticas: dict opcional com as medições (somadas sobre as iterações)
+      e 'iteracoes'.
+    Devolve (caminho, custo) como os outros algoritmos, ou None.
+    """
+    if plano is None: plano = PlanoAnytime()
+    admissivel = funcao_heuristica in HEURISTICAS_ADMISSIVEIS
+    medidor = _Medidor() if estatisticas is not None else None
+    if medidor is not None: funcao_heuristica = medidor.cronometrar(funcao_heuristica)
+
+    nos = {estado_inicial: estado_inicial}  # {estado: objeto com o melhor g (e o caminho, via pai)}
+    h_de = {estado_inicial: funcao_heuristica(estado_inicial, cidade)}
+    abertos = {estado_inicial}  # OPEN (a heap pode ter entradas antigas, ignoradas ao sair)
+    inconsistentes = set()  # INCONS: melhorados depois de fechados nesta iteração
+    incumbente = float('inf')
+    descartados = 0
+    iteracoes = 0
+    interrompida = False
+
+    def limite():
+        if not admissivel: return float('inf')
+        return _limite_epsilon(incumbente, nos, abertos, inconsistentes, h_de)
+
+    for w in pesos:
+        iteracoes += 1
+        # Nova iteração: INCONS volta a OPEN e as prioridades são recalculadas com o novo w
+        abertos |= inconsistentes
+        inconsistentes = set()
+        fechados = set()
+        count = 0
+        open_list = []
+        for s in abertos:
+            count += 1
+            open_list.append((nos[s].custo_acumulado + w * h_de[s], count, nos[s]))
+        heapq.heapify(open_list)
+
+        while open_list:
+            if parar is not None and parar.is_set():
+                interrompida = True
+                break
+
+            f, _, n = open_list[0]
+            if n not in abertos or nos[n] is not n:
+                heapq.heappop(open_list)
+                continue
+            if f >= incumbente: break
+            heapq.heappop(open_list)
+            abertos.discard(n)
+            fechados.add(n)
+
+            if n.is_objetivo():
+                incumbente = n.custo_acumulado
+                plano.publicar(reconstruir_caminho(n), incumbente, limite())
+                continue
+
+            candidatos = []
+            filhos = n.gera_sucessores(cidade, modo) if medidor is None else \
+                medidor.expandir(n, cidade, modo, len(abertos), len(fechados))
+            for filho in filhos:
+                anterior = nos.get(filho)
+                if anterior is not None and filho.custo_acumulado >= anterior.custo_acumulado:
+                    descartados += 1
+                    continue
+                candidatos.append(filho)
+
+            sem_h = [filho for filho in candidatos if filho not in h_de]
+            for filho, h in zip(sem_h, avaliar_heuristica(funcao_heuristica, sem_h, cidade)):
+                h_de[filho] = h
+
+            for filho in candidatos:
+                g = filho.custo_acumulado
+                h = h_de[filho]
+                anterior = nos.get(filho)
+                if (anterior is not None and g >= anterior.custo_acumulado) or g + h >= incumbente:
+                    descartados += 1
+                    continue
+
+                filho.pai = n
+                nos[filho] = filho
+                if filho in fechados:
+                    inconsistentes.add(filho)
+                else:
+                    count += 1
+                    heapq.heappush(open_list, (g + w * h, count, filho))
+                    abertos.add(filho)
+
+        if interrompida: break
+        if plano.caminho is not None:
+            epsilon = limite()
+            plano.melhorar_limite(epsilon)
+            if epsilon <= 1.0: break
+
+    if medidor is not None: medidor.publicar(estatisticas, descartados, iteracoes=iteracoes)
+    melhor = plano.melhor()
+    if melhor is None: return None
+    return melhor[0], melhor[1]
+
+# =============================================================================
+# 6. IDA* (Iterative Deepening A*) - MEMÓRIA LIMITADA
+# =============================================================================
+def ida_star(estado_inicial, cidade, funcao_heuristica, modo=MODO_MICRO, parar=None, max_transposicoes=50_000,
+             crescimento_minimo=0.02, estatisticas=None):
+    """
+    Aprofundamento iterativo sobre o limite de f = g + h.
+    Só guarda o caminho atual (com os irmãos por explorar) e uma tabela de
+    transposições {estado: melhor g} limitada a 'max_transposicoes' entradas;
+    quando cheia deixa de aceitar entradas novas, pelo que a memória nunca
+    passa de profundidade * ramificação + max_transposicoes estados.
+    Com custos reais cada iteração sobe o limite muito pouco; 'crescimento_minimo'
+    obriga o limite a subir pelo menos essa fração, o que garante um custo
+    <= (1 + crescimento_minimo) * ótimo (0 = IDA* clássico, exato).
+    'estatisticas' (dict opcional) recebe as medições da pesquisa, com iteracoes
+    e pico_nos = caminho + irmãos por explorar + transposições (também quando a
+    pesquisa é cancelada).
+    """
+    medidor = _Medidor() if estatisticas is not None else None
+    if medidor is not None: funcao_heuristica = medidor.cronometrar(funcao_heuristica)
+    pico_nos = 0
+    iteracoes = 0
+    podados = 0
+
+    def filhos_ordenados(n, profundidade=0, transposicoes=()):
+        sucessores = n.gera_sucessores(cidade, modo) if medidor is None else \
+            medidor.expandir(n, cidade, modo, profundidade, len(transposicoes))
+        filhos = []
+        for filho in sucessores:
+            filho.pai = n
+            filhos.append((filho.custo_acumulado + funcao_heuristica(filho, cidade), filho))
+        filhos.sort(key=lambda par: par[0])
+        return filhos
+
+    limite = estado_inicial.custo_acumulado + funcao_heuristica(estado_inicial, cidade)
+    resultado = None
+    cancelado = False
+
+    if estado_inicial.is_objetivo():
+        resultado = estado_inicial
+
+    while resultado is None:
+        iteracoes += 1
+        proximo_limite = float('inf')
+        transposicoes = {estado_inicial: estado_inicial.custo_acumulado}
+        no_caminho = {estado_inicial}
+        caminho = [estado_inicial]
+        # Cada entrada: [filhos ordenados por f, índice do próximo a visitar]
+        pilha = [[filhos_ordenados(estado_inicial), 0]]
+
+        while pilha:
+            if parar is not None and parar.is_set():
+                cancelado = True
+                break
+
+            filhos, i = pilha[-1]
+            if i >= len(filhos):
+                pilha.pop()
+                no_caminho.discard(caminho.pop())
+                continue
+            pilha[-1][1] = i + 1
+
+            f, filho = filhos[i]
+            if f > limite:
+                if f < proximo_limite: proximo_limite = f
+                continue
+            if filho in no_caminho:
+                podados += 1
+                continue
+
+            g = filho.custo_acumulado
+            melhor_g = transposicoes.get(filho)
+            if melhor_g is not None and g >= melhor_g:
+                podados += 1
+                continue
+            if melhor_g is not None or len(transposicoes) < max_transposicoes:
+                transposicoes[filho] = g
+
+            if filho.is_objetivo():
+                resultado = filho
+                break
+
+            caminho.append(filho)
+            no_caminho.add(filho)
+            pilha.append([filhos_ordenados(filho, len(caminho), transposicoes), 0])
+
+            if medidor is not None:
+                nos_pendentes = sum(len(l) - j for l, j in pilha)
+                pico_nos = max(pico_nos, len(caminho) + nos_pendentes + len(transposicoes))
+
+        if cancelado or (resultado is None and proximo_limite == float('inf')): break
+        limite = max(proximo_limite, limite * (1 + crescimento_minimo))
+
+    if medidor is not None: medidor.publicar(estatisticas, podados, iteracoes=iteracoes, pico_nos=pico_nos)
+    if resultado is None: return None
+    return reconstruir_caminho(resultado), resultado.custo_acumulado
+
+# =============================================================================
+# 7. SMA* (Simplified Memory-bounded A*)
+# =============================================================================
+class _NoSMA:
+    __slots__ = ('estado', 'pai', 'filhos', 'f', 'f_esquecido', 'profundidade', 'versao')
+
+    def __init__(self, estado, pai, f):
+        self.estado = estado
+        self.pai = pai
+        self.filhos = []
+        self.f = f
+        self.f_esquecido = float('inf')
+        self.profundidade = pai.profundidade + 1 if pai is not None else 0
+        self.versao = 0
+
+
+def sma_star(estado_inicial, cidade, funcao_heuristica, modo=MODO_MICRO, parar=None, memoria_max=20_000,
+             estatisticas=None):
+    """
+    A* com orçamento fixo de 'memoria_max' nós na árvore de pesquisa.
+    Quando o orçamento é ultrapassado, esquece a pior folha (maior f, menos
+    profunda) e guarda o seu f no pai ("backed-up value"); se o pai ficar sem
+    filhos em memória volta à fronteira, para ser regenerado se necessário.
+    'estatisticas' (dict opcional) recebe as medições da pesquisa, com esquecidos
+    e pico_nos = nós da árvore em memória (também quando a pesquisa é cancelada).
+    """
+    medidor = _Medidor() if estatisticas is not None else None
+    if medidor is not None: funcao_heuristica = medidor.cronometrar(funcao_heuristica)
+    count = 0
+    esquecidos = 0
+    podados = 0
+
+    raiz = _NoSMA(estado_inicial, None,
+                  estado_inicial.custo_acumulado + funcao_heuristica(estado_inicial, cidade))
+    em_memoria = {estado_inicial: raiz}
+    total_nos = 1
+    pico_nos = 1
+
+    # Duas heaps sobre as folhas (invalidação preguiçosa pela 'versao')
+    # melhores: menor f, mais profundo | piores: maior f, menos profundo
+    melhores = [(raiz.f, 0, count, raiz, 0)]
+    piores = [(-raiz.f, 0, count, raiz, 0)]
+
+    def e_folha_valida(no, versao):
+        return no.versao == versao and not no.filhos
+
+    def empurrar_folha(no):
+        nonlocal count
+        no.versao += 1
+        count += 1
+        heapq.heappush(melhores, (no.f, -no.profundidade, count, no, no.versao))
+        heapq.heappush(piores, (-no.f, no.profundidade, count, no, no.versao))
+
+    def atualizar_ancestrais(no):
+        while no is not None and no.filhos:
+            novo = min(min(c.f for c in no.filhos), no.f_esquecido)
+            if novo == no.f: break
+            no.f = max(no.f, novo)
+            no = no.pai
+
+    def esquecer_pior():
+        nonlocal total_nos, esquecidos
+        while piores:
+            _, _, _, w, versao = heapq.heappop(piores)
+            if not e_folha_valida(w, versao) or w is raiz: continue
+            p = w.pai
+            p.filhos.remove(w)
+            p.f_esquecido = min(p.f_esquecido, w.f)
+            if em_memoria.get(w.estado) is w: del em_memoria[w.estado]
+            w.versao += 1
+            total_nos -= 1
+            esquecidos += 1
+            if not p.filhos:
+                # O pai volta à fronteira com o melhor f que esqueceu
+                p.f = max(p.f, p.f_esquecido)
+                empurrar_folha(p)
+            return True
+        return False
+
+    resultado = None
+    while melhores:
+        if parar is not None and parar.is_set(): break
+
+        f, _, _, b, versao = heapq.heappop(melhores)
+        if not e_folha_valida(b, versao): continue
+        if b.f == float('inf'): break
+
+        if b.estado.is_objetivo():
+            resultado = b.estado
+            break
+
+        b.f_esquecido = float('inf')
+        ancestrais = set()
+        a = b
+        while a is not None:
+            ancestrais.add(a.estado)
+            a = a.pai
+
+        filhos = b.estado.gera_sucessores(cidade, modo) if medidor is None else \
+            medidor.expandir(b.estado, cidade, modo, total_nos, len(ancestrais))
+        for filho in filhos:
+            existente = em_memoria.get(filho)
+            if filho in ancestrais or (existente is not None and
+                                       existente.estado.custo_acumulado <= filho.custo_acumulado):
+                podados += 1
+                continue
+
+            filho.pai = b.estado
+            if b.profundidade + 1 >= memoria_max - 1 and not filho.is_objetivo():
+                f_filho = float('inf')  # sem memória para descer mais por aqui
+            else:
+                f_filho = max(b.f, filho.custo_acumulado + funcao_heuristica(filho, cidade))
+            no = _NoSMA(filho, b, f_filho)
+            b.filhos.append(no)
+            em_memoria[filho] = no
+            total_nos += 1
+            empurrar_folha(no)
+
+        if not b.filhos:
+            b.f = float('inf')
+            if b.pai is not None: atualizar_ancestrais(b.pai)
+            continue
+
+        atualizar_ancestrais(b)
+        pico_nos = max(pico_nos, total_nos)
+        while total_nos > memoria_max:
+            if not esquecer_pior(): break
+
+    if medidor is not None: medidor.publicar(estatisticas, podados, esquecidos=esquecidos, pico_nos=pico_nos)
+    if resultado is None: return None
+    return reconstruir_caminho(resultado), resultado.custo_acumulado
+
+# =============================================================================
+# 8. BEAM SEARCH (largura limitada)
+# =============================================================================
+def beam_search(estado_inicial, cidade, funcao_heuristica, modo=MODO_MICRO, parar=None, largura=50,
+                estatisticas=None):
+    """
+    Pesquisa em largura por níveis que só mantém os 'largura' melhores estados
+    de cada profundidade (ordenados por f = g + h). Cada nível expande no máximo
+    'largura' estados, por isso o tempo cresce linearmente com a largura e com o
+    número de sucessores (tamanho da frota). Não é ótima nem completa.
+    Continua enquanto houver estados com f abaixo do melhor objetivo encontrado.
+    'estatisticas' (dict opcional) recebe as medições da pesquisa, com profundidade
+    e pico_nos = estados guardados em 'visitados'.
+    """
+    medidor = _Medidor() if estatisticas is not None else None
+    if medidor is not None: funcao_heuristica = medidor.cronometrar(funcao_heuristica)
+    profundidade = 0
+    podados = 0
+    pico_nos = 1
+    count = 0
+
+    melhor = estado_inicial if estado_inicial.is_objetivo() else None
+    visitados = {estado_inicial: estado_inicial.custo_acumulado}
+    nivel = [] if melhor else [estado_inicial]
+
+    while nivel:
+        profundidade += 1
+        candidatos = {}
+        for atual in nivel:
+            if parar is not None and parar.is_set(): break
+            filhos = atual.gera_sucessores(cidade, modo) if medidor is None else \
+                medidor.expandir(atual, cidade, modo, len(candidatos), len(visitados))
+            for filho in filhos:
+                g = filho.custo_acumulado
+                if g >= visitados.get(filho, float('inf')):
+                    podados += 1
+                    continue
+                visitados[filho] = g
+                filho.pai = atual
+
+                if filho.is_objetivo():
+                    if melhor is None or g < melhor.custo_acumulado: melhor = filho
+                    continue
                 count += 1
-                heapq.heappush(open_list, (h, count, filho))
-                open_set_hashes.add(filho)
-                
-    return None
+                candidatos[filho] = (g + funcao_heuristica(filho, cidade), count, filho)
+
+        if parar is not None and parar.is_set(): break
+        pico_nos = max(pico_nos, len(visitados))
+
+        if melhor is not None:
+            limite = melhor.custo_acumulado
+            candidatos = {e: c for e, c in candidatos.items() if c[0] < limite}
+        nivel = [c[2] for c in heapq.nsmallest(largura, candidatos.values())]
+
+    if medidor is not None:
+        medidor.publicar(estatisticas, podados, profundidade=profundidade, pico_nos=pico_nos)
+    if melhor is None: return None
+    return reconstruir_caminho(melhor), melhor.custo_acumulado
+
+# =============================================================================
+# Despacho genérico
+# =============================================================================
+# Algoritmos de procura cega (não recebem heurística)
+ALGORITMOS_CEGOS = (bfs, dfs)
+# Algoritmos com memória limitada (o pico_nos das estatísticas é o que eles limitam)
+ALGORITMOS_MEMORIA_LIMITADA = (ida_star, sma_star, beam_search)
+
 
+def executar(algoritmo, estado_inicial, cidade, funcao_heuristica=None, **kwargs):
+    """Chama qualquer planeador com a assinatura certa (com ou sem heurística)."""
+    if algoritmo in ALGORITMOS_CEGOS:
+        return algoritmo(estado_inicial, cidade, **kwargs)
+    return algoritmo(estado_inicial, cidade, funcao_heuristica or heuristica_taxi, **kwargs)
@@ -0,0 +1,342 @@
+"""
+Benchmarks dos planeadores.
+
+- hashing (por omissão): compara expansões/segundo do A* e do BFS com o hash
+  Zobrist incremental contra o comportamento antigo (hash recalculado de raiz
+  em cada consulta e igualdade apenas por hash).
+- suite: corre os planeadores em cenários com semente fixa e tamanho
+  crescente (frota x pedidos), num mapa sintético em grelha ou no mapa de
+  Braga em cache, cada um num processo próprio com orçamento de tempo e de
+  memória. Regista tempo, expansões/s, pico de RSS e custo da solução num
+  ficheiro JSON, que pode ser comparado com uma execução de referência.
+
+Uso (a partir de src/):
+    python benchmark.py
+    python benchmark.py suite --mapa grelha --tempo 10 --memoria 1024 --saida resultados.json
+    python benchmark.py suite --referencia resultados_antigos.json
+"""
+import os
+import json
+import time
+import random
+import argparse
+import platform
+import threading
+import subprocess
+import multiprocessing as mp
+
+import algoritmos
+from cidade import Cidade
+from cidade_osm import CidadeOSM
+from modelos import Veiculo, Pedido
+from problema import Estado, MODO_MICRO, MODO_MACRO
+
+
+class _EstadoContado(Estado):
+    __slots__ = ()
+    expansoes = 0
+
+    def gera_sucessores(self, cidade, modo=MODO_MICRO):
+        _EstadoContado.expansoes += 1
+        return super().gera_sucessores(cidade, modo)
+
+
+class _EstadoRecalculado(_EstadoContado):
+    """Reproduz o hash antigo: reconstrói tudo a cada __hash__/__eq__."""
+    __slots__ = ()
+
+    def __hash__(self):
+        return self._hash_completo()
+
+    def __eq__(self, other):
+        if not isinstance(other, Estado): return False
+        return hash(self) == hash(other)
+
+
+def gerar_cenario(cidade, classe, num_veiculos, num_pedidos, seed):
+    rng = random.Random(seed)
+    livres = sorted(cidade.locais_livres)
+    frota = []
+    for i in range(1, num_veiculos + 1):
+        tipo = "eletrico" if i % 2 != 0 else "combustao"
+        frota.append(Veiculo(i, tipo, rng.choice(livres), 200 if tipo == "eletrico" else 600, 4))
+    pedidos = []
+    for i in range(num_pedidos):
+        origem, destino = rng.sample(livres, 2)
+        pedidos.append(Pedido(100 + i, origem, destino, 1, 10_000))
+    return classe(frota, pedidos)
+
+
+def medir(cidade, classe, algoritmo, modo, num_veiculos, num_pedidos, seed):
+    estado = gerar_cenario(cidade, classe, num_veiculos, num_pedidos, seed)
+    _EstadoContado.expansoes = 0
+    t0 = time.perf_counter()
+    if algoritmo is algoritmos.bfs:
+        res = algoritmo(estado, cidade, modo=modo)
+    else:
+        res = algoritmo(estado, cidade, algoritmos.heuristica_taxi, modo=modo)
+    dt = time.perf_counter() - t0
+    custo = res[1] if res else None
+    return _EstadoContado.expansoes, dt, custo
+
+
+def comparar_hashing():
+    random.seed(42)
+    cidade = CidadeOSM()
+
+    cenarios = [
+        ("A*", algoritmos.a_star, MODO_MICRO, 2, 2, 1),
+        ("A*", algoritmos.a_star, MODO_MACRO, 6, 6, 2),
+        ("BFS", algoritmos.bfs, MODO_MICRO, 1, 2, 3),
+        ("BFS", algoritmos.bfs, MODO_MACRO, 3, 4, 4),
+    ]
+
+    print(f"\n{'Alg':<5}{'Modo':>6}{'Frota':>6}{'Ped':>5}{'Expansoes':>11}"
+          f"{'Antigo (exp/s)':>16}{'Zobrist (exp/s)':>17}{'Ganho':>8}")
+    for nome, alg, modo, nv, npd, seed in cenarios:
+        exp_a, t_a, custo_a = medir(cidade, _EstadoRecalculado, alg, modo, nv, npd, seed)
+        exp_z, t_z, custo_z = medir(cidade, _EstadoContado, alg, modo, nv, npd, seed)
+        taxa_a = exp_a / t_a if t_a > 0 else 0
+        taxa_z = exp_z / t_z if t_z > 0 else 0
+        ganho = taxa_z / taxa_a if taxa_a > 0 else 0
+        print(f"{nome:<5}{modo:>6}{nv:>6}{npd:>5}{exp_z:>11}{taxa_a:>16.0f}{taxa_z:>17.0f}{ganho:>7.2f}x")
+        if custo_a != custo_z:
+            print(f"   [!] Custos diferentes: antigo={custo_a} zobrist={custo_z}")
+
+
+# ==========================================
+# SUITE DE PLANEADORES
+# ==========================================
+
+VERSAO_RESULTADOS = 1
+PLANEADORES = {
+    'a_star': algoritmos.a_star,
+    'greedy': algoritmos.greedy,
+    'bfs': algoritmos.bfs,
+    'dfs': algoritmos.dfs,
+    'a_star_anytime': algoritmos.a_star_anytime,
+    'ida_star': algoritmos.ida_star,
+    'sma_star': algoritmos.sma_star,
+    'beam_search': algoritmos.beam_search,
+}
+# (veículos, pedidos) por ordem crescente; um planeador que esgota o orçamento
+# num tamanho não corre os seguintes no mesmo modo
+TAMANHOS = {
+    MODO_MICRO: [(1, 1), (1, 2), (2, 2), (2, 3), (3, 3), (3, 4)],
+    MODO_MACRO: [(2, 2), (3, 3), (4, 4), (6, 6), (8, 8), (10, 10)],
+}
+TOLERANCIA_PROCESSO = 2.0  # s para além do orçamento antes de terminar o processo
+INTERVALO_VIGIA = 0.02  # s entre amostras de tempo/memória
+
+
+def gerar_cidade_grelha(lado, seed):
+    """
+    Mapa sintético lado x lado (ruas de ~250 m nos dois sentidos), com
+    distâncias e velocidades aleatórias mas reprodutíveis e 4 carregadores,
+    4 bombas e uma garagem. Não precisa de rede nem de OSMnx.
+    """
+    rng = random.Random(seed)
+    cidade = Cidade()
+    for i in range(lado):
+        for j in range(lado):
+            cidade.add_node(i * lado + j, j * 0.25, i * 0.25)
+
+    for i in range(lado):
+        for j in range(lado):
+            u = i * lado + j
+            for di, dj in ((0, 1), (1, 0)):
+                if i + di < lado and j + dj < lado:
+                    v = (i + di) * lado + j + dj
+                    dist = 0.25 * rng.uniform(1.0, 1.3)  # nunca menor que a linha reta
+                    tempo = dist / rng.uniform(20, 50) * 60
+                    cidade.add_edge(u, v, dist, tempo)
+                    cidade.add_edge(v, u, dist, tempo)
+
+    nos = list(cidade.nodes)
+    especiais = rng.sample(nos, 9)
+    cidade.garagem = especiais[0]
+    cidade.carregadores = especiais[1:5]
+    cidade.bombas = especiais[5:9]
+    cidade.nodes[cidade.garagem]['type'] = 'garagem'
+    for n in cidade.carregadores: cidade.nodes[n]['type'] = 'recarga'
+    for n in cidade.bombas: cidade.nodes[n]['type'] = 'combustivel'
+    cidade.locais_livres = [n for n in nos if cidade.nodes[n]['type'] == 'rua']
+
+    cidade.preparar_landmarks()
+    cidade.preparar_hierarquias()
+    cidade.pesos_arestas()
+    return cidade
+
+
+def _correr_planeador(cidade, nome, modo, num_veiculos, num_pedidos, seed, tempo_max, memoria_max, conexao):
+    """Processo filho: um planeador num cenário, vigiado por uma thread que ativa o token de paragem."""
+    estado = gerar_cenario(cidade, _EstadoContado, num_veiculos, num_pedidos, seed)
+    parar = threading.Event()
+    terminou = threading.Event()
+    medicao = {'motivo': None, 'rss_base': algoritmos.memoria_rss_mb()}
+    medicao['rss_pico'] = medicao['rss_base']
+    t0 = time.perf_counter()
+
+    def vigiar():
+        while not terminou.wait(INTERVALO_VIGIA):
+            medicao['rss_pico'] = max(medicao['rss_pico'], algoritmos.memoria_rss_mb())
+            if time.perf_counter() - t0 > tempo_max:
+                medicao['motivo'] = 'tempo'
+            elif medicao['rss_pico'] - medicao['rss_base'] > memoria_max:
+                medicao['motivo'] = 'memoria'
+            if medicao['motivo']:
+                parar.set()
+                return
+
+    vigia = threading.Thread(target=vigiar, daemon=True)
+    vigia.start()
+    _EstadoContado.expansoes = 0
+    res = algoritmos.executar(PLANEADORES[nome], estado, cidade, algoritmos.heuristica_taxi, modo=modo, parar=parar)
+    dt = time.perf_counter() - t0
+    terminou.set()
+    vigia.join()
+    medicao['rss_pico'] = max(medicao['rss_pico'], algoritmos.memoria_rss_mb())
+
+    if medicao['motivo'] and not res:
+        resultado = medicao['motivo']
+    else:
+        resultado = 'ok' if res else 'sem_solucao'
+    conexao.send({
+        'resultado': resultado,
+        'tempo_s': round(dt, 4),
+        'expansoes': _EstadoContado.expansoes,
+        'expansoes_s': round(_EstadoContado.expansoes / dt, 1) if dt > 0 else None,
+        'pico_rss_mb': round(medicao['rss_pico'], 1),
+        'rss_pesquisa_mb': round(medicao['rss_pico'] - medicao['rss_base'], 1),
+        'custo': round(res[1], 6) if res else None,
+    })
+    conexao.close()
+
+
+def medir_planeador(ctx, cidade, nome, modo, num_veiculos, num_pedidos, seed, tempo_max, memoria_max):
+    """Corre um planeador num processo novo (pico de RSS isolado). Termina-o se ignorar o orçamento."""
+    receber, enviar = ctx.Pipe(duplex=False)
+    processo = ctx.Process(target=_correr_planeador, daemon=True,
+                           args=(cidade, nome, modo, num_veiculos, num_pedidos, seed, tempo_max, memoria_max, enviar))
+    processo.start()
+    enviar.close()
+    if receber.poll(tempo_max + TOLERANCIA_PROCESSO):
+        try:
+            medida = receber.recv()
+        except EOFError:
+            medida = {'resultado': 'erro'}
+    else:
+        medida = {'resultado': 'tempo'}
+    processo.terminate()
+    processo.join()
+    if medida['resultado'] == 'erro' or (processo.exitcode not in (0, None, -15) and 'tempo_s' not in medida):
+        medida = {'resultado': 'memoria' if processo.exitcode == -9 else 'erro'}
+    return medida
+
+
+def _commit_atual():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              timeout=5, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def correr_suite(args):
+    random.seed(args.seed)
+    if args.mapa == 'grelha':
+        cidade = gerar_cidade_grelha(args.lado, args.seed)
+    else:
+        cidade = CidadeOSM()
+    metodos = mp.get_all_start_methods()
+    ctx = mp.get_context('fork' if 'fork' in metodos else 'spawn')
+
+    resultados = []
+    print(f"\n{'Alg':<15}{'Modo':>6}{'Frota':>6}{'Ped':>5}{'Resultado':>12}{'Tempo(s)':>10}"
+          f"{'Exp/s':>10}{'RSS(MB)':>9}{'Custo':>10}")
+    for modo in args.modos:
+        for nome in args.algoritmos:
+            for k, (nv, npd) in enumerate(TAMANHOS[modo]):
+                seed = args.seed + k
+                medida = medir_planeador(ctx, cidade, nome, modo, nv, npd, seed, args.tempo, args.memoria)
+                linha = {'algoritmo': nome, 'modo': modo, 'veiculos': nv, 'pedidos': npd, 'seed': seed}
+                linha.update(medida)
+                resultados.append(linha)
+                custo = f"{medida['custo']:.3f}" if medida.get('custo') is not None else "-"
+                print(f"{nome:<15}{modo:>6}{nv:>6}{npd:>5}{medida['resultado']:>12}"
+                      f"{medida.get('tempo_s', float('nan')):>10.3f}{medida.get('expansoes_s') or 0:>10.0f}"
+                      f"{medida.get('pico_rss_mb', float('nan')):>9.1f}{custo:>10}")
+                if medida['resultado'] in ('tempo', 'memoria', 'erro'): break
+
+    relatorio = {
+        'versao': VERSAO_RESULTADOS,
+        'data': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'commit': _commit_atual(),
+        'python': platform.python_version(),
+        'plataforma': platform.platform(),
+        'mapa': {'tipo': args.mapa, 'lado': args.lado if args.mapa == 'grelha' else None,
+                 'nos': len(cidade.nodes), 'arestas': len(cidade.pesos_arestas())},
+        'seed': args.seed,
+        'tempo_max_s': args.tempo,
+        'memoria_max_mb': args.memoria,
+        'resultados': resultados,
+    }
+    with open(args.saida, 'w') as f:
+        json.dump(relatorio, f, indent=2)
+    print(f"\nResultados gravados em {args.saida}")
+
+    if args.referencia:
+        comparar_resultados(args.referencia, relatorio)
+
+
+def comparar_resultados(caminho_referencia, relatorio):
+    """Regressões face a uma execução anterior: tempo (razão) e custo, por cenário."""
+    with open(caminho_referencia) as f:
+        referencia = json.load(f)
+    chave = lambda r: (r['algoritmo'], r['modo'], r['veiculos'], r['pedidos'], r['seed'])
+    antigos = {chave(r): r for r in referencia['resultados']}
+
+    print(f"\nComparação com {caminho_referencia} (commit {referencia.get('commit')}):")
+    for r in relatorio['resultados']:
+        a = antigos.get(chave(r))
+        if a is None: continue
+        nota = ""
+        if a['resultado'] != r['resultado']:
+            nota = f"resultado {a['resultado']} -> {r['resultado']}"
+        elif r['resultado'] == 'ok':
+            razao = r['tempo_s'] / a['tempo_s'] if a['tempo_s'] else float('inf')
+            nota = f"tempo x{razao:.2f}"
+            if abs(r['custo'] - a['custo']) > 1e-6:
+                nota += f" | custo {a['custo']:.3f} -> {r['custo']:.3f}"
+        if nota:
+            print(f"   {r['algoritmo']:<15}{r['modo']:>6}{r['veiculos']:>4}x{r['pedidos']:<4}{nota}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks dos planeadores do TaxiGreen.")
+    sub = parser.add_subparsers(dest='comando')
+    sub.add_parser('hashing', help="expansões/s com e sem hash Zobrist incremental")
+    suite = sub.add_parser('suite', help="planeadores em cenários crescentes, com saída JSON")
+    suite.add_argument('--mapa', choices=('grelha', 'osm'), default='grelha',
+                       help="grelha sintética ou o mapa de Braga em cache")
+    suite.add_argument('--lado', type=int, default=12, help="nós por lado da grelha")
+    suite.add_argument('--algoritmos', type=lambda s: s.split(','), default=['a_star', 'greedy', 'bfs', 'dfs'],
+                       help=f"lista separada por vírgulas ({', '.join(PLANEADORES)})")
+    suite.add_argument('--modos', type=lambda s: s.split(','), default=[MODO_MICRO, MODO_MACRO])
+    suite.add_argument('--tempo', type=float, default=10.0, help="orçamento de tempo por execução (s)")
+    suite.add_argument('--memoria', type=float, default=1024.0, help="orçamento de memória por execução (MB)")
+    suite.add_argument('--seed', type=int, default=42)
+    suite.add_argument('--saida', default='resultados_benchmark.json')
+    suite.add_argument('--referencia', help="JSON de uma execução anterior para comparar")
+    args = parser.parse_args()
+
+    if args.comando == 'suite':
+        desconhecidos = [a for a in args.algoritmos if a not in PLANEADORES]
+        desconhecidos += [m for m in args.modos if m not in TAMANHOS]
+        if desconhecidos: parser.error(f"desconhecido(s): {', '.join(desconhecidos)}")
+        correr_suite(args)
+    else:
+        comparar_hashing()
+
+
+if __name__ == "__main__": main()
@@ -1,11 +1,33 @@
 import math
+import numpy as np
+from rotas import OraculoRotas
+from landmarks import Landmarks
+from contracao import HierarquiaContracao
+from espacial import IndiceKD, GrelhaEspacial
+from pesos import PesosArestas
 
 class Cidade:
+    # Divisor das coordenadas na heurística (1 = unidades das coordenadas)
+    ESCALA_COORDENADAS = 1.0
+
     def __init__(self):
         # Dicionário para guardar os nós: {id_no: {dados}}
         self.nodes = {}
-        # Dicionário para guardar as arestas: {origem: {destino: {dados_aresta}}}
-        self.graph = {}
+        # Adjacência CSR e pesos das arestas em arrays (+ trânsito), criados por pesos_arestas()
+        self.pesos = None
+        # Arestas acrescentadas desde a última construção do CSR: {(origem, destino): {dados_aresta}}
+        self._arestas_novas = {}
+        # Oráculo de caminhos mais curtos (árvores de Dijkstra em cache LRU)
+        self.rotas = OraculoRotas(self)
+        # Tabelas ALT (landmarks), criadas por preparar_landmarks()
+        self.landmarks = None
+        # Ids densos dos nós e coordenadas em NumPy, criados por indexar()
+        self.indice_no = None
+        self.coords = None
+        self._colunas_landmarks = None
+        # Índices espaciais (KD-tree) dos nós e dos postos, criados por indexar()
+        self.indice_espacial = None
+        self._indices_postos = {}
 
     def add_node(self, node_id, x, y, node_type="rua"):
         """
@@ -18,8 +40,7 @@ class Cidade:
             'coords': (x, y),
             'type': node_type
         }
-        if node_id not in self.graph:
-            self.graph[node_id] = {}
+        self.indice_no = None
 
     def add_edge(self, u, v, distance, time):
         """
@@ -27,11 +48,53 @@ class Cidade:
         :param distance: Distância em km (custo para bateria/combustivel)
         :param time: Tempo em minutos (custo para o cliente)
         """
-        # Adiciona aresta de ida
-        self.graph[u][v] = {'dist': distance, 'time': time}
+        # Adiciona aresta de ida (entra no CSR na próxima chamada a pesos_arestas)
+        self._arestas_novas[(u, v)] = {'dist': distance, 'time': time}
+        self.rotas.limpar()
         
         # Se a estrada for de duplo sentido, descomenta a linha abaixo:
-        # self.graph[v][u] = {'dist': distance, 'time': time}
+        # self._arestas_novas[(v, u)] = {'dist': distance, 'time': time}
+
+    def pesos_arestas(self):
+        """
+        PesosArestas (adjacência CSR + pesos) do grafo. É (re)construído quando
+        há nós ou arestas novos desde a última chamada, de uma só vez.
+        """
+        pesos = self.pesos
+        if pesos is None or self._arestas_novas or len(pesos.nos) != len(self.nodes):
+            nos = sorted(self.nodes)
+            if pesos is None:
+                self.pesos = PesosArestas.de_arestas(nos, self._arestas_novas)
+            else:
+                self.pesos = pesos.com_arestas(nos, self._arestas_novas)
+            self._arestas_novas = {}
+            if self.pesos is not pesos: self.rotas.limpar()
+        return self.pesos
+
+    def usar_pesos(self, pesos):
+        """Substitui todas as arestas por um PesosArestas já construído (ex: mapa compilado)."""
+        self.pesos = pesos
+        self._arestas_novas = {}
+        self.rotas.limpar()
+
+    def versao_pesos(self, peso):
+        """Versão atual de 'peso': muda sempre que algum valor desse peso muda."""
+        return self.pesos_arestas().versoes[peso]
+
+    def aplicar_transito(self, fatores):
+        """
+        Define o trânsito como {(u, v): fator sobre o tempo}; as ruas fora de
+        'fatores' voltam ao tempo normal. Devolve as arestas alteradas [(u, v)].
+        """
+        return self.pesos_arestas().sobrepor(fatores, 'time')
+
+    def get_arestas_engarrafadas(self):
+        """
+        Ruas significativamente mais lentas do que o normal (para o visualizador),
+        como frozenset partilhado: O(1), o mesmo objeto enquanto o trânsito não muda.
+        """
+        if self.pesos is None: return frozenset()
+        return self.pesos.engarrafadas
 
     def get_heuristic(self, start_id, goal_id):
         """
@@ -41,21 +104,122 @@ class Cidade:
         x2, y2 = self.nodes[goal_id]['coords']
         return math.sqrt((x1 - x2)**2 + (y1 - y2)**2)
 
+    def preparar_landmarks(self, k=8, pasta='cache'):
+        """Pré-processamento ALT; as tabelas ficam guardadas em disco por mapa."""
+        self.landmarks = Landmarks.carregar_ou_calcular(self, k, pasta=pasta)
+        self.indice_no = None
+
+    def preparar_hierarquias(self, pesos=('dist',), pasta='cache'):
+        """
+        Contraction Hierarchies registadas no oráculo de rotas; ficam guardadas em
+        disco por mapa. Por omissão só a de 'dist': a de 'time' deixa de valer no
+        primeiro evento de trânsito (OraculoRotas.invalidar) e não é refeita.
+        """
+        for peso in pesos:
+            self.rotas.usar_hierarquia(HierarquiaContracao.carregar_ou_calcular(self.pesos_arestas(), peso, pasta))
+
+    def get_heuristic_alt(self, start_id, goal_id):
+        """
+        Limite inferior da distância na rede: o maior entre a linha reta e o
+        limite ALT (se os landmarks estiverem preparados).
+        """
+        h = self.get_heuristic(start_id, goal_id)
+        if self.landmarks is not None:
+            h = max(h, self.landmarks.limite_inferior(start_id, goal_id))
+        return h
+
+    def indexar(self):
+        """
+        Ids densos (0..N-1, por ordem dos nós) e coordenadas num array NumPy
+        contíguo (N x 2), para cálculos vetorizados. Devolve {nó: id}.
+        """
+        if self.indice_no is None:
+            nos = sorted(self.nodes)
+            self.indice_no = {n: i for i, n in enumerate(nos)}
+            self.coords = np.array([self.nodes[n]['coords'] for n in nos], dtype=float)
+            self.indice_espacial = IndiceKD(nos, self.coords)
+            self._indices_postos = {}
+            if self.landmarks is not None:
+                self._colunas_landmarks = np.array([self.landmarks.indice[n] for n in nos], dtype=np.int64)
+        return self.indice_no
+
+    def indices(self, nos):
+        """Ids densos (array NumPy) de uma sequência de nós."""
+        indice = self.indexar()
+        return np.fromiter((indice[n] for n in nos), dtype=np.int64, count=len(nos))
+
+    def distancias_euclidianas(self, a, b):
+        """get_heuristic vetorizado: 'a' e 'b' são arrays de ids densos (com broadcasting)."""
+        self.indexar()
+        d = self.coords[a] - self.coords[b]
+        return np.hypot(d[..., 0], d[..., 1]) / self.ESCALA_COORDENADAS
+
+    def limites_alt(self, a, b):
+        """get_heuristic_alt vetorizado sobre ids densos."""
+        h = self.distancias_euclidianas(a, b)
+        if self.landmarks is not None:
+            h = np.maximum(h, self.landmarks.limites_pares(self._colunas_landmarks[a], self._colunas_landmarks[b]))
+        return h
+
+    def no_mais_proximo(self, x, y):
+        """Nó do mapa mais próximo de umas coordenadas quaisquer (KD-tree)."""
+        self.indexar()
+        proximos = self.indice_espacial.mais_proximos(x, y, 1)
+        return proximos[0][0] if proximos else None
+
+    def postos(self, tipo):
+        """Todos os postos de 'tipo': as listas carregadores/bombas, se existirem, ou o tipo dos nós."""
+        postos = getattr(self, 'carregadores' if tipo == 'recarga' else 'bombas', None)
+        if postos is None:
+            postos = [n for n, d in self.nodes.items() if d['type'] == tipo]
+        return postos
+
+    def postos_proximos(self, no, tipo, k=1):
+        """Os k postos de 'tipo' ('recarga' / 'combustivel') mais perto de 'no' em linha reta."""
+        self.indexar()
+        indice = self._indices_postos.get(tipo)
+        if indice is None:
+            postos = self.postos(tipo)
+            indice = IndiceKD(postos, [self.nodes[n]['coords'] for n in postos])
+            self._indices_postos[tipo] = indice
+        x, y = self.nodes[no]['coords']
+        return [p for p, _ in indice.mais_proximos(x, y, k)]
+
+    def criar_grelha(self, divisoes=16):
+        """GrelhaEspacial vazia com células à escala do mapa (para pontos móveis)."""
+        self.indexar()
+        extensao = float(np.ptp(self.coords, axis=0).max()) if len(self.coords) else 1.0
+        return GrelhaEspacial(max(extensao / divisoes, 1e-9))
+
     def get_neighbors(self, node_id):
-        """Retorna os vizinhos de um nó"""
-        return self.graph.get(node_id, {}).keys()
+        """Retorna os vizinhos de um nó (linha do CSR)"""
+        return self.pesos_arestas().vizinhos(node_id)
     
     def get_distance(self, u, v):
         """Retorna a distância (custo) da aresta entre u e v."""
         # Se existir uma estrada direta
-        if u in self.graph and v in self.graph[u]:
-            return self.graph[u][v]['dist']
+        pesos = self.pesos_arestas()
+        aresta = pesos.id_aresta(u, v)
+        if aresta is not None:
+            return pesos.listas['dist'][aresta]
         # Se for o mesmo local, distância é 0
         if u == v:
             return 0
         # Se não houver ligação direta, retorna infinito
         return float('inf')
 
+    def get_distancia_rota(self, u, v):
+        """Distância (km) do caminho mais curto entre u e v na rede."""
+        return self.rotas.distancia(u, v)
+
+    def get_tempo_rota(self, u, v):
+        """Tempo (min) do caminho mais rápido entre u e v na rede."""
+        return self.rotas.tempo(u, v)
+
+    def get_caminho(self, u, v, peso='dist'):
+        """Lista de nós do caminho ótimo entre u e v (ou None)."""
+        return self.rotas.caminho(u, v, peso)
+
 
 
 cidade = Cidade()
@@ -1,17 +1,62 @@
-import osmnx as ox
-import networkx as nx
+import os
 import random
 import math
 from cidade import Cidade
+from compilado import MapaCompilado, caminho_compilado
+
+# Centro de Braga
+PONTO_MAPA = (41.55032, -8.42005)
+RAIO_MAPA = 700
+
 
 class CidadeOSM(Cidade):
-    def __init__(self):
+    ESCALA_COORDENADAS = 1000.0  # coordenadas projetadas em metros -> km
+    RUAS_ENGARRAFADAS = 8  # ruas engarrafadas em cada evento de trânsito
+    FATOR_ENGARRAFAMENTO = 5.0  # uma rua engarrafada fica 5x mais lenta
+
+    def __init__(self, ficheiro=None, pasta='cache'):
+        """
+        :param ficheiro: mapa local (.graphml ou .osm); sem ficheiro, descarrega o centro de Braga
+        :param pasta: onde fica o mapa compilado; os arranques seguintes já não usam o OSMnx
+        """
         super().__init__()
-        RAIO_MAPA = 700
+        origem = os.path.abspath(ficheiro) if ficheiro else f"ponto:{PONTO_MAPA[0]},{PONTO_MAPA[1]}:{RAIO_MAPA}"
+        caminho = caminho_compilado(origem, pasta)
+        self.pasta_mapa = caminho  # também guarda as tabelas ALT, as hierarquias (CH) e o fundo do visualizador
+
+        mapa = MapaCompilado.carregar(caminho)
+        if mapa is not None:
+            self.G = None  # o grafo OSMnx só existe quando o mapa é construído
+            mapa.preencher(self)
+            print(f" Mapa compilado carregado: {len(self.nodes)} nós.")
+        else:
+            self.G = self._ler_ficheiro(ficheiro) if ficheiro else self._descarregar()
+            self._preparar_grafo_osm()
+            self._converter_mapa()
+            MapaCompilado.de_cidade(self).guardar(caminho)
+
+        self._definir_pois()
+        self.preparar_landmarks(pasta=caminho)
+        self.preparar_hierarquias(pasta=caminho)
+        self.pesos_arestas()
+
+    @staticmethod
+    def _descarregar():
+        import osmnx as ox
         print(f" A descarregar o Centro de Braga (Raio {RAIO_MAPA}m)...")
+        return ox.graph_from_point(PONTO_MAPA, dist=RAIO_MAPA, network_type="drive")
+
+    @staticmethod
+    def _ler_ficheiro(ficheiro):
+        import osmnx as ox
+        print(f" A ler o mapa de {ficheiro}...")
+        if ficheiro.lower().endswith(".graphml"):
+            return ox.load_graphml(ficheiro)
+        return ox.graph_from_xml(ficheiro)
 
-        point = (41.55032, -8.42005)
-        self.G = ox.graph_from_point(point, dist=RAIO_MAPA, network_type="drive")
+    def _preparar_grafo_osm(self):
+        import osmnx as ox
+        import networkx as nx
 
         print(" A limpar nós isolados do mapa...")
         try:
@@ -26,13 +71,9 @@ class CidadeOSM(Cidade):
         self.G = ox.project_graph(self.G)
         print(f" Mapa carregado e limpo: {len(self.G.nodes)} nós.")
 
-        self._converter_mapa()
-        self._definir_pois()
-        
-        self.pesos_originais = {}
-
     def _converter_mapa(self):
-        for node_id, data in self.G.nodes(data=True):
+        # Nós por ordem de id, a mesma do mapa compilado (MapaCompilado.preencher)
+        for node_id, data in sorted(self.G.nodes(data=True), key=lambda item: item[0]):
             self.add_node(node_id, data['x'], data['y'], "rua")
 
         for u, v, data in self.G.edges(data=True):
@@ -59,51 +100,11 @@ class CidadeOSM(Cidade):
         if start_id not in self.nodes or goal_id not in self.nodes: return float('inf')
         x1, y1 = self.nodes[start_id]['coords']
         x2, y2 = self.nodes[goal_id]['coords']
-        return math.sqrt((x1 - x2) ** 2 + (y1 - y2) ** 2) / 1000.0
+        return math.sqrt((x1 - x2) ** 2 + (y1 - y2) ** 2) / self.ESCALA_COORDENADAS
 
     def simular_transito_dinamico(self):
-        # 1. Cache inicial dos pesos (se não existir)
-        if not self.pesos_originais:
-             for u, v in self.G.edges():
-                 if self.G.has_edge(u, v):
-                     data = self.G.get_edge_data(u, v)
-                     d = data[0] if 0 in data else data
-                     self.pesos_originais[(u,v)] = d.get('time', 1)
-
-        # 2. LIMPAR: Restaurar o trânsito normal em TODAS as ruas primeiro
-        # Isto evita que a cidade fique toda vermelha acumulada
-        for u, v in self.G.edges():
-            if not self.G.has_edge(u, v): continue
-            data = self.G.get_edge_data(u, v)
-            d = data[0] if 0 in data else data
-            original = self.pesos_originais.get((u,v), 1)
-            d['time'] = original
-
-        # 3. NOVO TRÂNSITO: Escolher apenas 5 a 10 ruas para engarrafar
-        arestas = list(self.G.edges())
-        # Engarrafa apenas 8 ruas aleatórias (para ser bem visível mas limpo)
-        amostra = random.sample(arestas, min(len(arestas), 8)) 
-
-        for u, v in amostra:
-            if not self.G.has_edge(u, v): continue
-            data = self.G.get_edge_data(u, v)
-            d = data[0] if 0 in data else data
-            
-            original = self.pesos_originais.get((u,v), 1)
-            # Torna a rua 5x mais lenta
-            d['time'] = original * 5
-
-    def get_arestas_engarrafadas(self):
-        engarrafadas = []
-        if not self.pesos_originais: return []
-        
-        for u, v in self.G.edges():
-            if not self.G.has_edge(u, v): continue
-            data = self.G.get_edge_data(u, v)
-            d = data[0] if 0 in data else data
-            
-            original = self.pesos_originais.get((u,v), 0)
-            # Se for significativamente mais lento que o original, está engarrafada
-            if original > 0 and d.get('time', 0) > original * 1.5:
-                engarrafadas.append((u, v))
-        return engarrafadas
\ No newline at end of file
+        # O trânsito anterior desaparece e engarrafam-se algumas ruas novas;
+        # só as ruas que entram ou saem do engarrafamento são atualizadas
+        pesos = self.pesos_arestas()
+        amostra = random.sample(range(len(pesos)), min(len(pesos), self.RUAS_ENGARRAFADAS))
+        return self.aplicar_transito({pesos.aresta(i): self.FATOR_ENGARRAFAMENTO for i in amostra})
@@ -0,0 +1,79 @@
+import os
+import shutil
+import hashlib
+import numpy as np
+from pesos import PesosArestas
+
+# Sobe quando o formato dos ficheiros muda (invalida mapas compilados antigos)
+VERSAO_FORMATO = 1
+PESOS = ('dist', 'time')
+
+
+def caminho_compilado(origem, pasta='cache'):
+    """
+    Pasta do mapa compilado para uma origem ('ponto:lat,lon:raio' ou caminho
+    de ficheiro). Para ficheiros, o tamanho e a data entram na chave, para
+    que uma versão nova do ficheiro volte a ser compilada.
+    """
+    chave = f"{VERSAO_FORMATO}|{origem}"
+    if os.path.isfile(origem):
+        info = os.stat(origem)
+        chave += f"|{info.st_size}|{info.st_mtime_ns}"
+    return os.path.join(pasta, f"mapa_{hashlib.sha1(chave.encode()).hexdigest()}")
+
+
+class MapaCompilado:
+    """
+    Grafo de uma Cidade em arrays NumPy, guardado como ficheiros .npy:
+      - nos[i]       id original do nó com id denso i (ordenados, como Cidade.indexar)
+      - coords[i]    (x, y) do nó i
+      - indptr, destinos   adjacência CSR: as arestas de i são destinos[indptr[i]:indptr[i+1]]
+      - dist, time   pesos das arestas, alinhados com 'destinos'
+    Ao carregar, os ficheiros são mapeados em memória (np.load com mmap_mode),
+    sem passar pelo OSMnx.
+    """
+
+    def __init__(self, nos, coords, indptr, destinos, pesos):
+        self.nos = nos
+        self.coords = coords
+        self.indptr = indptr
+        self.destinos = destinos
+        self.pesos = pesos  # {peso: array}
+
+    @classmethod
+    def de_cidade(cls, cidade):
+        pesos = cidade.pesos_arestas()
+        return cls(np.array(pesos.nos), np.array([cidade.nodes[n]['coords'] for n in pesos.nos], dtype=float),
+                   pesos.indptr, pesos.indices, {p: pesos.base[p] for p in PESOS})
+
+    def _arrays(self):
+        arrays = {'nos': self.nos, 'coords': self.coords, 'indptr': self.indptr, 'destinos': self.destinos}
+        arrays.update(self.pesos)
+        return arrays
+
+    def guardar(self, pasta):
+        """Escreve os arrays numa pasta temporária e troca-a de uma vez (nunca fica meio escrita)."""
+        temporaria = pasta + ".tmp"
+        shutil.rmtree(temporaria, ignore_errors=True)
+        os.makedirs(temporaria)
+        for nome, array in self._arrays().items():
+            np.save(os.path.join(temporaria, f"{nome}.npy"), array)
+        shutil.rmtree(pasta, ignore_errors=True)
+        os.replace(temporaria, pasta)
+
+    @classmethod
+    def carregar(cls, pasta):
+        """MapaCompilado com os arrays mapeados em memória, ou None se a pasta não existir."""
+        if not os.path.isdir(pasta): return None
+
+        def ler(nome):
+            return np.load(os.path.join(pasta, f"{nome}.npy"), mmap_mode='r')
+
+        return cls(ler('nos'), ler('coords'), ler('indptr'), ler('destinos'), {p: ler(p) for p in PESOS})
+
+    def preencher(self, cidade):
+        """Cria os nós na Cidade e entrega-lhe as arestas já em CSR (mesma ordem que a construção original)."""
+        nos = self.nos.tolist()
+        for n, (x, y) in zip(nos, self.coords.tolist()):
+            cidade.add_node(n, x, y, "rua")
+        cidade.usar_pesos(PesosArestas(nos, self.indptr, self.destinos, self.pesos))
@@ -0,0 +1,240 @@
+import os
+import heapq
+import numpy as np
+
+
+class HierarquiaContracao:
+    """
+    Contraction Hierarchies sobre as arestas de uma Cidade (PesosArestas).
+
+    Pré-processamento: contrai os nós por ordem de importância (diferença de
+    arestas + vizinhos já contraídos, com atualização preguiçosa), acrescentando
+    atalhos u -> w sempre que o único caminho mais curto passa pelo nó contraído.
+    Consulta: Dijkstra bidirecional só com arestas "para cima" na hierarquia.
+    Os atalhos guardam o nó do meio, o que permite desempacotar o caminho real.
+    """
+
+    LIMITE_TESTEMUNHA = 60  # nós fixados no máximo por procura de testemunha
+
+    def __init__(self, pesos, peso='dist'):
+        self.peso = peso
+        self.rank = {}
+        # Todas as arestas finais (originais + atalhos): {(u, v): (custo, meio)}
+        self.arestas = {}
+        self.num_atalhos = 0
+
+        saidas = {u: {} for u in pesos.nos}
+        entradas = {u: {} for u in pesos.nos}
+        for (u, v), w in zip(pesos.pares(), pesos.listas[peso]):
+            if u == v: continue
+            if w < saidas[u].get(v, (float('inf'),))[0]:
+                saidas[u][v] = (w, None)
+                entradas[v][u] = (w, None)
+        for u in saidas:
+            for v, aresta in saidas[u].items():
+                self.arestas[(u, v)] = aresta
+
+        self._contrair(saidas, entradas)
+        self._construir_grafos_de_consulta()
+
+    @classmethod
+    def carregar_ou_calcular(cls, pesos, peso='dist', pasta='cache'):
+        """Lê a hierarquia (ranks e atalhos) do disco se existir para este mapa; senão contrai e grava."""
+        caminho = os.path.join(pasta, f"ch_{pesos.assinatura(peso)}.npz")
+        if os.path.exists(caminho):
+            with np.load(caminho) as dados:
+                return cls._de_arrays(pesos.nos, peso, dados)
+
+        ch = cls(pesos, peso)
+        os.makedirs(pasta, exist_ok=True)
+        np.savez(caminho, **ch._arrays(pesos.indice))
+        return ch
+
+    def _arrays(self, indice):
+        """Ranks por id denso e arestas finais (origem, destino, custo, meio; -1 = aresta original)."""
+        rank = np.empty(len(indice), dtype=np.int64)
+        for n, r in self.rank.items():
+            rank[indice[n]] = r
+        arestas = [(indice[u], indice[v], w, -1 if meio is None else indice[meio])
+                   for (u, v), (w, meio) in self.arestas.items()]
+        origem, destino, custo, meio = zip(*arestas) if arestas else ((), (), (), ())
+        return {'rank': rank, 'origem': np.array(origem, dtype=np.int64), 'destino': np.array(destino, dtype=np.int64),
+                'custo': np.array(custo, dtype=float), 'meio': np.array(meio, dtype=np.int64),
+                'num_atalhos': np.array(self.num_atalhos)}
+
+    @classmethod
+    def _de_arrays(cls, nos, peso, dados):
+        ch = cls.__new__(cls)
+        ch.peso = peso
+        ch.rank = dict(zip(nos, dados['rank'].tolist()))
+        ch.arestas = {(nos[u], nos[v]): (w, None if m < 0 else nos[m])
+                      for u, v, w, m in zip(dados['origem'].tolist(), dados['destino'].tolist(),
+                                            dados['custo'].tolist(), dados['meio'].tolist())}
+        ch.num_atalhos = int(dados['num_atalhos'])
+        ch._construir_grafos_de_consulta()
+        return ch
+
+    # ------------------------------------------------------------------
+    # Pré-processamento
+    # ------------------------------------------------------------------
+    def _testemunha(self, saidas, origem, ignorar, limite, alvos):
+        """Dijkstra limitado a partir de 'origem' sem passar por 'ignorar'."""
+        dist = {origem: 0.0}
+        heap = [(0.0, origem)]
+        fixados = 0
+        por_encontrar = set(alvos)
+        while heap and por_encontrar and fixados < self.LIMITE_TESTEMUNHA:
+            d, u = heapq.heappop(heap)
+            if d > dist.get(u, float('inf')): continue
+            if d > limite: break
+            fixados += 1
+            por_encontrar.discard(u)
+            for v, (w, _) in saidas[u].items():
+                if v == ignorar: continue
+                nd = d + w
+                if nd < dist.get(v, float('inf')):
+                    dist[v] = nd
+                    heapq.heappush(heap, (nd, v))
+        return dist
+
+    def _atalhos_necessarios(self, saidas, entradas, v):
+        atalhos = []
+        if not entradas[v] or not saidas[v]: return atalhos
+        max_saida = max(w for w, _ in saidas[v].values())
+
+        for u, (w_uv, _) in entradas[v].items():
+            alvos = [x for x in saidas[v] if x != u]
+            if not alvos: continue
+            dist = self._testemunha(saidas, u, v, w_uv + max_saida, alvos)
+            for x in alvos:
+                via_v = w_uv + saidas[v][x][0]
+                if dist.get(x, float('inf')) > via_v:
+                    atalhos.append((u, x, via_v))
+        return atalhos
+
+    def _prioridade(self, saidas, entradas, v, contraidos_vizinhos):
+        atalhos = self._atalhos_necessarios(saidas, entradas, v)
+        removidas = len(saidas[v]) + len(entradas[v])
+        return len(atalhos) - removidas + contraidos_vizinhos.get(v, 0)
+
+    def _contrair(self, saidas, entradas):
+        contraidos_vizinhos = {}
+        heap = [(self._prioridade(saidas, entradas, v, contraidos_vizinhos), v) for v in saidas]
+        heapq.heapify(heap)
+        ordem = 0
+
+        while heap:
+            _, v = heapq.heappop(heap)
+            if v in self.rank: continue
+
+            # Atualização preguiçosa: se a prioridade piorou, volta para a heap
+            p = self._prioridade(saidas, entradas, v, contraidos_vizinhos)
+            if heap and p > heap[0][0]:
+                heapq.heappush(heap, (p, v))
+                continue
+
+            for u, x, w in self._atalhos_necessarios(saidas, entradas, v):
+                if w < saidas[u].get(x, (float('inf'),))[0]:
+                    saidas[u][x] = (w, v)
+                    entradas[x][u] = (w, v)
+                    self.arestas[(u, x)] = (w, v)
+                    self.num_atalhos += 1
+
+            self.rank[v] = ordem
+            ordem += 1
+
+            for u in entradas[v]:
+                del saidas[u][v]
+                contraidos_vizinhos[u] = contraidos_vizinhos.get(u, 0) + 1
+            for x in saidas[v]:
+                del entradas[x][v]
+                contraidos_vizinhos[x] = contraidos_vizinhos.get(x, 0) + 1
+            saidas[v] = {}
+            entradas[v] = {}
+
+    def _construir_grafos_de_consulta(self):
+        # cima[u]: arestas u -> v com rank[v] > rank[u] (procura para a frente)
+        # baixo[v]: arestas u -> v com rank[u] > rank[v], invertidas (procura para trás)
+        self.cima = {u: [] for u in self.rank}
+        self.baixo = {u: [] for u in self.rank}
+        for (u, v), (w, _) in self.arestas.items():
+            if self.rank[v] > self.rank[u]:
+                self.cima[u].append((v, w))
+            else:
+                self.baixo[v].append((u, w))
+
+    # ------------------------------------------------------------------
+    # Consultas
+    # ------------------------------------------------------------------
+    def _consulta(self, origem, destino):
+        if origem not in self.rank or destino not in self.rank: return float('inf'), None, None, None
+        if origem == destino: return 0.0, origem, {origem: None}, {destino: None}
+
+        dist = ({origem: 0.0}, {destino: 0.0})
+        pais = ({origem: None}, {destino: None})
+        heaps = ([(0.0, origem)], [(0.0, destino)])
+        grafos = (self.cima, self.baixo)
+        melhor, encontro = float('inf'), None
+
+        lado = 0
+        while heaps[0] or heaps[1]:
+            if not heaps[lado]: lado = 1 - lado
+            d, u = heapq.heappop(heaps[lado])
+            if d > dist[lado].get(u, float('inf')):
+                lado = 1 - lado
+                continue
+
+            outro = dist[1 - lado].get(u)
+            if outro is not None and d + outro < melhor:
+                melhor, encontro = d + outro, u
+
+            for v, w in grafos[lado][u]:
+                nd = d + w
+                if nd < dist[lado].get(v, float('inf')):
+                    dist[lado][v] = nd
+                    pais[lado][v] = u
+                    heapq.heappush(heaps[lado], (nd, v))
+
+            # Paragem: nenhuma das frentes pode melhorar o melhor encontro
+            topo_f = heaps[0][0][0] if heaps[0] else float('inf')
+            topo_b = heaps[1][0][0] if heaps[1] else float('inf')
+            if min(topo_f, topo_b) >= melhor: break
+            lado = 1 - lado
+
+        return melhor, encontro, pais[0], pais[1]
+
+    def distancia(self, origem, destino):
+        return self._consulta(origem, destino)[0]
+
+    def _desempacotar(self, u, v, saida):
+        meio = self.arestas[(u, v)][1]
+        if meio is None:
+            saida.append(v)
+        else:
+            self._desempacotar(u, meio, saida)
+            self._desempacotar(meio, v, saida)
+
+    def caminho(self, origem, destino):
+        """Lista de nós do caminho ótimo (com os atalhos desempacotados) ou None."""
+        return self.rota(origem, destino)[1]
+
+    def rota(self, origem, destino):
+        """(custo, caminho) com uma única consulta; caminho None se inalcançável."""
+        custo, encontro, pais_f, pais_b = self._consulta(origem, destino)
+        if encontro is None: return custo, None
+
+        subida = []
+        atual = encontro
+        while atual is not None:
+            subida.append(atual)
+            atual = pais_f[atual]
+        subida.reverse()
+        atual = pais_b[encontro]
+        while atual is not None:
+            subida.append(atual)
+            atual = pais_b[atual]
+
+        caminho = [subida[0]]
+        for u, v in zip(subida, subida[1:]):
+            self._desempacotar(u, v, caminho)
+        return custo, caminho
@@ -0,0 +1,118 @@
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+
+from problema import PENALIDADE_CLIENTE_INSATISFEITO, PENALIDADE_RISCO_BATERIA, TEMPO_OPERACAO
+
+CUSTO_INVIAVEL = 1e9  # par veículo/pedido impossível (autonomia ou prazo)
+
+
+def matriz_custos(estado, livres, pedidos, cidade):
+    """
+    Matriz (veículos livres x pedidos) com o custo de servir cada pedido,
+    pelas mesmas regras e caminhos de rota_servico: deslocação até à origem +
+    recolha + viagem até ao destino + entrega (calcular_custo_acao),
+    penalização ECO e de risco de bateria à chegada à origem. Pares sem
+    autonomia para a viagem ou que chegam depois do prazo ficam com
+    CUSTO_INVIAVEL. As deslocações vêm de um só Dijkstra para todos os
+    veículos (OraculoRotas.matriz) e as viagens da cache por pedido (viagem).
+    """
+    rotas = cidade.rotas
+    veiculos = [estado.veiculos[i] for i in livres]
+
+    # Por pedido: viagem origem -> destino e restrições
+    viagens = np.array([rotas.viagem(p.origem, p.destino) for p in pedidos], dtype=float)
+    viagem_km, viagem_min = viagens[:, 0], viagens[:, 1]
+    prazos = np.array([p.prazo for p in pedidos], dtype=float)
+    eco = np.array([p.prefere_eletrico for p in pedidos], dtype=bool)
+
+    # Por veículo: distância/tempo até cada origem
+    ate_km, ate_min = rotas.matriz([v.local for v in veiculos], [p.origem for p in pedidos])
+
+    # O custo de uma ação é linear em (km, min): coeficientes por veículo
+    coef = {}
+    for v in veiculos:
+        if v.tipo not in coef:
+            coef[v.tipo] = (estado.calcular_custo_acao(v, 1, 0)[0], estado.calcular_custo_acao(v, 0, 1)[0])
+    por_km = np.array([[coef[v.tipo][0]] for v in veiculos])
+    por_min = np.array([[coef[v.tipo][1]] for v in veiculos])
+    combustao = np.array([[v.tipo == "combustao"] for v in veiculos])
+    autonomia = np.array([[v.autonomia_atual] for v in veiculos])
+    reserva = np.array([[v.autonomia_max * 0.20] for v in veiculos])
+
+    custos = por_km * (ate_km + viagem_km) + por_min * (ate_min + viagem_min + 2 * TEMPO_OPERACAO)
+    custos += PENALIDADE_CLIENTE_INSATISFEITO * (combustao & eco)
+    custos += PENALIDADE_RISCO_BATERIA * (autonomia - ate_km < reserva)
+
+    inviavel = (autonomia < ate_km + viagem_km) | (estado.tempo_atual + ate_min > prazos)
+    inviavel |= ~np.isfinite(custos)
+    custos[inviavel] = CUSTO_INVIAVEL
+    return custos
+
+
+def atribuir(estado, livres, pedidos, cidade):
+    """Atribuição ótima (algoritmo húngaro/LAPJV): lista de (índice do veículo, pedido)."""
+    if not livres or not pedidos: return []
+    custos = matriz_custos(estado, livres, pedidos, cidade)
+    linhas, colunas = linear_sum_assignment(custos)
+    return [(livres[l], pedidos[c]) for l, c in zip(linhas, colunas) if custos[l, c] < CUSTO_INVIAVEL]
+
+
+def rota_servico(estado, i, pedido, cidade):
+    """
+    Estados [recolha, entrega] do veículo i, construídos com as ações do Estado.
+    Parte de um estado só com este pedido pendente: as rotas são independentes.
+    """
+    rotas = cidade.rotas
+    estado = estado.com_pedidos((pedido,))
+    veiculo = estado.veiculos[i]
+    _, dist, tempo = rotas.rota(veiculo.local, pedido.origem)
+    recolha = estado._novo_filho()
+    estado._mover(recolha, i, veiculo, pedido.origem, dist, tempo)
+    estado._recolher(recolha, i, veiculo, pedido)
+    recolha.acao_geradora = f"[{veiculo.id}] Recolheu passageiro em {pedido.origem} ({dist:.2f}km)"
+
+    veiculo = recolha.veiculos[i]
+    _, dist, tempo = rotas.rota(veiculo.local, pedido.destino)
+    entrega = recolha._novo_filho()
+    recolha._mover(entrega, i, veiculo, pedido.destino, dist, tempo)
+    recolha._entregar(entrega, i, veiculo)
+    entrega.acao_geradora = f"[{veiculo.id}] Entregou passageiro em {pedido.destino} ({dist:.2f}km)"
+    return [recolha, entrega]
+
+
+def rota_recarga(estado, i, cidade):
+    """Estado de ida ao posto mais próximo + recarga, ou [] se nenhum for alcançável."""
+    rotas = cidade.rotas
+    veiculo = estado.veiculos[i]
+    postos = estado._postos_para(veiculo, cidade)
+    if not postos or postos[0][1] > veiculo.autonomia_atual: return []
+    posto = postos[0][0]
+    rota = rotas.rota(veiculo.local, posto)
+    if rota is None or rota[1] > veiculo.autonomia_atual: return []
+
+    _, dist, tempo = rota
+    ns = estado._novo_filho()
+    estado._mover(ns, i, veiculo, posto, dist, tempo)
+    estado._recarregar(ns, i, veiculo)
+    acao_nome = "Recarregou" if veiculo.tipo == "eletrico" else "Abasteceu"
+    ns.acao_geradora = f"[{veiculo.id}] {acao_nome} em {posto} ({dist:.2f}km)"
+    return [ns]
+
+
+def planear(estado, livres, cidade):
+    """
+    Despacho decomposto: resolve a atribuição veículos livres x pedidos e
+    devolve {índice do veículo: [estados]} com a rota independente de cada um.
+    Veículos livres sem pedido e com pouca autonomia vão recarregar.
+    """
+    pedidos = list(estado.pedidos_pendentes)
+    atribuicoes = atribuir(estado, livres, pedidos, cidade)
+    base = estado.com_pedidos(())
+    planos = {i: rota_servico(base, i, pedido, cidade) for i, pedido in atribuicoes}
+
+    for i in livres:
+        v = estado.veiculos[i]
+        if i not in planos and v.autonomia_atual < v.autonomia_max * 0.20:
+            rota = rota_recarga(base, i, cidade)
+            if rota: planos[i] = rota
+    return planos
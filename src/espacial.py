@@ -0,0 +1,106 @@
+import math
+import numpy as np
+from scipy.spatial import cKDTree
+
+
+class IndiceKD:
+    """
+    Índice estático (KD-tree) sobre pontos com id: nós do mapa, carregadores,
+    bombas. Consultas k-mais-próximos em O(log N).
+    """
+
+    def __init__(self, ids, coords):
+        self.ids = list(ids)
+        self.arvore = cKDTree(np.asarray(coords, dtype=float).reshape(-1, 2)) if self.ids else None
+
+    def __len__(self):
+        return len(self.ids)
+
+    def mais_proximos(self, x, y, k=1):
+        """Lista [(id, distância)] dos k pontos mais próximos de (x, y), por ordem."""
+        if self.arvore is None: return []
+        k = min(k, len(self.ids))
+        dist, pos = self.arvore.query((x, y), k=k)
+        if k == 1: dist, pos = [dist], [pos]
+        return [(self.ids[p], d) for p, d in zip(pos, dist)]
+
+    def distancias_minimas(self, coords):
+        """Distância de cada ponto de 'coords' (M x 2) ao ponto do índice mais próximo."""
+        if self.arvore is None: return np.full(len(coords), np.inf)
+        return self.arvore.query(coords, k=1)[0]
+
+
+class GrelhaEspacial:
+    """
+    Índice dinâmico em grelha uniforme para pontos que se movem (táxis).
+    Atualizar a posição de um ponto é O(1); os k mais próximos são procurados
+    em anéis de células à volta do ponto de consulta.
+    """
+
+    def __init__(self, tamanho_celula):
+        self.tamanho = float(tamanho_celula)
+        self.celulas = {}  # {(cx, cy): {id: (x, y)}}
+        self.posicoes = {}  # {id: (x, y, (cx, cy))}
+
+    def _celula(self, x, y):
+        return int(math.floor(x / self.tamanho)), int(math.floor(y / self.tamanho))
+
+    def __len__(self):
+        return len(self.posicoes)
+
+    def atualizar(self, id_ponto, x, y):
+        """Insere ou move um ponto."""
+        c = self._celula(x, y)
+        antigo = self.posicoes.get(id_ponto)
+        if antigo is not None and antigo[2] != c:
+            self._tirar_da_celula(id_ponto, antigo[2])
+        self.celulas.setdefault(c, {})[id_ponto] = (x, y)
+        self.posicoes[id_ponto] = (x, y, c)
+
+    def remover(self, id_ponto):
+        antigo = self.posicoes.pop(id_ponto, None)
+        if antigo is not None: self._tirar_da_celula(id_ponto, antigo[2])
+
+    def _tirar_da_celula(self, id_ponto, c):
+        celula = self.celulas[c]
+        del celula[id_ponto]
+        if not celula: del self.celulas[c]
+
+    def mais_proximos(self, x, y, k=1, aceitar=None):
+        """
+        [(id, distância)] dos k pontos mais próximos de (x, y) que passam em
+        'aceitar(id)' (opcional). Para quando o anel seguinte já não pode ter
+        pontos mais perto do que o k-ésimo encontrado.
+        """
+        if not self.posicoes: return []
+        cx, cy = self._celula(x, y)
+        melhores = []
+        vistos = 0
+        raio = 0
+        while vistos < len(self.posicoes):
+            for c in self._anel(cx, cy, raio):
+                celula = self.celulas.get(c)
+                if not celula: continue
+                vistos += len(celula)
+                for id_ponto, (px, py) in celula.items():
+                    if aceitar is not None and not aceitar(id_ponto): continue
+                    melhores.append((math.hypot(px - x, py - y), id_ponto))
+            if len(melhores) >= k:
+                melhores.sort()
+                # Pontos fora do quadrado já visto estão a mais de raio * tamanho
+                if melhores[k - 1][0] <= raio * self.tamanho: break
+            raio += 1
+        melhores.sort()
+        return [(id_ponto, d) for d, id_ponto in melhores[:k]]
+
+    @staticmethod
+    def _anel(cx, cy, raio):
+        if raio == 0:
+            yield cx, cy
+            return
+        for dx in range(-raio, raio + 1):
+            yield cx + dx, cy - raio
+            yield cx + dx, cy + raio
+        for dy in range(-raio + 1, raio):
+            yield cx - raio, cy + dy
+            yield cx + raio, cy + dy
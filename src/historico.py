@@ -0,0 +1,434 @@
+import json
+import mmap
+import struct
+import numpy as np
+
+from modelos import Pedido, EstadoVeiculo
+from problema import Estado
+
+# Frames por bloco: cada bloco começa num keyframe (estado completo) e guarda
+# só as diferenças nos frames seguintes
+FRAMES_POR_BLOCO = 64
+
+# Ficheiro de replay: cabeçalho, blocos (metadados JSON + arrays) e, no fim, o índice dos blocos
+MAGICO = b'TGREPLAY'
+MAGICO_BLOCO = b'BLOC'
+MAGICO_INDICE = b'TGINDICE'
+VERSAO_REPLAY = 2
+ALINHAMENTO = 8  # os arrays começam em múltiplos de 8 bytes (np.frombuffer sem cópia)
+
+# Os locais são guardados como ids densos dos nós (Cidade.indexar), qualquer que seja o tipo dos ids
+TIPOS_COLUNAS = {
+    'k_local': np.int32, 'k_autonomia': np.float64, 'k_ocupado': np.bool_, 'k_grupo': np.int32,
+    'k_pendentes': np.int64, 'tempo': np.int64, 'dinheiro': np.float64,
+    'd_inicio': np.int64, 'd_veiculo': np.int32, 'd_local': np.int32, 'd_autonomia': np.float64,
+    'd_ocupado': np.bool_, 'd_grupo': np.int32,
+    'p_inicio': np.int64, 'p_pedido': np.int64, 'p_entrou': np.int8,
+}
+
+
+class BlocoHistorico:
+    """
+    Frames consecutivos do histórico em arrays NumPy (ver TIPOS_COLUNAS):
+      - k_*: keyframe, o estado completo da frota no primeiro frame do bloco
+        (uma entrada por veículo) e k_pendentes, os ids dos pedidos pendentes
+      - tempo, dinheiro: uma entrada por frame
+      - d_*: alterações dos veículos em CSR; as do frame k (face ao frame k-1)
+        são as linhas d_inicio[k]:d_inicio[k+1]
+      - p_*: entradas (p_entrou=1) e saídas de pedidos pendentes, em CSR
+    Os locais (k_local/d_local) são ids densos: 'nos' converte-os de volta.
+    Os alertas e as mudanças de trânsito são raros e ficam em dicionários
+    {frame no bloco: valor}; 'transito_inicial' é o conjunto ativo no keyframe.
+    Os grupos de passageiros a bordo (tuplos de ids; k_grupo/d_grupo são
+    índices nesta lista, 0 = vazio) e os Pedidos referidos também são do
+    bloco: qualquer frame reconstrói-se só com o seu bloco, a partir do
+    keyframe e de no máximo FRAMES_POR_BLOCO - 1 deltas.
+    """
+
+    def __init__(self, arrays, alertas, transito_inicial, transito, grupos, pedidos, nos):
+        self.arrays = arrays  # {coluna: array}
+        self.nos = nos  # id do nó de cada id denso (partilhado entre blocos)
+        self.alertas = alertas
+        self.transito_inicial = transito_inicial
+        self.transito = transito
+        self.grupos = grupos
+        self.pedidos = pedidos  # {id: Pedido}
+
+    def __len__(self):
+        return len(self.arrays['tempo'])
+
+    def veiculos(self, k):
+        """(locais, autonomias, ocupados, grupos) da frota no frame k do bloco."""
+        a = self.arrays
+        colunas = [a['k_local'].copy(), a['k_autonomia'].copy(), a['k_ocupado'].copy(), a['k_grupo'].copy()]
+        inicio, fim = int(a['d_inicio'][1]), int(a['d_inicio'][k + 1])
+        if fim > inicio:
+            # Um veículo pode mudar em vários frames: vale a última alteração
+            veiculo = a['d_veiculo'][inicio:fim][::-1]
+            veiculo, pos = np.unique(veiculo, return_index=True)
+            pos = fim - 1 - pos
+            for coluna, nome in zip(colunas, ('d_local', 'd_autonomia', 'd_ocupado', 'd_grupo')):
+                coluna[veiculo] = a[nome][pos]
+        return colunas
+
+    def pendentes(self, k):
+        """Ids dos pedidos pendentes no frame k do bloco, por ordem de chegada."""
+        a = self.arrays
+        ids = dict.fromkeys(a['k_pendentes'].tolist())
+        inicio, fim = int(a['p_inicio'][1]), int(a['p_inicio'][k + 1])
+        for pedido, entrou in zip(a['p_pedido'][inicio:fim].tolist(), a['p_entrou'][inicio:fim].tolist()):
+            if entrou: ids[pedido] = None
+            else: ids.pop(pedido, None)
+        return list(ids)
+
+    def transito_em(self, k):
+        atual = self.transito_inicial
+        for j, conjunto in self.transito.items():  # por ordem de frame
+            if j > k: break
+            atual = conjunto
+        return atual
+
+    def estado(self, k, frota):
+        """
+        Estado do frame k (o mesmo que Simulador._gravar_snapshot construía).
+        'frota' descreve os veículos: [(id, tipo, autonomia_max, capacidade)].
+        """
+        locais, autonomias, ocupados, grupos = (c.tolist() for c in self.veiculos(k))
+        nos = self.nos
+        locais = [nos[i] for i in locais]
+        pedidos = self.pedidos
+        veiculos = [EstadoVeiculo(id_v, tipo, local, autonomia, autonomia_max, capacidade, ocupado,
+                                  tuple(pedidos[p] for p in self.grupos[g]))
+                    for (id_v, tipo, autonomia_max, capacidade), local, autonomia, ocupado, g
+                    in zip(frota, locais, autonomias, ocupados, grupos)]
+        pendentes = [pedidos[p] for p in self.pendentes(k)]
+        tempo = int(self.arrays['tempo'][k])
+
+        estado = Estado(veiculos, pendentes, tempo, alerta=self.alertas.get(k), arestas_transito=self.transito_em(k))
+        estado.total_dinheiro = float(self.arrays['dinheiro'][k])
+        estado.acao_geradora = f"Min: {tempo}"
+        if pendentes: estado.acao_geradora += f" | {len(pendentes)} Pend"
+        return estado
+
+
+class HistoricoSimulacao:
+    """
+    Histórico de uma simulação, um frame por snapshot, guardado por blocos de
+    keyframe + deltas colunares (BlocoHistorico) em vez de um Estado com a
+    frota inteira por minuto. A memória cresce com o que muda (veículos que se
+    movem, pedidos que entram e saem), não com frota x duração.
+    Comporta-se como uma lista só de leitura de Estados: historico[i] monta o
+    Estado do frame i quando é pedido (slider, animação).
+    Com 'ficheiro', cada bloco completo é escrito no replay em disco e largado
+    da memória (só o bloco em construção fica em RAM); os frames já escritos
+    são lidos do ficheiro com um LeitorReplay. Chamar fechar() no fim.
+    """
+
+    def __init__(self, frota, cidade, ficheiro=None):
+        self.frota = [(v.id, v.tipo, v.autonomia_max, v.capacidade) for v in frota]
+        self.indice = cidade.indexar()  # {nó: id denso}, para guardar os locais em colunas inteiras
+        self.nos = list(self.indice)
+        self.blocos = []
+        self.total = 0
+        self.escritor = EscritorReplay(ficheiro, self.frota, self.nos) if ficheiro is not None else None
+        self._leitor = None
+
+        # Último estado gravado (para calcular os deltas)
+        self._locais = [None] * len(frota)
+        self._autonomias = [None] * len(frota)
+        self._ocupados = [None] * len(frota)
+        self._grupos = [None] * len(frota)
+        self._pendentes = {}
+        self._transito = frozenset()
+        self._aberto = None  # colunas do bloco em construção (listas)
+        self._bloco_aberto = None  # cache do bloco em construção congelado
+
+    def __len__(self):
+        return self.total
+
+    def _grupo(self, passageiros):
+        if not passageiros: return 0
+        aberto = self._aberto
+        ids = tuple(p.id for p in passageiros)
+        g = aberto['indice_grupos'].get(ids)
+        if g is None:
+            for p in passageiros: aberto['pedidos'].setdefault(p.id, p)
+            g = aberto['indice_grupos'][ids] = len(aberto['grupos'])
+            aberto['grupos'].append(ids)
+        return g
+
+    def gravar(self, tempo, frota, pendentes, dinheiro, alerta=None, transito=frozenset()):
+        """Acrescenta um frame com o estado atual da simulação."""
+        k = self.total % FRAMES_POR_BLOCO
+        if k == 0: self._abrir_bloco(transito)
+        aberto = self._aberto
+        aberto['tempo'].append(tempo)
+        aberto['dinheiro'].append(dinheiro)
+
+        locais, autonomias, ocupados, grupos = self._locais, self._autonomias, self._ocupados, self._grupos
+        d_veiculo, d_local, d_autonomia = aberto['d_veiculo'], aberto['d_local'], aberto['d_autonomia']
+        d_ocupado, d_grupo = aberto['d_ocupado'], aberto['d_grupo']
+        indice = self.indice
+        for i, v in enumerate(frota):
+            g = self._grupo(v.passageiros_a_bordo)
+            local = indice[v.local]
+            if (local != locais[i] or v.autonomia_atual != autonomias[i] or v.ocupado != ocupados[i]
+                    or g != grupos[i]):
+                locais[i], autonomias[i], ocupados[i], grupos[i] = local, v.autonomia_atual, v.ocupado, g
+                if k:
+                    d_veiculo.append(i)
+                    d_local.append(local)
+                    d_autonomia.append(v.autonomia_atual)
+                    d_ocupado.append(v.ocupado)
+                    d_grupo.append(g)
+        aberto['d_inicio'].append(len(d_veiculo))
+
+        atuais = {p.id: p for p in pendentes}
+        if k == 0: aberto['pedidos'].update(atuais)
+        if atuais.keys() != self._pendentes.keys():
+            for pid, p in atuais.items():
+                if pid not in self._pendentes:
+                    aberto['pedidos'].setdefault(pid, p)
+                    if k:
+                        aberto['p_pedido'].append(pid)
+                        aberto['p_entrou'].append(1)
+            for pid in self._pendentes:
+                if pid not in atuais and k:
+                    aberto['p_pedido'].append(pid)
+                    aberto['p_entrou'].append(0)
+            self._pendentes = dict.fromkeys(atuais)
+        aberto['p_inicio'].append(len(aberto['p_pedido']))
+
+        if alerta: aberto['alertas'][k] = alerta
+        if transito is not self._transito:
+            if k: aberto['transito'][k] = transito
+            self._transito = transito
+
+        if k == 0:
+            aberto['k_local'] = list(locais)
+            aberto['k_autonomia'] = list(autonomias)
+            aberto['k_ocupado'] = list(ocupados)
+            aberto['k_grupo'] = list(grupos)
+            aberto['k_pendentes'] = list(self._pendentes)
+        self.total += 1
+        self._bloco_aberto = None
+        if k == FRAMES_POR_BLOCO - 1: self._fechar_bloco()
+
+    def _abrir_bloco(self, transito):
+        self._aberto = {nome: [] for nome in TIPOS_COLUNAS}
+        self._aberto.update({'d_inicio': [0], 'p_inicio': [0], 'alertas': {}, 'transito': {},
+                             'transito_inicial': transito, 'grupos': [()], 'indice_grupos': {(): 0},
+                             'pedidos': {}})
+        # Os grupos são do bloco: o keyframe volta a registar os de todos os veículos
+        self._grupos = [None] * len(self.frota)
+
+    def _congelar(self, aberto):
+        arrays = {nome: np.array(aberto[nome], dtype=tipo) for nome, tipo in TIPOS_COLUNAS.items()}
+        return BlocoHistorico(arrays, dict(aberto['alertas']), aberto['transito_inicial'], dict(aberto['transito']),
+                              list(aberto['grupos']), dict(aberto['pedidos']), self.nos)
+
+    def _fechar_bloco(self):
+        bloco = self._congelar(self._aberto)
+        self._aberto = None
+        if self.escritor is not None:
+            self.escritor.escrever_bloco(bloco)
+        else:
+            self.blocos.append(bloco)
+
+    def fechar(self):
+        """Escreve o bloco em construção e o índice no replay (sem ficheiro não faz nada)."""
+        if self.escritor is None or self.escritor.fechado: return
+        if self._aberto is not None: self._fechar_bloco()
+        self.escritor.fechar(self.total)
+
+    def bloco(self, b):
+        """Bloco b (o último pode estar ainda em construção)."""
+        gravados = len(self.blocos) if self.escritor is None else self.escritor.blocos
+        if b >= gravados:
+            if self._bloco_aberto is None: self._bloco_aberto = self._congelar(self._aberto)
+            return self._bloco_aberto
+        if self.escritor is None: return self.blocos[b]
+
+        if self._leitor is None or self._leitor.num_blocos < gravados:
+            if self._leitor is not None: self._leitor.fechar()
+            self.escritor.descarregar()
+            self._leitor = LeitorReplay(self.escritor.caminho)
+        return self._leitor.bloco(b)
+
+    def __getitem__(self, frame):
+        if frame < 0: frame += self.total
+        if not 0 <= frame < self.total: raise IndexError(frame)
+        b, k = divmod(frame, FRAMES_POR_BLOCO)
+        return self.bloco(b).estado(k, self.frota)
+
+    def memoria_bytes(self):
+        """Bytes dos arrays dos blocos guardados em memória (sem os dados fixos)."""
+        return sum(a.nbytes for bloco in self.blocos for a in bloco.arrays.values())
+
+
+# =============================================================================
+# Replay em disco
+# =============================================================================
+def _alinhar(n):
+    return -n % ALINHAMENTO
+
+
+class EscritorReplay:
+    """
+    Escreve um replay bloco a bloco, à medida que a simulação corre:
+      cabeçalho   MAGICO, versão (u32), tamanho (u64) + JSON com a frota, os ids dos nós (pela
+                  ordem dos ids densos das colunas de locais) e FRAMES_POR_BLOCO
+      bloco       MAGICO_BLOCO, tamanho dos metadados (u64) e dos dados (u64), metadados JSON
+                  (alertas, trânsito, grupos, pedidos e posição/tipo de cada array) e os arrays
+      fim         índice com a posição de cada bloco (u64), nº de blocos e de frames (u64) e MAGICO_INDICE
+    Cada bloco fica descarregado no disco quando é escrito; se o processo morrer
+    antes de fechar(), o LeitorReplay reconstrói o índice percorrendo os blocos.
+    """
+
+    def __init__(self, caminho, frota, nos):
+        self.caminho = caminho
+        self.posicoes = []
+        self.fechado = False
+        cabecalho = json.dumps({'frames_por_bloco': FRAMES_POR_BLOCO, 'frota': frota, 'nos': nos}).encode()
+        self.f = open(caminho, 'wb')
+        self.f.write(MAGICO + struct.pack('<IQ', VERSAO_REPLAY, len(cabecalho)) + cabecalho)
+        self.f.write(b'\0' * _alinhar(self.f.tell()))
+
+    @property
+    def blocos(self):
+        return len(self.posicoes)
+
+    def escrever_bloco(self, bloco):
+        dados = []
+        descricao = []
+        pos = 0
+        for nome in TIPOS_COLUNAS:
+            array = np.ascontiguousarray(bloco.arrays[nome])
+            descricao.append([nome, array.dtype.str, len(array), pos])
+            dados.append(array.tobytes())
+            dados.append(b'\0' * _alinhar(array.nbytes))
+            pos += array.nbytes + _alinhar(array.nbytes)
+        meta = json.dumps({
+            'frames': len(bloco),
+            'arrays': descricao,
+            'alertas': bloco.alertas,
+            'transito_inicial': sorted(bloco.transito_inicial),
+            'transito': {k: sorted(conjunto) for k, conjunto in bloco.transito.items()},
+            'grupos': bloco.grupos,
+            'pedidos': [[p.id, p.origem, p.destino, p.passageiros, p.prazo, p.tempo_criacao, p.prefere_eletrico]
+                        for p in bloco.pedidos.values()],
+        }).encode()
+        meta += b' ' * _alinhar(len(meta))
+
+        self.posicoes.append(self.f.tell())
+        self.f.write(MAGICO_BLOCO + struct.pack('<QQ', len(meta), pos) + meta)
+        self.f.write(b'\0' * _alinhar(self.f.tell()))
+        self.f.write(b''.join(dados))
+        self.descarregar()
+
+    def descarregar(self):
+        if not self.fechado: self.f.flush()
+
+    def fechar(self, total_frames):
+        indice = np.array(self.posicoes, dtype='<u8').tobytes()
+        self.f.write(indice + struct.pack('<QQ', len(self.posicoes), total_frames) + MAGICO_INDICE)
+        self.f.close()
+        self.fechado = True
+
+
+class LeitorReplay:
+    """
+    Replay em disco aberto com mmap, com a mesma interface de lista de Estados
+    do HistoricoSimulacao (o VisualizadorInterativo aceita qualquer um). Ir
+    para um frame custa O(1): a posição do bloco vem do índice e os arrays são
+    vistas sobre o mmap (np.frombuffer), sem ler o resto do ficheiro. O último
+    bloco lido fica em cache, para a animação frame a frame.
+    """
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+        with open(caminho, 'rb') as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        mm = self.mm
+        if mm[:len(MAGICO)] != MAGICO: raise ValueError(f"{caminho} não é um replay")
+        versao, tamanho = struct.unpack_from('<IQ', mm, len(MAGICO))
+        if versao != VERSAO_REPLAY: raise ValueError(f"versão de replay {versao} não suportada")
+        inicio = len(MAGICO) + 12
+        cabecalho = json.loads(mm[inicio:inicio + tamanho])
+        self.frames_por_bloco = cabecalho['frames_por_bloco']
+        self.frota = [tuple(v) for v in cabecalho['frota']]
+        self.nos = cabecalho['nos']
+        primeiro_bloco = inicio + tamanho + _alinhar(inicio + tamanho)
+
+        if mm[-len(MAGICO_INDICE):] == MAGICO_INDICE:
+            fim = len(mm) - len(MAGICO_INDICE) - 16
+            self.num_blocos, self.total = struct.unpack_from('<QQ', mm, fim)
+            self.posicoes = np.frombuffer(mm, dtype='<u8', count=self.num_blocos,
+                                          offset=fim - 8 * self.num_blocos).tolist()
+        else:
+            self._percorrer(primeiro_bloco)
+        self._cache = (None, None)
+        self._transito = frozenset()
+
+    def _percorrer(self, pos):
+        # Ficheiro sem índice (simulação interrompida ou ainda a decorrer): só os blocos completos
+        self.posicoes = []
+        ultimo = 0
+        cabeca = len(MAGICO_BLOCO) + 16
+        while pos + cabeca <= len(self.mm) and self.mm[pos:pos + len(MAGICO_BLOCO)] == MAGICO_BLOCO:
+            tamanho_meta, tamanho_dados = struct.unpack_from('<QQ', self.mm, pos + len(MAGICO_BLOCO))
+            inicio_dados = pos + cabeca + tamanho_meta
+            inicio_dados += _alinhar(inicio_dados)
+            if inicio_dados + tamanho_dados > len(self.mm): break
+            self.posicoes.append(pos)
+            ultimo = json.loads(self.mm[pos + cabeca:pos + cabeca + tamanho_meta])['frames']
+            pos = inicio_dados + tamanho_dados
+        self.num_blocos = len(self.posicoes)
+        self.total = max(0, self.num_blocos - 1) * self.frames_por_bloco + ultimo
+
+    def __len__(self):
+        return self.total
+
+    def _partilhar(self, arestas):
+        # Conjuntos iguais entre blocos passam a ser o mesmo objeto (o visualizador compara identidade)
+        conjunto = frozenset(map(tuple, arestas))
+        if conjunto == self._transito: return self._transito
+        self._transito = conjunto
+        return conjunto
+
+    def bloco(self, b):
+        if self._cache[0] == b: return self._cache[1]
+        mm = self.mm
+        pos = self.posicoes[b]
+        cabeca = len(MAGICO_BLOCO) + 16
+        tamanho_meta, _ = struct.unpack_from('<QQ', mm, pos + len(MAGICO_BLOCO))
+        meta = json.loads(mm[pos + cabeca:pos + cabeca + tamanho_meta])
+        inicio_dados = pos + cabeca + tamanho_meta
+        inicio_dados += _alinhar(inicio_dados)
+
+        arrays = {nome: np.frombuffer(mm, dtype=np.dtype(tipo), count=n, offset=inicio_dados + desvio)
+                  for nome, tipo, n, desvio in meta['arrays']}
+        pedidos = {p[0]: Pedido(p[0], p[1], p[2], p[3], p[4], p[5], prefere_eletrico=p[6]) for p in meta['pedidos']}
+        transito_inicial = self._partilhar(meta['transito_inicial'])
+        transito = {int(k): self._partilhar(arestas) for k, arestas in meta['transito'].items()}
+        bloco = BlocoHistorico(arrays, {int(k): texto for k, texto in meta['alertas'].items()},
+                               transito_inicial, transito, [tuple(g) for g in meta['grupos']], pedidos, self.nos)
+        self._cache = (b, bloco)
+        return bloco
+
+    def __getitem__(self, frame):
+        if frame < 0: frame += self.total
+        if not 0 <= frame < self.total: raise IndexError(frame)
+        b, k = divmod(frame, self.frames_por_bloco)
+        return self.bloco(b).estado(k, self.frota)
+
+    def corresponde(self, cidade):
+        """True se o replay foi gravado sobre o mapa de 'cidade' (os mesmos nós pela mesma ordem)."""
+        return self.nos == list(cidade.indexar())
+
+    def fechar(self):
+        self._cache = (None, None)
+        try:
+            self.mm.close()
+        except BufferError:
+            pass  # ainda há Estados/arrays a usar o mmap; fecha quando forem libertados
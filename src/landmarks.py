@@ -0,0 +1,106 @@
+import os
+import hashlib
+import numpy as np
+from scipy.sparse import csgraph
+
+
+class Landmarks:
+    """
+    Pré-processamento ALT (A*, Landmarks, Triangle inequality).
+    Para K nós de referência L guarda, em arrays NumPy (K x N):
+      - de_landmark[k, i]   = d(L_k, i)
+      - para_landmark[k, i] = d(i, L_k)
+    e deriva limites inferiores admissíveis para d(u, t):
+      d(u, t) >= max_k max(d(L_k, t) - d(L_k, u), d(u, L_k) - d(t, L_k))
+    """
+
+    def __init__(self, nos, landmarks, de_landmark, para_landmark):
+        self.nos = list(nos)
+        self.indice = {n: i for i, n in enumerate(self.nos)}
+        self.landmarks = list(landmarks)
+        self.de_landmark = de_landmark
+        self.para_landmark = para_landmark
+        # Colunas por nó em listas Python: consultas isoladas sem overhead do NumPy
+        self._de_por_no = de_landmark.T.tolist()
+        self._para_por_no = para_landmark.T.tolist()
+
+    @classmethod
+    def calcular(cls, cidade, k=8, peso='dist'):
+        """Escolhe K landmarks pela heurística 'mais afastado' e calcula as tabelas (Dijkstra do SciPy sobre o CSR)."""
+        pesos = cidade.pesos_arestas()
+        nos = pesos.nos
+        matriz = pesos.matriz(peso)
+        inversa = matriz.T.tocsr()
+        k = min(k, len(nos))
+
+        landmarks, de, para = [], [], []
+        # Primeiro landmark: o nó mais afastado de um nó arbitrário (determinístico)
+        d0 = csgraph.dijkstra(matriz, indices=0)
+        candidato = int(np.argmax(np.where(np.isfinite(d0), d0, -1)))
+        min_dist = np.full(len(nos), np.inf)
+
+        while len(landmarks) < k:
+            landmarks.append(candidato)
+            de.append(csgraph.dijkstra(matriz, indices=candidato))
+            para.append(csgraph.dijkstra(inversa, indices=candidato))
+
+            # Próximo: o nó que maximiza a distância ao landmark mais próximo
+            min_dist = np.minimum(min_dist, de[-1])
+            score = np.where(np.isfinite(min_dist), min_dist, -1)
+            score[landmarks] = -1
+            candidato = int(np.argmax(score))
+            if score[candidato] <= 0: break
+
+        return cls(nos, [nos[i] for i in landmarks], np.vstack(de), np.vstack(para))
+
+    @staticmethod
+    def assinatura(cidade, k, peso='dist'):
+        """Identifica o mapa (arestas e pesos) para validar tabelas guardadas em disco."""
+        return hashlib.sha1(f"{k}|{cidade.pesos_arestas().assinatura(peso)}".encode()).hexdigest()
+
+    @classmethod
+    def carregar_ou_calcular(cls, cidade, k=8, peso='dist', pasta='cache'):
+        """Lê as tabelas do disco se existirem para este mapa; senão calcula e grava."""
+        caminho = os.path.join(pasta, f"landmarks_{cls.assinatura(cidade, k, peso)}.npz")
+        if os.path.exists(caminho):
+            dados = np.load(caminho)
+            return cls(dados['nos'].tolist(), dados['landmarks'].tolist(), dados['de'], dados['para'])
+
+        lm = cls.calcular(cidade, k, peso)
+        os.makedirs(pasta, exist_ok=True)
+        np.savez(caminho, nos=np.array(lm.nos), landmarks=np.array(lm.landmarks),
+                 de=lm.de_landmark, para=lm.para_landmark)
+        return lm
+
+    def limite_inferior(self, u, t):
+        iu = self.indice.get(u)
+        it = self.indice.get(t)
+        if iu is None or it is None: return 0.0
+        melhor = 0.0
+        for a, b in zip(self._de_por_no[it], self._de_por_no[iu]):
+            if a - b > melhor: melhor = a - b
+        for a, b in zip(self._para_por_no[iu], self._para_por_no[it]):
+            if a - b > melhor: melhor = a - b
+        return melhor
+
+    @staticmethod
+    def _maior_termo(frente, tras):
+        # Num grafo que não é fortemente conexo um landmark pode não alcançar nenhum
+        # dos dois nós: inf - inf dá NaN, que (como em limite_inferior) não conta
+        return np.fmax(np.fmax.reduce(np.fmax(frente, tras), axis=0), 0.0)
+
+    def limites_pares(self, iu, it):
+        """Limites para arrays de colunas 'iu' -> 'it' (com broadcasting entre si)."""
+        with np.errstate(invalid='ignore'):
+            frente = self.de_landmark[:, it] - self.de_landmark[:, iu]
+            tras = self.para_landmark[:, iu] - self.para_landmark[:, it]
+        return self._maior_termo(frente, tras)
+
+    def limites_inferiores(self, origens, t):
+        """Versão vetorizada: limites de várias origens para o mesmo destino."""
+        iu = np.fromiter((self.indice[u] for u in origens), dtype=np.int64)
+        it = self.indice[t]
+        with np.errstate(invalid='ignore'):
+            frente = self.de_landmark[:, it:it + 1] - self.de_landmark[:, iu]
+            tras = self.para_landmark[:, iu] - self.para_landmark[:, it:it + 1]
+        return self._maior_termo(frente, tras)
@@ -1,23 +1,41 @@
 import time
+import hashlib
+import json
 import matplotlib.pyplot as plt
-import matplotlib.animation as animation
 from matplotlib.widgets import Button, Slider
 from matplotlib.lines import Line2D
 from matplotlib.collections import LineCollection
-import osmnx as ox
+from matplotlib.colors import to_rgba
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
 import numpy as np
+import os
 import random
+import sys
 
 from cidade_osm import CidadeOSM
 from modelos import Veiculo, Pedido
-from problema import Estado
+from problema import Estado, MODO_MICRO, MODO_MACRO
 import algoritmos
-from simulador import Simulador
+from simulador import Simulador, PLANEAMENTO_PROCESSO, PLANEAMENTO_ATRIBUICAO
+from historico import LeitorReplay
 
 COR_FUNDO_JANELA = '#F7F7F7'
 COR_FUNDO_MAPA = '#FFFFFF'
 COR_TEXTO = '#666666'
 COR_BOTOES = '#EFEFEF'
+COR_ELETRICO = '#66BB6A'
+COR_COMBUSTAO = '#42A5F5'
+COR_OCUPADO = '#EF5350'
+COR_RESERVA = '#FFA726'  # autonomia abaixo de 20
+RGBA_OCUPADO = to_rgba(COR_OCUPADO)
+RGBA_RESERVA = to_rgba(COR_RESERVA)
+LIMITE_ETIQUETAS = 40  # acima deste nº de táxis não se desenham as etiquetas "T<id>"
+
+# Fundo do mapa pré-rasterizado (só as ruas), guardado na pasta do mapa compilado
+VERSAO_FUNDO = 2  # sobe quando o desenho do fundo muda (invalida as imagens em cache)
+TAMANHO_FUNDO = (9, 6)  # polegadas: a área do mapa na janela (figsize 12x8 sem a legenda e os widgets)
+DPI_FUNDO = 100  # 1:1 com o ecrã: cada desenho completo reamostra a imagem, maior fica mais lento
 
 
 def imprimir_relatorio_estatico(estado_final, nome_algoritmo, tempo_execucao):
@@ -33,18 +51,113 @@ def imprimir_relatorio_estatico(estado_final, nome_algoritmo, tempo_execucao):
     print("=" * 50 + "\n")
 
 
+def caminho_fundo(cidade_osm):
+    """
+    PNG do fundo do mapa em cache, ou None se a cidade não vier de um mapa
+    compilado. Só tem as ruas: um por mapa, seja qual for o sorteio dos POIs.
+    """
+    pasta = getattr(cidade_osm, 'pasta_mapa', None)
+    if pasta is None: return None
+    chave = f"{VERSAO_FUNDO}|{TAMANHO_FUNDO}|{DPI_FUNDO}"
+    return os.path.join(pasta, f"fundo_{hashlib.sha1(chave.encode()).hexdigest()[:16]}.png")
+
+
+def rasterizar_fundo(cidade_osm):
+    """
+    Desenha as ruas uma vez numa figura fora do ecrã (Agg), com os eixos a
+    ocupar a imagem toda. Devolve (imagem RGBA, extent) para imshow.
+    """
+    cidade_osm.indexar()
+    (xmin, ymin), (xmax, ymax) = cidade_osm.coords.min(axis=0), cidade_osm.coords.max(axis=0)
+    margem = 0.03 * max(xmax - xmin, ymax - ymin, 1.0)
+    extent = [float(xmin - margem), float(xmax + margem), float(ymin - margem), float(ymax + margem)]
+    largura, altura = extent[1] - extent[0], extent[3] - extent[2]
+    escala = min(TAMANHO_FUNDO[0] / largura, TAMANHO_FUNDO[1] / altura)
+
+    # Fundo transparente: a imagem fica por cima da cor da janela, como as ruas desenhadas diretamente
+    fig = Figure(figsize=(largura * escala, altura * escala), dpi=DPI_FUNDO, facecolor='none')
+    FigureCanvasAgg(fig)
+    ax = fig.add_axes([0, 0, 1, 1])
+    if getattr(cidade_osm, 'G', None) is not None:
+        import osmnx as ox
+        ox.plot_graph(cidade_osm.G, ax=ax, show=False, close=False, node_size=0, edge_color='#e0e0e0',
+                      edge_linewidth=0.8, bgcolor='none')
+    else:
+        pesos = cidade_osm.pesos_arestas()
+        segmentos = np.stack([cidade_osm.coords[pesos.origens], cidade_osm.coords[pesos.indices]], axis=1)
+        ax.add_collection(LineCollection(segmentos, colors='#e0e0e0', linewidths=0.8, zorder=1))
+    ax.set_axis_off()
+    ax.set_xlim(extent[0], extent[1])
+    ax.set_ylim(extent[2], extent[3])
+
+    fig.canvas.draw()
+    return np.asarray(fig.canvas.buffer_rgba()).copy(), extent
+
+
+def _desenhar_pois(ax, cidade_osm):
+    gx, gy = cidade_osm.nodes[cidade_osm.garagem]['coords']
+    ax.text(gx, gy, 'G', fontsize=10, ha='center', va='center', zorder=4, weight='bold', color='white',
+            bbox=dict(boxstyle="square,pad=0.3", fc="#555555", ec="none", alpha=0.8))
+    for b in cidade_osm.bombas:
+        x, y = cidade_osm.nodes[b]['coords']
+        ax.text(x, y, 'B', fontsize=8, ha='center', va='center', zorder=4, weight='bold', color='#444',
+                bbox=dict(boxstyle="square,pad=0.3", fc="#FFD180", ec="none", alpha=0.8))
+    for c in cidade_osm.carregadores:
+        x, y = cidade_osm.nodes[c]['coords']
+        ax.text(x, y, 'C', fontsize=8, ha='center', va='center', zorder=4, weight='bold', color='white',
+                bbox=dict(boxstyle="square,pad=0.3", fc="#64B5F6", ec="none", alpha=0.8))
+
+
+def carregar_fundo(cidade_osm):
+    """
+    (imagem, extent) do fundo do mapa: lido do PNG em cache (o extent vai nos
+    metadados do próprio PNG) ou rasterizado agora e guardado para a próxima vez.
+    """
+    from PIL import Image
+
+    caminho = caminho_fundo(cidade_osm)
+    if caminho is not None and os.path.exists(caminho):
+        with Image.open(caminho) as png:
+            extent = png.text.get('Extent')
+            if extent is not None: return np.asarray(png.convert('RGBA')), json.loads(extent)
+
+    imagem, extent = rasterizar_fundo(cidade_osm)
+    if caminho is not None:
+        temporario = caminho + ".tmp"
+        Image.fromarray(imagem).save(temporario, format='PNG', pnginfo=_info_png(extent))
+        os.replace(temporario, caminho)
+    return imagem, extent
+
+
+def _info_png(extent):
+    from PIL.PngImagePlugin import PngInfo
+    info = PngInfo()
+    info.add_text('Extent', json.dumps(extent))
+    return info
+
+
 class VisualizadorInterativo:
-    def __init__(self, cidade_osm, caminho_estados, titulo_alg):
+    """
+    Animação de uma lista de Estados (ou de um histórico) sobre o mapa.
+    Os elementos que mudam de frame para frame (táxis, pedidos, trânsito, textos,
+    slider) são artistas persistentes marcados como 'animated': cada frame só
+    atualiza os seus dados (set_offsets / set_facecolors) e é desenhado por
+    blitting sobre o fundo guardado no último desenho completo da figura.
+    As ruas não são artistas: são uma só imagem (carregar_fundo). Os POIs são
+    artistas estáticos, desenhados só nos desenhos completos.
+    """
+
+    def __init__(self, cidade_osm, caminho_estados, titulo_alg, intervalo_ms=150):
+        # caminho_estados: lista de Estados ou um HistoricoSimulacao, que monta cada frame só quando é mostrado
         self.cidade_osm = cidade_osm
         self.caminho_estados = caminho_estados
         self.total_frames = len(caminho_estados)
         self.titulo_alg = titulo_alg
         self.is_playing = True
-        self.textos_taxis = []
+        self.frame_atual = 0
+        cidade_osm.indexar()
 
-        self.fig, self.ax = ox.plot_graph(cidade_osm.G, show=False, close=False,
-                                          node_size=0, edge_color='#e0e0e0', edge_linewidth=0.8,
-                                          bgcolor=COR_FUNDO_MAPA, figsize=(12, 8))
+        self.fig, self.ax = self._desenhar_mapa(cidade_osm)
         self.fig.patch.set_facecolor(COR_FUNDO_JANELA)
         plt.subplots_adjust(bottom=0.15, right=0.80, top=0.90, left=0.05)
         self.ax.axis('off')
@@ -52,14 +165,15 @@ class VisualizadorInterativo:
         self.titulo_obj = self.ax.set_title(f"{titulo_alg} | A carregar...", fontsize=14, fontweight='bold', pad=20,
                                             color=COR_TEXTO)
 
-        self.texto_alerta = self.ax.text(0.5, 0.95, '', transform=self.ax.transAxes,
+        self.texto_alerta = self.ax.text(0.5, 0.95, '', transform=self.ax.transAxes, visible=False,
                                          ha='center', fontsize=12, color='white', weight='bold',
-                                         bbox=dict(boxstyle="round,pad=0.3", fc="#D32F2F", ec="none", alpha=0.0))
+                                         bbox=dict(boxstyle="round,pad=0.3", fc="#D32F2F", ec="none", alpha=0.9))
+        self.texto_fps = self.ax.text(0.99, 0.01, '', transform=self.ax.transAxes, ha='right', va='bottom',
+                                      fontsize=8, color=COR_TEXTO)
 
         self.linhas_transito = LineCollection([], colors='red', linewidths=2.5, alpha=0.7, zorder=3)
         self.ax.add_collection(self.linhas_transito)
-
-        self._desenhar_estaticos()
+        self._arestas_desenhadas = frozenset()
 
         self.origem_scatter = self.ax.scatter([], [], c='#FFD700', marker='*', s=300, zorder=6, edgecolors='gray',
                                               linewidth=0.5)
@@ -68,34 +182,74 @@ class VisualizadorInterativo:
 
         self.destino_scatter = self.ax.scatter([], [], c='#9C27B0', marker='X', s=200, zorder=5, edgecolors='white')
 
+        self._criar_frota()
         self._configurar_legenda()
         self._configurar_widgets()
 
-        self.ani = animation.FuncAnimation(self.fig, self.update, frames=self.total_frames, interval=150, repeat=True,
-                                           blit=False)
+        self.animados = [self.linhas_transito, self.destino_scatter, self.origem_scatter, self.origem_scatter_eco,
+                         self.taxis_scatter, self.letras_eletricos, self.letras_combustao, *self.etiquetas_taxis,
+                         self.texto_alerta, self.titulo_obj, self.texto_fps, *self._artistas_slider()]
+        for artista in self.animados: artista.set_animated(True)
+
+        # Contador de frames: médias exponenciais do ritmo real e do custo de cada frame
+        self.fps = 0.0
+        self.ms_por_frame = 0.0
+        self._ultimo_frame = None
+
+        self._fundo = None
+        self.fig.canvas.mpl_connect('draw_event', self._ao_desenhar)
+        self.update(0)
+
+        self.temporizador = self.fig.canvas.new_timer(interval=intervalo_ms)
+        self.temporizador.add_callback(self._avancar)
+        self.temporizador.start()
         plt.show()
 
-    def _desenhar_estaticos(self):
-        gx, gy = self.cidade_osm.nodes[self.cidade_osm.garagem]['coords']
-        self.ax.text(gx, gy, 'G', fontsize=10, ha='center', va='center', zorder=4, weight='bold', color='white',
-                     bbox=dict(boxstyle="square,pad=0.3", fc="#555555", ec="none", alpha=0.8))
-        for b in self.cidade_osm.bombas:
-            x, y = self.cidade_osm.nodes[b]['coords']
-            self.ax.text(x, y, 'B', fontsize=8, ha='center', va='center', zorder=4, weight='bold', color='#444',
-                         bbox=dict(boxstyle="square,pad=0.3", fc="#FFD180", ec="none", alpha=0.8))
-        for c in self.cidade_osm.carregadores:
-            x, y = self.cidade_osm.nodes[c]['coords']
-            self.ax.text(x, y, 'C', fontsize=8, ha='center', va='center', zorder=4, weight='bold', color='white',
-                         bbox=dict(boxstyle="square,pad=0.3", fc="#64B5F6", ec="none", alpha=0.8))
+    @staticmethod
+    def _desenhar_mapa(cidade_osm):
+        """Ruas como uma só imagem de fundo (pré-rasterizada e guardada em cache por mapa) e os POIs por cima."""
+        imagem, extent = carregar_fundo(cidade_osm)
+        fig, ax = plt.subplots(figsize=(12, 8), facecolor=COR_FUNDO_MAPA)
+        ax.set_facecolor(COR_FUNDO_MAPA)
+        ax.imshow(imagem, extent=extent, origin='upper', interpolation='antialiased', zorder=0)
+        ax.set_xlim(extent[0], extent[1])
+        ax.set_ylim(extent[2], extent[3])
+        ax.set_aspect('equal')
+        _desenhar_pois(ax, cidade_osm)
+        return fig, ax
+
+    def _criar_frota(self):
+        """Artistas dos táxis: um scatter de círculos (a cor muda por frame) e dois com as letras E / C."""
+        # A frota (ordem e tipos) é a mesma em todos os frames
+        veiculos = self.caminho_estados[0].veiculos
+        self.eletricos = np.array([v.tipo == 'eletrico' for v in veiculos], dtype=bool)
+        self.cores_base = np.array([to_rgba(COR_ELETRICO if e else COR_COMBUSTAO) for e in self.eletricos]).reshape(-1, 4)
+
+        self.taxis_scatter = self.ax.scatter([], [], s=190, zorder=10, edgecolors='white', linewidths=1.5)
+        self.letras_eletricos = self.ax.scatter([], [], marker=r'$\mathbf{E}$', s=45, c='white', linewidths=0, zorder=11)
+        self.letras_combustao = self.ax.scatter([], [], marker=r'$\mathbf{C}$', s=45, c='white', linewidths=0, zorder=11)
+
+        # Um Text por táxi é o que mais pesa em cada frame: com frotas grandes as etiquetas ficam de fora
+        self.etiquetas_taxis = []
+        if len(veiculos) <= LIMITE_ETIQUETAS:
+            self.etiquetas_taxis = [
+                self.ax.text(0, 0, f"T{v.id}", fontsize=8, color=COR_TEXTO, weight='bold', zorder=11,
+                             bbox=dict(boxstyle="square,pad=0.1", fc="white", ec="none", alpha=0.6))
+                for v in veiculos]
+
+    def _artistas_slider(self):
+        # valtext fica fora do eixo do slider: com blitting da figura inteira é redesenhado como os outros
+        return [a for a in (self.slider.poly, getattr(self.slider, '_handle', None), self.slider.valtext)
+                if a is not None]
 
     def _configurar_legenda(self):
         legend_elements = [
             Line2D([0], [0], marker='s', color='w', markerfacecolor='#555555', label='[G] Garagem', markersize=8),
             Line2D([0], [0], marker='s', color='w', markerfacecolor='#FFD180', label='[B] Bombas', markersize=8),
             Line2D([0], [0], marker='s', color='w', markerfacecolor='#64B5F6', label='[C] Carregador', markersize=8),
-            Line2D([0], [0], marker='o', color='w', markerfacecolor='#66BB6A', label='(E) Eletrico', markersize=8),
-            Line2D([0], [0], marker='o', color='w', markerfacecolor='#42A5F5', label='(C) Combustao', markersize=8),
-            Line2D([0], [0], marker='o', color='w', markerfacecolor='#EF5350', label='(Ocupado)', markersize=8),
+            Line2D([0], [0], marker='o', color='w', markerfacecolor=COR_ELETRICO, label='(E) Eletrico', markersize=8),
+            Line2D([0], [0], marker='o', color='w', markerfacecolor=COR_COMBUSTAO, label='(C) Combustao', markersize=8),
+            Line2D([0], [0], marker='o', color='w', markerfacecolor=COR_OCUPADO, label='(Ocupado)', markersize=8),
             Line2D([0], [0], color='red', lw=2, label='TRANSITO', markersize=8),
             Line2D([0], [0], marker='*', color='w', markerfacecolor='#FFD700', label='Cliente Normal', markersize=10),
             Line2D([0], [0], marker='*', color='w', markerfacecolor='#00E676', label='Cliente ECO',
@@ -111,6 +265,7 @@ class VisualizadorInterativo:
     def _configurar_widgets(self):
         ax_slider = plt.axes([0.20, 0.05, 0.60, 0.03], facecolor='white')
         self.slider = Slider(ax_slider, 'Tempo  ', 0, self.total_frames - 1, valinit=0, valstep=1, color='#B0BEC5')
+        self.slider.drawon = False  # o slider é redesenhado no blit de cada frame
         self.slider.label.set_color(COR_TEXTO)
         self.slider.valtext.set_color(COR_TEXTO)
         self.slider.on_changed(self.on_slider_change)
@@ -121,98 +276,110 @@ class VisualizadorInterativo:
         for spine in ax_slider.spines.values(): spine.set_edgecolor('#DDDDDD')
         for spine in ax_button.spines.values(): spine.set_edgecolor('#DDDDDD')
 
+    def _ao_desenhar(self, event):
+        # Depois de um desenho completo (abrir, redimensionar, botões) o fundo sem os animados é guardado de novo
+        self._fundo = self.fig.canvas.copy_from_bbox(self.fig.bbox)
+        self._desenhar_animados()
+
+    def _desenhar_animados(self):
+        for artista in self.animados: self.fig.draw_artist(artista)
+
+    def _blit(self):
+        canvas = self.fig.canvas
+        if self._fundo is None:
+            canvas.draw_idle()
+            return
+        canvas.restore_region(self._fundo)
+        self._desenhar_animados()
+        canvas.blit(self.fig.bbox)
+
+    def _avancar(self):
+        inicio = time.perf_counter()
+        self.update((self.frame_atual + 1) % self.total_frames)
+        self._blit()
+        self._medir_frame(inicio, time.perf_counter())
+
+    def _medir_frame(self, inicio, fim):
+        ms = (fim - inicio) * 1000
+        self.ms_por_frame = ms if self.ms_por_frame == 0 else 0.9 * self.ms_por_frame + 0.1 * ms
+        if self._ultimo_frame is not None:
+            fps = 1.0 / max(fim - self._ultimo_frame, 1e-6)
+            self.fps = fps if self.fps == 0 else 0.9 * self.fps + 0.1 * fps
+        self._ultimo_frame = fim
+        self.texto_fps.set_text(f"{self.fps:.1f} FPS | {self.ms_por_frame:.1f} ms/frame")
+
     def toggle_play(self, event):
         if self.is_playing:
-            self.ani.event_source.stop();
+            self.temporizador.stop();
             self.btn.label.set_text('Play')
         else:
-            self.ani.event_source.start();
+            self._ultimo_frame = None
+            self.temporizador.start();
             self.btn.label.set_text('Pause')
         self.is_playing = not self.is_playing;
         self.fig.canvas.draw_idle()
 
     def on_slider_change(self, val):
-        if self.is_playing: self.ani.event_source.stop(); self.is_playing = False; self.btn.label.set_text('Play')
+        if self.is_playing:
+            self.temporizador.stop(); self.is_playing = False; self.btn.label.set_text('Play')
+            self.fig.canvas.draw_idle()
         self.update(int(val));
-        self.fig.canvas.draw_idle()
+        self._blit()
 
     def update(self, frame):
+        """Atualiza os artistas animados com o estado do frame (sem desenhar). Devolve a lista desses artistas."""
+        self.frame_atual = frame
         self.slider.eventson = False;
         self.slider.set_val(frame);
         self.slider.eventson = True
         estado = self.caminho_estados[frame]
+        cidade = self.cidade_osm
 
         alerta = getattr(estado, 'alerta', None)
-        if alerta:
-            self.texto_alerta.set_text(alerta)
-            self.texto_alerta.set_bbox(dict(boxstyle="round,pad=0.3", fc="#D32F2F", ec="none", alpha=0.9))
-        else:
-            self.texto_alerta.set_text("")
-            self.texto_alerta.set_bbox(dict(boxstyle="round,pad=0.3", fc="#D32F2F", ec="none", alpha=0.0))
+        self.texto_alerta.set_text(alerta or "")
+        self.texto_alerta.set_visible(bool(alerta))
 
-        arestas_vermelhas = getattr(estado, 'arestas_transito', [])
-        if arestas_vermelhas:
+        # O conjunto é partilhado entre snapshots: só se redesenha quando muda
+        arestas_vermelhas = getattr(estado, 'arestas_transito', frozenset())
+        if arestas_vermelhas is not self._arestas_desenhadas:
             segmentos = []
             for u, v in arestas_vermelhas:
-                if u in self.cidade_osm.nodes and v in self.cidade_osm.nodes:
-                    p1 = self.cidade_osm.nodes[u]['coords']
-                    p2 = self.cidade_osm.nodes[v]['coords']
+                if u in cidade.nodes and v in cidade.nodes:
+                    p1 = cidade.nodes[u]['coords']
+                    p2 = cidade.nodes[v]['coords']
                     segmentos.append([p1, p2])
             self.linhas_transito.set_segments(segmentos)
-        else:
-            self.linhas_transito.set_segments([])
-
-        ox_list_norm, oy_list_norm = [], []
-        ox_list_eco, oy_list_eco = [], []
-        dx_list, dy_list = [], []
-
-        for p in estado.pedidos_pendentes:
-            if p.origem in self.cidade_osm.nodes:
-                ocoords = self.cidade_osm.nodes[p.origem]['coords']
-                dcoords = self.cidade_osm.nodes[p.destino]['coords']
-
-                if p.prefere_eletrico:
-                    ox_list_eco.append(ocoords[0]);
-                    oy_list_eco.append(ocoords[1])
-                else:
-                    ox_list_norm.append(ocoords[0]);
-                    oy_list_norm.append(ocoords[1])
-
-                dx_list.append(dcoords[0]);
-                dy_list.append(dcoords[1])
-
-        for v in estado.veiculos:
-            if v.ocupado and v.passageiros_a_bordo:
-                for p in v.passageiros_a_bordo:
-                    dcoords = self.cidade_osm.nodes[p.destino]['coords']
-                    dx_list.append(dcoords[0]);
-                    dy_list.append(dcoords[1])
-
-        self.origem_scatter.set_offsets(np.c_[ox_list_norm, oy_list_norm] if ox_list_norm else np.empty((0, 2)))
-        self.origem_scatter_eco.set_offsets(np.c_[ox_list_eco, oy_list_eco] if ox_list_eco else np.empty((0, 2)))
-        self.destino_scatter.set_offsets(np.c_[dx_list, dy_list] if dx_list else np.empty((0, 2)))
-
-        for txt in self.textos_taxis: txt.remove()
-        self.textos_taxis.clear()
-
-        for v in estado.veiculos:
-            x, y = self.cidade_osm.nodes[v.local]['coords']
-            letra = 'E' if v.tipo == 'eletrico' else 'C'
-            cor_fundo = '#66BB6A' if v.tipo == 'eletrico' else '#42A5F5'
-            if v.ocupado:
-                cor_fundo = '#EF5350'
-            elif v.autonomia_atual < 20:
-                cor_fundo = '#FFA726'
-
-            txt = self.ax.text(x, y, letra, fontsize=9, ha='center', va='center', color='white', weight='bold',
-                               zorder=10, bbox=dict(boxstyle="circle,pad=0.2", fc=cor_fundo, ec="white", lw=1.5))
-            self.textos_taxis.append(txt)
-            txt_id = self.ax.text(x + 60, y + 60, f"T{v.id}", fontsize=8, color=COR_TEXTO, weight='bold', zorder=11,
-                                  bbox=dict(boxstyle="square,pad=0.1", fc="white", ec="none", alpha=0.6))
-            self.textos_taxis.append(txt_id)
+            self._arestas_desenhadas = arestas_vermelhas
+
+        # Marcadores iguais no mesmo nó sobrepõem-se: cada nó é desenhado uma vez (milhares de pedidos -> <= N nós)
+        pedidos = [p for p in estado.pedidos_pendentes if p.origem in cidade.nodes]
+        eco = np.fromiter((p.prefere_eletrico for p in pedidos), dtype=bool, count=len(pedidos))
+        origens = cidade.indices([p.origem for p in pedidos])
+        destinos = [p.destino for p in pedidos]
+        destinos += [p.destino for v in estado.veiculos if v.ocupado for p in v.passageiros_a_bordo]
+        self.origem_scatter.set_offsets(cidade.coords[np.unique(origens[~eco])])
+        self.origem_scatter_eco.set_offsets(cidade.coords[np.unique(origens[eco])])
+        self.destino_scatter.set_offsets(cidade.coords[np.unique(cidade.indices(destinos))])
+
+        veiculos = estado.veiculos
+        posicoes = cidade.coords[cidade.indices([v.local for v in veiculos])]
+        ocupados = np.fromiter((v.ocupado for v in veiculos), dtype=bool, count=len(veiculos))
+        reserva = np.fromiter((v.autonomia_atual < 20 for v in veiculos), dtype=bool, count=len(veiculos))
+        cores = self.cores_base.copy()
+        cores[reserva] = RGBA_RESERVA
+        cores[ocupados] = RGBA_OCUPADO
+        self.taxis_scatter.set_offsets(posicoes)
+        self.taxis_scatter.set_facecolors(cores)
+        self.letras_eletricos.set_offsets(posicoes[self.eletricos])
+        self.letras_combustao.set_offsets(posicoes[~self.eletricos])
+        for etiqueta, (x, y) in zip(self.etiquetas_taxis, posicoes.tolist()):
+            etiqueta.set_position((x + 60, y + 60))
 
         acao_atual = getattr(estado, 'acao_geradora', '') or ''
-        self.titulo_obj.set_text(f"{self.titulo_alg}\nSim: {frame}m / {self.total_frames}m | {acao_atual}")
+        # No modo de eventos os snapshots não são de minuto a minuto: o título mostra o minuto gravado
+        self.titulo_obj.set_text(f"{self.titulo_alg}\nSim: {estado.tempo_atual:.0f}m | "
+                                 f"Frame {frame + 1}/{self.total_frames} | {acao_atual}")
+        return self.animados
 
 
 _visualizacao_atual = None
@@ -261,11 +428,12 @@ def gerar_frota_simulacao(cidade, num_veiculos):
 def main():
     print("A carregar Mapa OSMnx (Braga)... Por favor aguarde.")
     try:
-        cidade = CidadeOSM()
+        cidade = CidadeOSM(sys.argv[1] if len(sys.argv) > 1 else None)
     except Exception as e:
         print(f"Erro ao carregar mapa: {e}");
         return
     estado_demo = gerar_cenario_demo(cidade)
+    modo = MODO_MICRO
     print("\nCenario de demonstracao inicial gerado!")
 
     while True:
@@ -278,9 +446,14 @@ def main():
         print("3. Visualizar BFS")
         print("4. Visualizar DFS")
         print("5. Gerar Novo Cenario Demo")
+        print("8. Visualizar IDA* (memoria limitada)")
+        print("9. Visualizar SMA* (memoria limitada)")
+        print("10. Visualizar Beam Search (largura limitada)")
+        print(f"7. Alternar Modo de Sucessores [Atual: {modo.upper()}]")
         print("-" * 35)
         print("--- SIMULACAO DE PERFORMANCE (Tempo Fixo) ---")
         print("6. Executar Simulacao Realista")
+        print("11. Abrir Replay Gravado")
         print("-" * 35)
         print("0. Sair")
         opcao = input(">>> Escolha uma opcao: ")
@@ -288,10 +461,13 @@ def main():
         if opcao == "0": break
 
         alg_map = {
-            "1": ("A*", algoritmos.a_star, algoritmos.heuristica_taxi),
-            "2": ("Greedy", algoritmos.greedy, algoritmos.heuristica_taxi),
+            "1": ("A*", algoritmos.a_star, algoritmos.heuristica_alt),
+            "2": ("Greedy", algoritmos.greedy, algoritmos.heuristica_alt),
             "3": ("BFS", algoritmos.bfs, None),
             "4": ("DFS", algoritmos.dfs, None),
+            "8": ("IDA*", algoritmos.ida_star, algoritmos.heuristica_alt),
+            "9": ("SMA*", algoritmos.sma_star, algoritmos.heuristica_alt),
+            "10": ("Beam Search", algoritmos.beam_search, algoritmos.heuristica_alt),
         }
 
         if opcao in alg_map:
@@ -299,8 +475,14 @@ def main():
             print(f"\nA calcular rota com {nome} (no cenario atual)...")
             start_time = time.time()
             args = (estado_demo, cidade, extra) if extra else (estado_demo, cidade)
-            res = func(*args)
+            kwargs = {'modo': modo, 'estatisticas': {}}
+            res = func(*args, **kwargs)
             end_time = time.time()
+            est = kwargs['estatisticas']
+            print(f"Expansoes: {est['expansoes']} | Gerados: {est['gerados']} ({est['duplicados']} duplicados)"
+                  f" | Pico de nos: {est['pico_nos']}")
+            print(f"Tempo heuristica: {est['tempo_heuristica']:.3f}s | Tempo sucessores: {est['tempo_sucessores']:.3f}s"
+                  f" | Memoria: +{est['pico_memoria_mb']:.1f} MB")
             if res:
                 caminho, custo_final = res
                 imprimir_relatorio_estatico(caminho[-1], nome, end_time - start_time)
@@ -315,12 +497,21 @@ def main():
             estado_demo = gerar_cenario_demo(cidade);
             print("\nNOVO CENARIO GERADO!")
 
+        elif opcao == "7":
+            modo = MODO_MACRO if modo == MODO_MICRO else MODO_MICRO
+            print(f"\nMODO DE SUCESSORES: {modo.upper()}")
+
         elif opcao == "6":
             print("\n Configuração da Simulação:")
             print("   [1] A*")
             print("   [2] Greedy")
             print("   [3] BFS")
             print("   [4] DFS")
+            print("   [5] A* Anytime (ARA*)")
+            print("   [6] IDA*")
+            print("   [7] SMA*")
+            print("   [8] Beam Search")
+            print("   [9] Despacho por Atribuicao (frotas grandes)")
             alg_input = input(">>> Escolha o algoritmo [Default: Greedy]: ")
             algoritmo_func = algoritmos.greedy;
             nome_alg = "Greedy"
@@ -333,16 +524,46 @@ def main():
             elif alg_input == "4":
                 algoritmo_func = algoritmos.dfs;
                 nome_alg = "DFS"
+            elif alg_input == "5":
+                algoritmo_func = algoritmos.a_star_anytime;
+                nome_alg = "A* Anytime"
+            elif alg_input == "6":
+                algoritmo_func = algoritmos.ida_star;
+                nome_alg = "IDA*"
+            elif alg_input == "7":
+                algoritmo_func = algoritmos.sma_star;
+                nome_alg = "SMA*"
+            elif alg_input == "8":
+                algoritmo_func = algoritmos.beam_search;
+                nome_alg = "Beam Search"
 
             num_veiculos = 2
-            try:
-                segundos = int(input(">>> Escolha Tempo Limite (Segundos Reais) [Default: 20s]: ") or "20")
-            except:
-                segundos = 60
+            planeamento = PLANEAMENTO_PROCESSO
+            if alg_input == "9":
+                algoritmo_func = None
+                nome_alg = "Atribuicao"
+                planeamento = PLANEAMENTO_ATRIBUICAO
+                num_veiculos = 20
+            eventos_discretos = input(">>> Relogio: [1] Tempo real  [2] Eventos discretos [Default: 1]: ") == "2"
+            if eventos_discretos:
+                try:
+                    minutos = int(input(">>> Minutos Simulados [Default: 1440 (um dia)]: ") or "1440")
+                except:
+                    minutos = 1440
+            else:
+                try:
+                    segundos = int(input(">>> Escolha Tempo Limite (Segundos Reais) [Default: 20s]: ") or "20")
+                except:
+                    segundos = 60
+            ficheiro_replay = input(">>> Gravar replay em ficheiro [Enter = so em memoria]: ").strip() or None
 
             PROB_PEDIDO_FIXA = 0.025
             frota_sim = gerar_frota_simulacao(cidade, num_veiculos)
-            sim = Simulador(cidade, frota_sim, algoritmo_escolhido=algoritmo_func)
+            ORCAMENTO_PLANEAMENTO = 1.0 if algoritmo_func is algoritmos.a_star_anytime else None
+            sim = Simulador(cidade, frota_sim, algoritmo_escolhido=algoritmo_func, modo_sucessores=modo,
+                            funcao_heuristica=algoritmos.heuristica_alt,
+                            orcamento_planeamento=ORCAMENTO_PLANEAMENTO, planeamento=planeamento,
+                            recolher_estatisticas=True, ficheiro_replay=ficheiro_replay)
 
             origem_inicial = cidade.get_local_aleatorio()
             destino_inicial = cidade.get_local_aleatorio()
@@ -352,12 +573,32 @@ def main():
             sim.pedidos_pendentes.append(Pedido(99, origem_inicial, destino_inicial, 1, 120))
 
 
-            print(f"\n A iniciar Simulação: {segundos}s reais | {num_veiculos} taxis | {nome_alg}...")
-            historico = sim.executar_simulacao(segundos_reais_limite=segundos, probabilidade_pedido=PROB_PEDIDO_FIXA)
+            if eventos_discretos:
+                print(f"\n A iniciar Simulação: {minutos} min (eventos discretos) | {num_veiculos} taxis | {nome_alg} | {modo}...")
+                historico = sim.executar_simulacao_eventos(minutos, probabilidade_pedido=PROB_PEDIDO_FIXA)
+                duracao = f"{minutos}min"
+            else:
+                print(f"\n A iniciar Simulação: {segundos}s reais | {num_veiculos} taxis | {nome_alg} | {modo}...")
+                historico = sim.executar_simulacao(segundos_reais_limite=segundos, probabilidade_pedido=PROB_PEDIDO_FIXA)
+                duracao = f"{segundos}s"
 
             if input("\nVisualizar Replay? (s/n): ").lower() == 's':
                 print("A abrir grafico...")
-                animar_mapa_osmnx(cidade, historico, f"Replay ({nome_alg} - {segundos}s)")
+                animar_mapa_osmnx(cidade, historico, f"Replay ({nome_alg} - {duracao})")
+
+        elif opcao == "11":
+            ficheiro = input(">>> Ficheiro de replay: ").strip()
+            try:
+                replay = LeitorReplay(ficheiro)
+            except (OSError, ValueError) as e:
+                print(f"[!] Erro ao abrir replay: {e}")
+                continue
+            if not replay.corresponde(cidade):
+                print("[!] O replay foi gravado noutro mapa (os nós não coincidem com o mapa carregado).")
+                replay.fechar()
+                continue
+            print(f"Replay com {len(replay)} frames. A abrir grafico...")
+            animar_mapa_osmnx(cidade, replay, f"Replay ({os.path.basename(ficheiro)})")
         else:
             print("Opcao invalida.")
 
@@ -1,3 +1,6 @@
+from collections import namedtuple
+
+
 class Pedido:
     def __init__(self, id_pedido, origem, destino, passageiros, prazo, tempo_criacao=0, prefere_eletrico=False):
         self.id = id_pedido
@@ -36,6 +39,11 @@ class Veiculo:
         self.rota_planeada = []
         self.ocupado_ate = 0
 
+    def congelar(self):
+        """Registo imutável com o estado atual do veículo (para a pesquisa)."""
+        return EstadoVeiculo(self.id, self.tipo, self.local, self.autonomia_atual, self.autonomia_max,
+                             self.capacidade, self.ocupado, tuple(self.passageiros_a_bordo))
+
     def clone(self):
         v_novo = Veiculo(self.id, self.tipo, self.local, self.autonomia_max, self.capacidade)
         v_novo.autonomia_atual = self.autonomia_atual
@@ -44,4 +52,29 @@ class Veiculo:
         return v_novo
 
     def __repr__(self):
-        return f"T{self.id}[{self.tipo}|{self.local}|{self.autonomia_atual:.0f}km]"
\ No newline at end of file
+        return f"T{self.id}[{self.tipo}|{self.local}|{self.autonomia_atual:.0f}km]"
+
+
+class EstadoVeiculo(namedtuple('EstadoVeiculo', ['id', 'tipo', 'local', 'autonomia_atual', 'autonomia_max',
+                                                 'capacidade', 'ocupado', 'passageiros_a_bordo'])):
+    """
+    Versão compacta e imutável de um Veiculo, usada dentro dos Estados da pesquisa.
+    Baseada em tuplo (sem __dict__), pode ser partilhada entre estado pai e filhos:
+    só o veículo que muda numa ação é substituído, via alterar().
+    """
+    __slots__ = ()
+
+    def alterar(self, **campos):
+        return self._replace(**campos)
+
+    def mover(self, destino, dist):
+        # Caso mais frequente da pesquisa: evita o custo genérico do _replace
+        return EstadoVeiculo(self.id, self.tipo, destino, self.autonomia_atual - dist, self.autonomia_max,
+                             self.capacidade, self.ocupado, self.passageiros_a_bordo)
+
+    def clone(self):
+        # Imutável: partilhar é seguro
+        return self
+
+    def __repr__(self):
+        return f"T{self.id}[{self.tipo}|{self.local}|{self.autonomia_atual:.0f}km]"
@@ -0,0 +1,228 @@
+import hashlib
+import numpy as np
+from scipy.sparse import csr_matrix
+
+PESOS = ('dist', 'time')
+LIMIAR_ENGARRAFAMENTO = 1.5  # fator sobre 'time' a partir do qual a rua conta como engarrafada
+
+
+class PesosArestas:
+    """
+    Fonte única das arestas da cidade: adjacência CSR sobre os ids densos dos
+    nós (a ordem de Cidade.indexar) e pesos em arrays NumPy alinhados com ela.
+    O id de uma aresta é a sua posição no CSR: as arestas do nó i são os ids
+    indptr[i]:indptr[i+1], com destino indices[id].
+      - base / atuais: pesos sem e com a sobreposição versionada de fatores
+        (trânsito). Cada alteração custa O(arestas alteradas).
+      - linhas / destinos / listas: espelhos em Python ({nó: range dos ids},
+        nó de destino e pesos atuais por id), para iterar vizinho a vizinho
+        sem o custo por elemento do NumPy (gera_sucessores, Dijkstra da CH, D* Lite).
+    O CSR de um objeto nunca muda: acrescentar arestas ou nós cria outro
+    (com_arestas). Quem guarda resultados em cache (ex: o oráculo de rotas)
+    compara a versão do peso para saber se ainda valem.
+    O conjunto das ruas engarrafadas é mantido a cada alteração e publicado
+    como um frozenset partilhado: enquanto o trânsito não muda, é sempre o
+    mesmo objeto.
+    """
+
+    def __init__(self, nos, indptr, indices, base, anterior=None):
+        """
+        :param nos: ids dos nós, pela ordem dos ids densos
+        :param indptr, indices: adjacência CSR sobre os ids densos
+        :param base: {peso: array} com os pesos sem trânsito, alinhados com 'indices'
+        :param anterior: PesosArestas substituído, de quem passam o trânsito e as versões
+        """
+        self.nos = list(nos)
+        self.indice = {n: i for i, n in enumerate(self.nos)}
+
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.indices = np.asarray(indices, dtype=np.int64)
+        self.inicio = self.indptr.tolist()
+        self.destinos = [self.nos[j] for j in self.indices.tolist()]
+        self.origens = np.repeat(np.arange(len(self.nos), dtype=np.int64), np.diff(self.indptr))
+        self.linhas = {u: range(self.inicio[i], self.inicio[i + 1]) for i, u in enumerate(self.nos)}
+
+        self.base = {p: np.array(base[p], dtype=float) for p in PESOS}
+        self.sobreposicoes = {p: {} for p in PESOS}  # {peso: {id aresta: fator != 1}}
+        self.versoes = {p: 0 for p in PESOS}
+        self.versao_base = 0  # muda quando a rede ou os pesos sem trânsito mudam
+        self.engarrafadas = frozenset()  # {(u, v)} com fator de 'time' > LIMIAR_ENGARRAFAMENTO
+        self._ritmo = None  # ((versão dist, versão time), menor min/km)
+        self._matrizes = {}  # {peso: (versão, csr_matrix)}
+        self._chaves = None  # (origem * N + destino ordenados, ids das arestas por essa ordem)
+        self._antecessores = None
+        if anterior is not None: self._herdar(anterior)
+
+        self.atuais = {p: valores.copy() for p, valores in self.base.items()}
+        for p, sobreposicao in self.sobreposicoes.items():
+            if sobreposicao:
+                ids = np.fromiter(sobreposicao, dtype=np.int64, count=len(sobreposicao))
+                self.atuais[p][ids] *= np.fromiter(sobreposicao.values(), dtype=float, count=len(sobreposicao))
+        self.listas = {p: valores.tolist() for p, valores in self.atuais.items()}
+
+    @classmethod
+    def de_arestas(cls, nos, arestas, anterior=None):
+        """
+        PesosArestas a partir de {(u, v): {peso: valor}}; as arestas de cada nó
+        ficam pela ordem de inserção.
+        """
+        indice = {n: i for i, n in enumerate(nos)}
+        origens = np.fromiter((indice[u] for u, _ in arestas), dtype=np.int64, count=len(arestas))
+        destinos = np.fromiter((indice[v] for _, v in arestas), dtype=np.int64, count=len(arestas))
+        ordem = np.argsort(origens, kind='stable')
+        indptr = np.zeros(len(nos) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(origens, minlength=len(nos)), out=indptr[1:])
+        base = {p: np.fromiter((dados[p] for dados in arestas.values()), dtype=float, count=len(arestas))[ordem]
+                for p in PESOS}
+        return cls(nos, indptr, destinos[ordem], base, anterior=anterior)
+
+    def pares(self):
+        """(u, v) de todas as arestas, pela ordem dos ids."""
+        for u, linha in self.linhas.items():
+            for k in linha:
+                yield u, self.destinos[k]
+
+    def _herdar(self, anterior):
+        # A sobreposição das arestas que já existiam passa para os novos ids
+        for p in PESOS:
+            for i_antigo, fator in anterior.sobreposicoes[p].items():
+                i = self.id_aresta(*anterior.aresta(i_antigo))
+                if i is not None: self.sobreposicoes[p][i] = fator
+        self.versoes = {p: v + 1 for p, v in anterior.versoes.items()}
+        self.versao_base = anterior.versao_base + 1
+        self.engarrafadas = anterior.engarrafadas
+
+    def __len__(self):
+        return len(self.destinos)
+
+    def id_aresta(self, u, v):
+        """Id da aresta u -> v (procura na linha de u do CSR), ou None."""
+        destinos = self.destinos
+        for k in self.linhas.get(u, ()):
+            if destinos[k] == v: return k
+        return None
+
+    def ids_arestas(self, origens, destinos):
+        """id_aresta vetorizado sobre arrays de ids densos (as arestas têm de existir)."""
+        n = len(self.nos)
+        if self._chaves is None:
+            chaves = self.origens * n + self.indices
+            ordem = np.argsort(chaves, kind='stable')
+            self._chaves = (chaves[ordem], ordem)
+        chaves, ordem = self._chaves
+        return ordem[np.searchsorted(chaves, np.asarray(origens, dtype=np.int64) * n + destinos)]
+
+    def aresta(self, id_aresta):
+        """(u, v) da aresta com este id."""
+        return self.nos[self.origens[id_aresta]], self.destinos[id_aresta]
+
+    def vizinhos(self, no):
+        """Destinos das arestas que saem de 'no' (lista nova)."""
+        linha = self.linhas.get(no)
+        if linha is None: return []
+        return self.destinos[linha.start:linha.stop]
+
+    def assinatura(self, peso):
+        """Hash dos nós, do CSR e dos valores atuais de 'peso': identifica o mapa em tabelas guardadas em disco."""
+        h = hashlib.sha1(f"{peso}|{self.nos!r}".encode())
+        h.update(self.indptr.tobytes())
+        h.update(self.indices.tobytes())
+        h.update(np.round(self.atuais[peso], 6).tobytes())
+        return h.hexdigest()
+
+    def antecessores(self):
+        """{nó: [nós com uma aresta para ele]} (adjacência inversa, calculada uma vez)."""
+        if self._antecessores is None:
+            antecessores = {n: [] for n in self.nos}
+            for u, v in self.pares():
+                antecessores[v].append(u)
+            self._antecessores = antecessores
+        return self._antecessores
+
+    def valores(self, peso):
+        """Array com o peso atual de todas as arestas (não modificar)."""
+        return self.atuais[peso]
+
+    def matriz(self, peso):
+        """Matriz esparsa (SciPy CSR) com o peso atual, para o scipy.sparse.csgraph; refeita quando a versão muda."""
+        versao, matriz = self._matrizes.get(peso, (None, None))
+        if versao != self.versoes[peso]:
+            n = len(self.nos)
+            matriz = csr_matrix((self.atuais[peso], self.indices, self.indptr), shape=(n, n), copy=True)
+            self._matrizes[peso] = (self.versoes[peso], matriz)
+        return matriz
+
+    def com_arestas(self, nos, novas):
+        """
+        Pesos com os nós 'nos' e as arestas atuais mais 'novas' {(u, v): {peso: valor}}.
+        Se os nós são os mesmos e todas as arestas já existiam, são atualizadas no
+        lugar e devolve self; senão devolve um PesosArestas reconstruído, com a
+        mesma sobreposição.
+        """
+        ids = [self.id_aresta(u, v) for u, v in novas] if len(nos) == len(self.nos) else [None]
+        if None in ids:
+            arestas = {aresta: {p: self.base[p][i] for p in PESOS} for i, aresta in enumerate(self.pares())}
+            arestas.update(novas)
+            return PesosArestas.de_arestas(nos, arestas, anterior=self)
+
+        for i, dados in zip(ids, novas.values()):
+            for p in PESOS:
+                self.base[p][i] = dados[p]
+                self.atuais[p][i] = dados[p] * self.sobreposicoes[p].get(i, 1.0)
+                self.listas[p][i] = float(self.atuais[p][i])
+        for p in PESOS: self.versoes[p] += 1
+        self.versao_base += 1
+        return self
+
+    def sobrepor(self, fatores, peso='time'):
+        """
+        Substitui a sobreposição de 'peso' por 'fatores' {(u, v): fator}. Só as
+        arestas que entram, saem ou mudam de fator são tocadas. Devolve [(u, v)]
+        alteradas (a versão do peso só avança se houver alguma).
+        """
+        antiga = self.sobreposicoes[peso]
+        nova = {}
+        for (u, v), f in fatores.items():
+            i = self.id_aresta(u, v)
+            if i is not None and f != 1.0: nova[i] = f
+        alteradas = sorted(i for i in antiga.keys() | nova.keys() if antiga.get(i, 1.0) != nova.get(i, 1.0))
+        self.sobreposicoes[peso] = nova
+        if not alteradas: return []
+
+        ids = np.array(alteradas, dtype=np.int64)
+        atuais = self.atuais[peso]
+        atuais[ids] = self.base[peso][ids] * np.array([nova.get(i, 1.0) for i in alteradas])
+        lista = self.listas[peso]
+        for i in alteradas:
+            lista[i] = float(atuais[i])
+        self.versoes[peso] += 1
+        if peso == 'time': self._atualizar_engarrafadas(alteradas, nova)
+        return [self.aresta(i) for i in alteradas]
+
+    def _atualizar_engarrafadas(self, alteradas, sobreposicao):
+        # Só as arestas alteradas podem entrar ou sair do conjunto
+        engarrafadas = set(self.engarrafadas)
+        for i in alteradas:
+            if sobreposicao.get(i, 1.0) > LIMIAR_ENGARRAFAMENTO:
+                engarrafadas.add(self.aresta(i))
+            else:
+                engarrafadas.discard(self.aresta(i))
+        if engarrafadas != self.engarrafadas:
+            self.engarrafadas = frozenset(engarrafadas)
+
+    def ritmo_minimo(self):
+        """
+        Menor 'time' / 'dist' (min por km) das arestas com distância > 0: qualquer
+        caminho com d km demora pelo menos d * ritmo_minimo() minutos.
+        """
+        chave = (self.versoes['dist'], self.versoes['time'])
+        if self._ritmo is None or self._ritmo[0] != chave:
+            dist, tempo = self.atuais['dist'], self.atuais['time']
+            positivas = dist > 0
+            ritmo = float((tempo[positivas] / dist[positivas]).min()) if positivas.any() else 0.0
+            self._ritmo = (chave, max(ritmo, 0.0))
+        return self._ritmo[1]
+
+    def fatores(self, peso='time'):
+        """Sobreposição atual de 'peso' como {(u, v): fator} (para reproduzir noutra cópia do grafo)."""
+        return {self.aresta(i): f for i, f in self.sobreposicoes[peso].items()}
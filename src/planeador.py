@@ -0,0 +1,225 @@
+import time
+import queue
+import multiprocessing as mp
+
+import algoritmos
+from pesos import PESOS
+
+
+class _TokenParagem:
+    """
+    Token de paragem cooperativa partilhado entre processos.
+    Uma tarefa fica cancelada quando a 'geracao' partilhada ultrapassa o seu id,
+    o que cancela de uma vez todas as tarefas antigas (planos obsoletos).
+    """
+
+    def __init__(self, geracao, id_tarefa):
+        self.geracao = geracao
+        self.id_tarefa = id_tarefa
+
+    def is_set(self):
+        return self.geracao.value > self.id_tarefa
+
+
+class _PlanoRemoto(algoritmos.PlanoAnytime):
+    """PlanoAnytime que também envia cada melhoria para o processo principal."""
+
+    def __init__(self, fila, id_tarefa):
+        super().__init__()
+        self.fila = fila
+        self.id_tarefa = id_tarefa
+
+    def publicar(self, caminho, custo, epsilon):
+        super().publicar(caminho, custo, epsilon)
+        self.fila.put(('parcial', self.id_tarefa, (caminho, custo, epsilon), 0.0))
+
+
+def _ciclo_worker(cidade, tarefas, resultados, geracao):
+    # Com 'fork' a cidade é herdada; com 'spawn' é serializada uma única vez, no
+    # arranque. Cada tarefa traz apenas o estado congelado e, por peso, a versão
+    # e os fatores da sobreposição atual (trânsito), aplicados se a versão mudou.
+    versoes = {}
+    while True:
+        tarefa = tarefas.get()
+        if tarefa is None: break
+        id_tarefa, algoritmo, estado, funcao_heuristica, kwargs, sobreposicoes = tarefa
+        for peso, (versao, fatores) in sobreposicoes.items():
+            if versao != versoes.get(peso):
+                cidade.pesos_arestas().sobrepor(fatores, peso)
+                versoes[peso] = versao
+
+        parar = _TokenParagem(geracao, id_tarefa)
+        if parar.is_set():
+            resultados.put(('fim', id_tarefa, None, 0.0))
+            continue
+
+        if algoritmo is algoritmos.a_star_anytime:
+            kwargs['plano'] = _PlanoRemoto(resultados, id_tarefa)
+
+        t0 = time.process_time()
+        res = algoritmos.executar(algoritmo, estado, cidade, funcao_heuristica, parar=parar, **kwargs)
+        cpu = time.process_time() - t0
+        if parar.is_set(): res = None
+        if 'estatisticas' in kwargs:
+            resultados.put(('estatisticas', id_tarefa, kwargs['estatisticas'], 0.0))
+        resultados.put(('fim', id_tarefa, res, cpu))
+
+
+class TarefaPlaneamento:
+    def __init__(self, planeador, id_tarefa, mensagem):
+        self.planeador = planeador
+        self.id = id_tarefa
+        self.mensagem = mensagem  # o que foi posto na fila (reenviado se os processos forem substituídos)
+        self.resultado = None
+        self.parcial = None  # (caminho, custo, epsilon) do planeador anytime
+        self.estatisticas = None  # dict do planeador, se foi pedido em kwargs['estatisticas']
+        self.terminada = False
+        self.cancelada_em = None  # time.time() do cancelamento
+        self.tempo_cpu = 0.0
+
+    def esperar(self, timeout):
+        """
+        Espera pelo resultado até 'timeout' segundos (None = sem limite; 0 só
+        recolhe o que já chegou). Devolve True se terminou.
+        """
+        limite = None if timeout is None else time.time() + timeout
+        while not self.terminada:
+            restante = None if limite is None else max(0.0, limite - time.time())
+            self.planeador._recolher(restante)
+            if restante == 0: break
+        return self.terminada
+
+    def cancelar(self):
+        self.planeador._cancelar_ate(self.id)
+
+
+class PlaneadorProcessos:
+    """
+    Corre os planeadores em processos dedicados, fora do GIL do simulador.
+    - O estado congelado é enviado em forma compacta (Estado.__reduce__) e a
+      cidade só é passada ao processo no arranque; se a rede mudar (arestas
+      novas), os processos são substituídos por outros com a cidade atual.
+    - Cancelar uma tarefa ativa o token de paragem verificado dentro dos ciclos
+      do a_star/greedy/bfs/dfs e volta logo; se o processo não responder dentro
+      do prazo de tolerância, é terminado e substituído na recolha seguinte.
+    """
+
+    TOLERANCIA_CANCELAMENTO = 0.5
+
+    def __init__(self, cidade, processos=1):
+        metodos = mp.get_all_start_methods()
+        self.ctx = mp.get_context('fork' if 'fork' in metodos else 'spawn')
+        self.cidade = cidade
+        self.num_processos = processos
+        self.geracao = self.ctx.RawValue('q', 0)
+        self.proximo_id = 1
+        self.tarefas_ativas = {}
+        self.cancelamentos_forcados = 0
+        self._arrancar()
+
+    def _arrancar(self):
+        self.versao_base = self.cidade.pesos_arestas().versao_base
+        self.fila_tarefas = self.ctx.Queue()
+        self.fila_resultados = self.ctx.Queue()
+        self.processos = []
+        for _ in range(self.num_processos):
+            p = self.ctx.Process(target=_ciclo_worker,
+                                 args=(self.cidade, self.fila_tarefas, self.fila_resultados, self.geracao),
+                                 daemon=True)
+            p.start()
+            self.processos.append(p)
+
+    def submeter(self, algoritmo, estado, funcao_heuristica=None, **kwargs):
+        pesos = self.cidade.pesos_arestas()
+        if pesos.versao_base != self.versao_base:
+            self._substituir_processos()
+        id_tarefa = self.proximo_id
+        self.proximo_id += 1
+        sobreposicoes = {p: (pesos.versoes[p], pesos.fatores(p)) for p in PESOS}
+        tarefa = TarefaPlaneamento(self, id_tarefa, (id_tarefa, algoritmo, estado, funcao_heuristica, kwargs, sobreposicoes))
+        self.tarefas_ativas[id_tarefa] = tarefa
+        self.fila_tarefas.put(tarefa.mensagem)
+        return tarefa
+
+    def _recolher(self, timeout):
+        """Trata as mensagens dos processos, esperando até 'timeout' pela primeira."""
+        prazo = self._vigiar()
+        if prazo is not None:
+            timeout = prazo if timeout is None else min(timeout, prazo)
+        try:
+            self._tratar(*self.fila_resultados.get(timeout=timeout))
+        except queue.Empty:
+            return
+        self._recolher_pendentes()
+
+    def _tratar(self, tipo, id_tarefa, dados, cpu):
+        tarefa = self.tarefas_ativas.get(id_tarefa)
+        if tarefa is None: return
+        if tipo == 'parcial':
+            tarefa.parcial = dados
+        elif tipo == 'estatisticas':
+            tarefa.estatisticas = dados
+        else:
+            tarefa.resultado = dados
+            tarefa.tempo_cpu = cpu
+            tarefa.terminada = True
+            del self.tarefas_ativas[id_tarefa]
+
+    def _vigiar(self):
+        """
+        Substitui os processos se uma tarefa cancelada passou da tolerância sem
+        terminar. Devolve os segundos até ao próximo prazo de tolerância, ou None.
+        """
+        canceladas = [t.cancelada_em for t in self.tarefas_ativas.values() if t.cancelada_em is not None]
+        if not canceladas: return None
+        restante = min(canceladas) + self.TOLERANCIA_CANCELAMENTO - time.time()
+        if restante > 0: return restante
+        # Pode ter terminado entretanto: só é forçado se continuar presa
+        self._recolher_pendentes()
+        if any(t.cancelada_em is not None for t in self.tarefas_ativas.values()):
+            self.cancelamentos_forcados += 1
+            self._substituir_processos()
+        return self._vigiar()
+
+    def _recolher_pendentes(self):
+        try:
+            while True:
+                self._tratar(*self.fila_resultados.get_nowait())
+        except queue.Empty:
+            pass
+
+    def _cancelar_ate(self, id_tarefa):
+        """Cancela todas as tarefas até 'id_tarefa' sem esperar que os processos respondam."""
+        self.geracao.value = max(self.geracao.value, id_tarefa + 1)
+        agora = time.time()
+        for tarefa in self.tarefas_ativas.values():
+            if tarefa.id <= id_tarefa and tarefa.cancelada_em is None:
+                tarefa.cancelada_em = agora
+
+    def _substituir_processos(self):
+        """
+        Termina os processos e arranca outros com a cidade atual. As tarefas
+        canceladas acabam sem resultado; as restantes voltam à fila.
+        """
+        self._terminar_processos()
+        self._arrancar()
+        for id_tarefa, tarefa in list(self.tarefas_ativas.items()):
+            if tarefa.cancelada_em is None:
+                self.fila_tarefas.put(tarefa.mensagem)
+            else:
+                tarefa.terminada = True
+                del self.tarefas_ativas[id_tarefa]
+
+    def _terminar_processos(self):
+        for p in self.processos:
+            p.terminate()
+        for p in self.processos:
+            p.join(timeout=1)
+
+    def encerrar(self):
+        self.geracao.value = self.proximo_id
+        for _ in self.processos:
+            self.fila_tarefas.put(None)
+        for p in self.processos:
+            p.join(timeout=self.TOLERANCIA_CANCELAMENTO)
+        self._terminar_processos()
@@ -1,5 +1,7 @@
 import math
-from modelos import Veiculo, Pedido
+import random
+import numpy as np
+from modelos import Veiculo, Pedido, EstadoVeiculo
 
 ALPHA = 0.4
 BETA = 0.5
@@ -13,13 +15,39 @@ EMISSAO_CO2_KM_EV = 0
 
 PENALIDADE_CLIENTE_INSATISFEITO = 10.0
 PENALIDADE_RISCO_BATERIA = 50.0
+TEMPO_OPERACAO = 2  # minutos para recolher ou entregar um passageiro
+
+# Modos de geração de sucessores
+MODO_MICRO = "micro"  # um passo (aresta) de cada vez
+MODO_MACRO = "macro"  # ações de alto nível sobre caminhos mais curtos
+
+# Tabela Zobrist: uma chave aleatória de 64 bits por componente do estado
+# (configuração de um veículo, pedido pendente), gerada a pedido. O hash de um
+# estado é o XOR das chaves, o que permite atualizá-lo em O(1) por ação.
+_ZOBRIST = {}
+_ZOBRIST_RNG = random.Random(0x7A61)
+
+
+def _zobrist(componente):
+    chave = _ZOBRIST.get(componente)
+    if chave is None:
+        chave = _ZOBRIST[componente] = _ZOBRIST_RNG.getrandbits(64)
+    return chave
 
 
 class Estado:
+    """
+    Estado compacto da pesquisa. Os veículos são registos imutáveis (EstadoVeiculo)
+    guardados num tuplo, tal como os pedidos pendentes; um sucessor partilha com o
+    pai tudo o que a ação não alterou, em vez de clonar a frota inteira.
+    """
+    __slots__ = ('veiculos', 'pedidos_pendentes', 'tempo_atual', 'custo_acumulado', 'pai', 'acao_geradora',
+                 'alerta', 'arestas_transito', 'total_co2', 'total_dinheiro', '_hash', '_assinatura_cache')
+
     def __init__(self, veiculos, pedidos_pendentes, tempo_atual=0, custo_acumulado=0, alerta=None,
                  arestas_transito=None):
-        self.veiculos = veiculos
-        self.pedidos_pendentes = pedidos_pendentes
+        self.veiculos = tuple(v if isinstance(v, EstadoVeiculo) else v.congelar() for v in veiculos)
+        self.pedidos_pendentes = tuple(pedidos_pendentes)
         self.tempo_atual = tempo_atual
         self.custo_acumulado = custo_acumulado
 
@@ -27,11 +55,15 @@ class Estado:
         self.acao_geradora = None
 
         self.alerta = alerta
-        self.arestas_transito = arestas_transito or []
+        # Ruas engarrafadas: frozenset partilhado com a cidade (não copiar)
+        self.arestas_transito = arestas_transito if arestas_transito is not None else frozenset()
 
         self.total_co2 = 0.0
         self.total_dinheiro = 0.0
 
+        self._assinatura_cache = None
+        self._hash = self._hash_completo()
+
     def is_objetivo(self):
         return len(self.pedidos_pendentes) == 0 and all(not v.ocupado for v in self.veiculos)
 
@@ -44,16 +76,101 @@ class Estado:
         return total, custo_operacional, custo_ambiental
 
     def copia_segura(self):
-        novos_veiculos = [v.clone() for v in self.veiculos]
-        novos_pedidos = list(self.pedidos_pendentes)
-        novo = Estado(novos_veiculos, novos_pedidos, self.tempo_atual, self.custo_acumulado, self.alerta)
+        """Cópia rasa: veículos e pedidos são imutáveis, logo são partilhados."""
+        novo = Estado.__new__(type(self))
+        novo.veiculos = self.veiculos
+        novo.pedidos_pendentes = self.pedidos_pendentes
+        novo.tempo_atual = self.tempo_atual
+        novo.custo_acumulado = self.custo_acumulado
+        novo.pai = None
+        novo.acao_geradora = None
+        novo.alerta = self.alerta
+        novo.arestas_transito = frozenset()
         novo.total_co2 = self.total_co2
         novo.total_dinheiro = self.total_dinheiro
-        novo.pai = None
+        novo._hash = self._hash
+        novo._assinatura_cache = self._assinatura_cache
         return novo
 
-    def gera_sucessores(self, cidade):
+    def com_pedidos(self, pedidos):
+        """Cópia rasa com outros pedidos pendentes (hash atualizado por XOR)."""
+        ns = self.copia_segura()
+        ns.pedidos_pendentes = tuple(pedidos)
+        for p in self.pedidos_pendentes: ns._hash ^= _zobrist(('P', p.id))
+        for p in ns.pedidos_pendentes: ns._hash ^= _zobrist(('P', p.id))
+        ns._assinatura_cache = None
+        return ns
+
+    def _novo_filho(self):
+        ns = self.copia_segura()
+        ns.alerta = None
+        return ns
+
+    def _trocar_veiculo(self, ns, i, v_novo):
+        v_antigo = ns.veiculos[i]
+        ns.veiculos = ns.veiculos[:i] + (v_novo,) + ns.veiculos[i + 1:]
+        ns._hash ^= self._chave_zobrist_veiculo(v_antigo) ^ self._chave_zobrist_veiculo(v_novo)
+        ns._assinatura_cache = None
+
+    def _aplicar_custo(self, ns, veiculo, distancia_km, tempo_min):
+        custo, eur, co2 = self.calcular_custo_acao(veiculo, distancia_km, tempo_min)
+        ns.custo_acumulado += custo
+        ns.tempo_atual += tempo_min
+        ns.total_dinheiro += eur
+        ns.total_co2 += co2
+
+    def _mover(self, ns, i, veiculo, destino, dist, tempo):
+        v = ns.veiculos[i]
+        self._trocar_veiculo(ns, i, v.mover(destino, dist))
+        self._aplicar_custo(ns, veiculo, dist, tempo)
+
+    def _recolher(self, ns, i, veiculo, pedido):
+        v = ns.veiculos[i]
+        self._trocar_veiculo(ns, i, v.alterar(ocupado=True, passageiros_a_bordo=v.passageiros_a_bordo + (pedido,)))
+        ns.pedidos_pendentes = tuple(p for p in ns.pedidos_pendentes if p.id != pedido.id)
+        ns._hash ^= _zobrist(('P', pedido.id))
+
+        t_op = TEMPO_OPERACAO
+        custo, eur, co2 = self.calcular_custo_acao(veiculo, 0, t_op)
+
+        if pedido.prefere_eletrico and veiculo.tipo == "combustao":
+            custo += PENALIDADE_CLIENTE_INSATISFEITO
+
+        if v.autonomia_atual < (veiculo.autonomia_max * 0.20):
+            custo += PENALIDADE_RISCO_BATERIA
+
+        ns.custo_acumulado += custo
+        ns.tempo_atual += t_op
+        ns.total_dinheiro += eur
+        ns.total_co2 += co2
+
+    def _entregar(self, ns, i, veiculo):
+        v = ns.veiculos[i]
+        self._trocar_veiculo(ns, i, v.alterar(ocupado=False, passageiros_a_bordo=()))
+        self._aplicar_custo(ns, veiculo, 0, TEMPO_OPERACAO)
+
+    def _recarregar(self, ns, i, veiculo):
+        v = ns.veiculos[i]
+        recuperado = veiculo.autonomia_max - v.autonomia_atual
+        self._trocar_veiculo(ns, i, v.alterar(autonomia_atual=veiculo.autonomia_max))
+
+        t_op = math.ceil(recuperado / 5)
+        custo, eur, co2 = self.calcular_custo_acao(veiculo, 0, t_op)
+        eur += (recuperado * 0.1)
+
+        ns.custo_acumulado += custo
+        ns.tempo_atual += t_op
+        ns.total_dinheiro += eur
+
+    def gera_sucessores(self, cidade, modo=MODO_MICRO):
+        if modo == MODO_MACRO:
+            return self.gera_sucessores_macro(cidade)
+
         sucessores = []
+        # Adjacência CSR: ids das arestas contíguos por nó, pesos em listas por id
+        pesos = cidade.pesos_arestas()
+        linhas, destinos = pesos.linhas, pesos.destinos
+        distancias, tempos = pesos.listas['dist'], pesos.listas['time']
 
         for i, veiculo in enumerate(self.veiculos):
 
@@ -64,48 +181,18 @@ class Estado:
                         if self.tempo_atual > pedido.prazo:
                             continue
 
-                        ns = self.copia_segura()
-                        ns.alerta = None
-                        v_novo = ns.veiculos[i]
-
-                        v_novo.ocupado = True
-                        v_novo.passageiros_a_bordo.append(pedido)
-                        ns.pedidos_pendentes = [p for p in ns.pedidos_pendentes if p.id != pedido.id]
-
-                        t_op = 2
-                        custo, eur, co2 = self.calcular_custo_acao(veiculo, 0, t_op)
-
-                        if pedido.prefere_eletrico and veiculo.tipo == "combustao":
-                            custo += PENALIDADE_CLIENTE_INSATISFEITO
-
-                        if veiculo.autonomia_atual < (veiculo.autonomia_max * 0.20):
-                            custo += PENALIDADE_RISCO_BATERIA
-
-                        ns.custo_acumulado += custo
-                        ns.tempo_atual += t_op
-                        ns.total_dinheiro += eur
-                        ns.total_co2 += co2
-                        ns.acao_geradora = f"[{v_novo.id}] Recolheu passageiro em {v_novo.local}"
+                        ns = self._novo_filho()
+                        self._recolher(ns, i, veiculo, pedido)
+                        ns.acao_geradora = f"[{veiculo.id}] Recolheu passageiro em {veiculo.local}"
                         sucessores.append(ns)
 
             # 2. ENTREGAR
             if veiculo.ocupado and veiculo.passageiros_a_bordo:
                 pedido = veiculo.passageiros_a_bordo[0]
                 if veiculo.local == pedido.destino:
-                    ns = self.copia_segura()
-                    ns.alerta = None
-                    v_novo = ns.veiculos[i]
-                    v_novo.ocupado = False
-                    v_novo.passageiros_a_bordo = []
-
-                    t_op = 2
-                    custo, eur, co2 = self.calcular_custo_acao(veiculo, 0, t_op)
-
-                    ns.custo_acumulado += custo
-                    ns.tempo_atual += t_op
-                    ns.total_dinheiro += eur
-                    ns.total_co2 += co2
-                    ns.acao_geradora = f"[{v_novo.id}] Entregou passageiro em {v_novo.local}"
+                    ns = self._novo_filho()
+                    self._entregar(ns, i, veiculo)
+                    ns.acao_geradora = f"[{veiculo.id}] Entregou passageiro em {veiculo.local}"
                     sucessores.append(ns)
 
             # 3. RECARREGAR / ABASTECER
@@ -114,49 +201,100 @@ class Estado:
                        (veiculo.tipo == "combustao" and tipo_loc == "combustivel")
 
             if pode_rec and veiculo.autonomia_atual < (veiculo.autonomia_max * 0.8):
-                ns = self.copia_segura()
-                ns.alerta = None
-                v_novo = ns.veiculos[i]
-                recuperado = veiculo.autonomia_max - veiculo.autonomia_atual
-                v_novo.autonomia_atual = veiculo.autonomia_max
-
-                t_op = math.ceil(recuperado / 5)
-                custo, eur, co2 = self.calcular_custo_acao(veiculo, 0, t_op)
-                eur += (recuperado * 0.1)
-
-                ns.custo_acumulado += custo
-                ns.tempo_atual += t_op
-                ns.total_dinheiro += eur
-
+                ns = self._novo_filho()
+                self._recarregar(ns, i, veiculo)
                 acao_nome = "Recarregou" if veiculo.tipo == "eletrico" else "Abasteceu"
-                ns.acao_geradora = f"[{v_novo.id}] {acao_nome} em {v_novo.local}"
+                ns.acao_geradora = f"[{veiculo.id}] {acao_nome} em {veiculo.local}"
                 sucessores.append(ns)
 
             # 4. MOVER
-            vizinhos = cidade.get_neighbors(veiculo.local)
-            for vizinho in vizinhos:
-                dados = cidade.graph[veiculo.local][vizinho]
-                dist = dados['dist']
-                tempo = dados['time']
+            for aresta in linhas[veiculo.local]:
+                vizinho = destinos[aresta]
+                dist = distancias[aresta]
+                tempo = tempos[aresta]
 
                 if veiculo.autonomia_atual >= dist:
-                    ns = self.copia_segura()
-                    ns.alerta = None
-                    v_novo = ns.veiculos[i]
-                    v_novo.local = vizinho
-                    v_novo.autonomia_atual -= dist
-
-                    custo, eur, co2 = self.calcular_custo_acao(veiculo, dist, tempo)
-
-                    ns.custo_acumulado += custo
-                    ns.tempo_atual += tempo
-                    ns.total_dinheiro += eur
-                    ns.total_co2 += co2
-                    ns.acao_geradora = f"[{v_novo.id}] Moveu: {veiculo.local} -> {vizinho}"
+                    ns = self._novo_filho()
+                    self._mover(ns, i, veiculo, vizinho, dist, tempo)
+                    ns.acao_geradora = f"[{veiculo.id}] Moveu: {veiculo.local} -> {vizinho}"
+                    sucessores.append(ns)
+
+        return sucessores
+
+    def _postos_para(self, veiculo, cidade):
+        """
+        Postos do tipo do veículo alcançáveis na rede, como [(posto, km)] do mais
+        perto ao mais longe. As distâncias vêm todas da linha da árvore de 'dist'
+        do oráculo a partir do veículo (uma consulta, já em cache entre sucessores).
+        """
+        tipo = "recarga" if veiculo.tipo == "eletrico" else "combustivel"
+        postos = cidade.postos(tipo)
+        if not postos: return []
+        km = cidade.rotas.vetor(veiculo.local)[cidade.indices(postos)]
+        return [(postos[j], float(km[j])) for j in np.argsort(km, kind='stable') if np.isfinite(km[j])]
+
+    def gera_sucessores_macro(self, cidade):
+        """
+        Sucessores de alto nível: cada ação conduz um veículo pelo caminho mais
+        curto (oráculo de rotas da cidade) e executa logo a operação no destino.
+        1. Ir recolher um pedido pendente.
+        2. Ir entregar o passageiro a bordo.
+        3. Ir ao posto (carregador/bomba) mais próximo e recarregar.
+        """
+        sucessores = []
+        rotas = cidade.rotas
+
+        for i, veiculo in enumerate(self.veiculos):
+
+            # 1. IR RECOLHER
+            if not veiculo.ocupado and veiculo.autonomia_atual > 1:
+                for pedido in self.pedidos_pendentes:
+                    rota = rotas.rota(veiculo.local, pedido.origem)
+                    if rota is None: continue
+                    _, dist, tempo = rota
+                    if veiculo.autonomia_atual < dist: continue
+                    if self.tempo_atual + tempo > pedido.prazo: continue
+
+                    ns = self._novo_filho()
+                    self._mover(ns, i, veiculo, pedido.origem, dist, tempo)
+                    self._recolher(ns, i, veiculo, pedido)
+                    ns.acao_geradora = f"[{veiculo.id}] Recolheu passageiro em {pedido.origem} ({dist:.2f}km)"
+                    sucessores.append(ns)
+
+            # 2. IR ENTREGAR
+            if veiculo.ocupado and veiculo.passageiros_a_bordo:
+                pedido = veiculo.passageiros_a_bordo[0]
+                rota = rotas.rota(veiculo.local, pedido.destino)
+                if rota is not None and veiculo.autonomia_atual >= rota[1]:
+                    _, dist, tempo = rota
+                    ns = self._novo_filho()
+                    self._mover(ns, i, veiculo, pedido.destino, dist, tempo)
+                    self._entregar(ns, i, veiculo)
+                    ns.acao_geradora = f"[{veiculo.id}] Entregou passageiro em {pedido.destino} ({dist:.2f}km)"
+                    sucessores.append(ns)
+
+            # 3. IR RECARREGAR / ABASTECER (posto mais próximo na rede)
+            if not veiculo.ocupado and veiculo.autonomia_atual < (veiculo.autonomia_max * 0.8):
+                postos = self._postos_para(veiculo, cidade)
+                if postos and veiculo.autonomia_atual >= postos[0][1]:
+                    melhor = postos[0][0]
+                    _, dist, tempo = rotas.rota(veiculo.local, melhor)
+                    ns = self._novo_filho()
+                    self._mover(ns, i, veiculo, melhor, dist, tempo)
+                    self._recarregar(ns, i, veiculo)
+                    acao_nome = "Recarregou" if veiculo.tipo == "eletrico" else "Abasteceu"
+                    ns.acao_geradora = f"[{veiculo.id}] {acao_nome} em {melhor} ({dist:.2f}km)"
                     sucessores.append(ns)
 
         return sucessores
 
+    def __reduce__(self):
+        # Serialização compacta (ex: envio para processos do planeador): só o
+        # conteúdo do estado, sem a cadeia de pais. O hash é recalculado ao
+        # carregar, porque a tabela Zobrist é própria de cada processo.
+        return (_reconstruir_estado, (self.veiculos, self.pedidos_pendentes, self.tempo_atual, self.custo_acumulado,
+                                      self.acao_geradora, self.alerta, self.total_co2, self.total_dinheiro))
+
     def __lt__(self, other):
         return self.custo_acumulado < other.custo_acumulado
 
@@ -166,12 +304,42 @@ class Estado:
         if ratio < 0.8: return 1
         return 2
 
+    def _assinatura_veiculo(self, v):
+        return (v.id, v.local, v.ocupado, self._get_nivel_bateria(v), tuple(p.id for p in v.passageiros_a_bordo))
+
+    def _chave_zobrist_veiculo(self, v):
+        return _zobrist(self._assinatura_veiculo(v))
+
+    def _hash_completo(self):
+        """Hash Zobrist calculado de raiz (usado só no estado inicial)."""
+        h = 0
+        for v in self.veiculos:
+            h ^= self._chave_zobrist_veiculo(v)
+        for p in self.pedidos_pendentes:
+            h ^= _zobrist(('P', p.id))
+        return h
+
+    def _assinatura(self):
+        if self._assinatura_cache is None:
+            self._assinatura_cache = (tuple(self._assinatura_veiculo(v) for v in self.veiculos),
+                                      frozenset(p.id for p in self.pedidos_pendentes))
+        return self._assinatura_cache
+
     def __hash__(self):
-        v_info = tuple((v.id, v.local, v.ocupado, self._get_nivel_bateria(v)) for v in self.veiculos)
-        p_bordo = tuple(tuple(p.id for p in v.passageiros_a_bordo) for v in self.veiculos)
-        p_pend = tuple(p.id for p in self.pedidos_pendentes)
-        return hash((v_info, p_bordo, p_pend))
+        return self._hash
 
     def __eq__(self, other):
+        if self is other: return True
         if not isinstance(other, Estado): return False
-        return hash(self) == hash(other)
\ No newline at end of file
+        if self._hash != other._hash: return False
+        if self.veiculos is other.veiculos and self.pedidos_pendentes is other.pedidos_pendentes: return True
+        return self._assinatura() == other._assinatura()
+
+
+def _reconstruir_estado(veiculos, pedidos_pendentes, tempo_atual, custo_acumulado, acao_geradora, alerta,
+                        total_co2, total_dinheiro):
+    estado = Estado(veiculos, pedidos_pendentes, tempo_atual, custo_acumulado, alerta)
+    estado.acao_geradora = acao_geradora
+    estado.total_co2 = total_co2
+    estado.total_dinheiro = total_dinheiro
+    return estado
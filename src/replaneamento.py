@@ -0,0 +1,219 @@
+import heapq
+
+
+class DStarLite:
+    """
+    D* Lite (Koenig & Likhachev): procura para trás a partir do destino que
+    mantém g/rhs entre chamadas. Quando o peso de arestas muda, só os nós cujo
+    custo até ao destino muda são reexpandidos; mudar a origem (o veículo
+    avançou) não obriga a recomeçar, graças ao acumulador km.
+    Os pesos são lidos diretamente das listas do PesosArestas da cidade.
+    """
+
+    # Chaves com k1 iguais a menos do arredondamento (g + h) desempatam por k2
+    EPSILON = 1e-9
+
+    def __init__(self, pesos, origem, destino, peso='dist', heuristica=None):
+        self.pesos = pesos
+        self.antecessores = pesos.antecessores()
+        self.peso = peso
+        self.h = heuristica or (lambda a, b: 0.0)
+        self.origem = origem
+        self.destino = destino
+        self.ultima = origem
+        self.km = 0.0
+        self.h_origem = {}  # h(origem, s) em cache até a origem mudar
+        self.g = {}
+        self.rhs = {destino: 0.0}
+        self.fila = []
+        self.na_fila = {}  # {nó: chave atual} (entradas antigas da heap são ignoradas)
+        self.count = 0
+        self.expansoes = 0
+        self._inserir(destino)
+
+    def _chave(self, s):
+        m = min(self.g.get(s, float('inf')), self.rhs.get(s, float('inf')))
+        h = self.h_origem.get(s)
+        if h is None:
+            h = self.h_origem[s] = self.h(self.origem, s)
+        return (m + h + self.km, m)
+
+    def _inserir(self, s):
+        chave = self._chave(s)
+        self.na_fila[s] = chave
+        self.count += 1
+        heapq.heappush(self.fila, (chave, self.count, s))
+
+    def _atualizar_no(self, u):
+        if u != self.destino:
+            melhor = float('inf')
+            destinos, valores = self.pesos.destinos, self.pesos.listas[self.peso]
+            for k in self.pesos.linhas.get(u, ()):
+                c = valores[k] + self.g.get(destinos[k], float('inf'))
+                if c < melhor: melhor = c
+            self.rhs[u] = melhor
+        if self.g.get(u, float('inf')) != self.rhs.get(u, float('inf')):
+            self._inserir(u)
+        else:
+            self.na_fila.pop(u, None)
+
+    def _menor(self, a, b):
+        if a[0] < b[0] - self.EPSILON: return True
+        return abs(a[0] - b[0]) <= self.EPSILON and a[1] < b[1]
+
+    def _topo(self):
+        while self.fila:
+            chave, _, s = self.fila[0]
+            if self.na_fila.get(s) == chave: return chave, s
+            heapq.heappop(self.fila)
+        return (float('inf'), float('inf')), None
+
+    def calcular(self):
+        """Repara a árvore até a origem ficar consistente."""
+        while True:
+            k_antiga, u = self._topo()
+            g_origem = self.g.get(self.origem, float('inf'))
+            rhs_origem = self.rhs.get(self.origem, float('inf'))
+            if u is None or (not self._menor(k_antiga, self._chave(self.origem)) and rhs_origem == g_origem): break
+
+            heapq.heappop(self.fila)
+            del self.na_fila[u]
+            self.expansoes += 1
+
+            k_nova = self._chave(u)
+            g_u = self.g.get(u, float('inf'))
+            rhs_u = self.rhs.get(u, float('inf'))
+            if k_antiga < k_nova:
+                self._inserir(u)
+            elif g_u > rhs_u:
+                self.g[u] = rhs_u
+                for p in self.antecessores.get(u, ()):
+                    self._atualizar_no(p)
+            else:
+                self.g[u] = float('inf')
+                self._atualizar_no(u)
+                for p in self.antecessores.get(u, ()):
+                    self._atualizar_no(p)
+
+    def mover_origem(self, nova):
+        self.km += self.h(self.ultima, nova)
+        self.ultima = nova
+        self.origem = nova
+        self.h_origem = {}
+
+    def atualizar_arestas(self, arestas):
+        """Avisa que o peso das arestas (u, v) mudou no grafo. Não recalcula."""
+        for u, v in arestas:
+            # Nós nunca tocados pela procura não têm rhs a corrigir
+            if u in self.rhs: self._atualizar_no(u)
+
+    def custo(self):
+        return self.g.get(self.origem, float('inf'))
+
+    def caminho(self):
+        """Caminho origem -> destino pela árvore atual (após calcular()), ou None."""
+        if self.custo() == float('inf'): return None
+        destinos, valores = self.pesos.destinos, self.pesos.listas[self.peso]
+        caminho = [self.origem]
+        atual = self.origem
+        while atual != self.destino:
+            k = min(self.pesos.linhas[atual], key=lambda k: valores[k] + self.g.get(destinos[k], float('inf')))
+            atual = destinos[k]
+            caminho.append(atual)
+        return caminho
+
+
+class ReparadorRotas:
+    """
+    Mantém uma árvore D* Lite por veículo para o destino da perna atual (os
+    passos de movimento seguidos até à próxima operação), com o mesmo peso com
+    que as rotas são planeadas. A árvore é reaproveitada passo a passo (só a
+    origem avança) e reparada quando o trânsito altera pesos, em vez de
+    replanear do zero. O tempo de cada passo soma os tempos atuais das arestas
+    do caminho que o veículo está de facto a percorrer.
+    """
+
+    def __init__(self, cidade, peso='dist'):
+        self.cidade = cidade
+        self.peso = peso
+        self.heuristica = self._heuristica_alt()
+        self.arvores = {}  # {id_veiculo: DStarLite}
+        self.passos = {}  # {id_veiculo: (destino do passo, ids das arestas do passo)}
+        self.eventos = 0
+        self.expansoes_reparacao = 0
+
+    def _heuristica_alt(self):
+        """
+        Limite ALT da distância escalado pelo menor custo por km do grafo atual.
+        Continua admissível enquanto o trânsito só tornar as ruas mais lentas.
+        """
+        landmarks = getattr(self.cidade, 'landmarks', None)
+        if landmarks is None: return None
+        if self.peso == 'dist': return landmarks.limite_inferior
+
+        pesos = self.cidade.pesos_arestas()
+        dist = pesos.valores('dist')
+        positivas = dist > 0
+        fator = float((pesos.valores(self.peso)[positivas] / dist[positivas]).min()) if positivas.any() else 0.0
+        return lambda a, b: fator * landmarks.limite_inferior(a, b)
+
+    def seguir(self, id_veiculo, origem, destino, destino_perna=None):
+        """
+        Passo origem -> destino dentro da perna que acaba em 'destino_perna'
+        (por omissão o próprio destino). Reaproveita a árvore se a perna é a
+        mesma. Devolve o tempo atual do passo (min).
+        """
+        if destino_perna is None: destino_perna = destino
+        arvore = self.arvores.get(id_veiculo)
+        if arvore is not None and arvore.destino == destino_perna:
+            arvore.mover_origem(origem)
+        else:
+            arvore = DStarLite(self.cidade.pesos_arestas(), origem, destino_perna, self.peso, self.heuristica)
+            self.arvores[id_veiculo] = arvore
+        arvore.calcular()
+        self.passos[id_veiculo] = (destino, self._arestas_passo(arvore, destino))
+        return self._tempo(self.passos[id_veiculo][1])
+
+    def _arestas_passo(self, arvore, destino):
+        """Ids das arestas do caminho da árvore até 'destino' (ou da aresta direta, se estiver fora dele)."""
+        pesos = arvore.pesos
+        caminho = arvore.caminho()
+        if caminho is not None and destino in caminho:
+            caminho = caminho[:caminho.index(destino) + 1]
+        elif pesos.id_aresta(arvore.origem, destino) is not None:
+            caminho = [arvore.origem, destino]
+        else:
+            caminho = self.cidade.rotas.caminho(arvore.origem, destino, self.peso) or [arvore.origem]
+        return [pesos.id_aresta(u, v) for u, v in zip(caminho, caminho[1:])]
+
+    def _tempo(self, arestas):
+        tempos = self.cidade.pesos_arestas().listas['time']
+        return sum(tempos[k] for k in arestas)
+
+    def largar(self, id_veiculo):
+        self.arvores.pop(id_veiculo, None)
+        self.passos.pop(id_veiculo, None)
+
+    def atualizar(self, arestas):
+        """
+        Aplica arestas alteradas a todas as árvores. Devolve {id_veiculo: novo
+        tempo do passo} dos veículos cujo passo mudou de caminho ou de tempo.
+        """
+        self.eventos += 1
+        pesos = self.cidade.pesos_arestas()
+        alteradas = {pesos.id_aresta(u, v) for u, v in arestas}
+        tempos = {}
+        for id_veiculo, arvore in self.arvores.items():
+            antes = arvore.expansoes
+            arvore.atualizar_arestas(arestas)
+            arvore.calcular()
+            reparadas = arvore.expansoes - antes
+            self.expansoes_reparacao += reparadas
+
+            destino, passo = self.passos[id_veiculo]
+            if reparadas:
+                passo = self._arestas_passo(arvore, destino)
+                self.passos[id_veiculo] = (destino, passo)
+            if reparadas or not alteradas.isdisjoint(passo):
+                tempos[id_veiculo] = self._tempo(passo)
+        return tempos
@@ -0,0 +1,225 @@
+from collections import OrderedDict
+import numpy as np
+from scipy.sparse import csgraph
+
+
+def dijkstra(pesos, origem, peso='dist'):
+    """
+    Dijkstra completo (SciPy) a partir de 'origem' sobre o CSR de um PesosArestas.
+    Devolve (distancias, pais) em arrays indexados pelos ids densos, com inf nos
+    nós inalcançáveis e pai negativo nesses nós e na origem.
+    """
+    return csgraph.dijkstra(pesos.matriz(peso), indices=pesos.indice[origem], return_predecessors=True)
+
+
+def _somar_na_arvore(pesos, pais, peso):
+    """
+    Soma de 'peso' ao longo dos caminhos das árvores de Dijkstra 'pais' (R x N,
+    negativo na raiz e nos nós inalcançáveis), por saltos de ponteiros: em cada
+    ronda cada nó junta a soma do seu ancestral e salta para o ancestral deste.
+    """
+    n = pais.shape[1]
+    pais = pais.astype(np.int64).ravel()
+    soma = np.zeros(len(pais))
+    ativos = np.flatnonzero(pais >= 0)
+    soma[ativos] = pesos.valores(peso)[pesos.ids_arestas(pais[ativos], ativos % n)]
+    ancestral = np.full(len(pais), -1, dtype=np.int64)
+    ancestral[ativos] = ativos - ativos % n + pais[ativos]
+    while ativos.size:
+        acima = ancestral[ativos]
+        soma[ativos] += soma[acima]
+        ancestral[ativos] = ancestral[acima]
+        ativos = ativos[ancestral[ativos] >= 0]
+    return soma.reshape(-1, n)
+
+
+class OraculoRotas:
+    """
+    Responde a perguntas origem -> destino (distância, tempo e caminho) sobre o
+    grafo de uma Cidade. Guarda a árvore de Dijkstra de cada origem consultada
+    (arrays de custos e pais sobre os ids densos) numa cache LRU, para que
+    planeadores e simulador reutilizem as rotas.
+    Se houver uma HierarquiaContracao registada para o peso, as consultas
+    ponto-a-ponto de origens sem árvore em cache usam-na em vez de um Dijkstra
+    completo (e o resultado do par fica também em cache LRU).
+    """
+
+    def __init__(self, cidade, capacidade=256):
+        self.cidade = cidade
+        self.capacidade = capacidade
+        self.arvores = OrderedDict()  # {(origem, peso): (array de custos, array de pais)}
+        self.hierarquias = {}  # {peso: HierarquiaContracao}
+        self.pares = OrderedDict()  # {(origem, destino, peso): [custo, caminho]} (via hierarquia)
+        self.viagens = OrderedDict()  # {(origem, destino): (km, ids das arestas)} de rota(), sem o tempo
+        self.versoes = {}  # {peso: versão dos pesos da cidade com que as caches foram calculadas}
+        self.hits = 0
+        self.misses = 0
+        self.consultas_ch = 0
+
+    def limpar(self):
+        """Descarta todas as árvores e hierarquias (ex: quando o grafo muda)."""
+        self.arvores.clear()
+        self.hierarquias.clear()
+        self.pares.clear()
+        self.viagens.clear()
+
+    def invalidar(self, peso):
+        """Descarta o que foi calculado com 'peso' (ex: tempos alterados pelo trânsito)."""
+        self.hierarquias.pop(peso, None)
+        for chave in [c for c in self.arvores if c[1] == peso]: del self.arvores[chave]
+        for chave in [c for c in self.pares if c[2] == peso]: del self.pares[chave]
+        if peso == 'dist': self.viagens.clear()
+
+    def _validar(self, peso):
+        """Descarta as caches de 'peso' se os pesos da cidade mudaram entretanto."""
+        versao = self.cidade.versao_pesos(peso)
+        anterior = self.versoes.get(peso)
+        if anterior != versao:
+            if anterior is not None: self.invalidar(peso)
+            self.versoes[peso] = versao
+
+    def usar_hierarquia(self, hierarquia):
+        self.hierarquias[hierarquia.peso] = hierarquia
+
+    def _par(self, origem, destino, peso, com_caminho=False):
+        chave = (origem, destino, peso)
+        par = self.pares.get(chave)
+        if par is not None and (par[1] is not None or not com_caminho):
+            self.hits += 1
+            self.pares.move_to_end(chave)
+            return par
+
+        self.consultas_ch += 1
+        ch = self.hierarquias[peso]
+        if com_caminho:
+            par = list(ch.rota(origem, destino))
+        else:
+            par = [ch.distancia(origem, destino), None]
+        self.pares[chave] = par
+        if len(self.pares) > self.capacidade * 64:
+            self.pares.popitem(last=False)
+        return par
+
+    def _usa_hierarquia(self, origem, peso):
+        return peso in self.hierarquias and (origem, peso) not in self.arvores
+
+    def _custo(self, origem, destino, peso):
+        self._validar(peso)
+        if self._usa_hierarquia(origem, peso):
+            return self._par(origem, destino, peso)[0]
+        distancias, _ = self._arvore(origem, peso)
+        return float(distancias[self.cidade.pesos_arestas().indice[destino]])
+
+    def _arvore(self, origem, peso):
+        chave = (origem, peso)
+        arvore = self.arvores.get(chave)
+        if arvore is not None:
+            self.hits += 1
+            self.arvores.move_to_end(chave)
+            return arvore
+
+        self.misses += 1
+        arvore = dijkstra(self.cidade.pesos_arestas(), origem, peso)
+        self.arvores[chave] = arvore
+        if len(self.arvores) > self.capacidade:
+            self.arvores.popitem(last=False)
+        return arvore
+
+    def distancia(self, origem, destino):
+        """Distância (km) do caminho mais curto. Infinito se não houver caminho."""
+        return self._custo(origem, destino, 'dist')
+
+    def tempo(self, origem, destino):
+        """Tempo (min) do caminho mais rápido. Infinito se não houver caminho."""
+        return self._custo(origem, destino, 'time')
+
+    def caminho(self, origem, destino, peso='dist'):
+        """Lista de nós [origem, ..., destino] do caminho ótimo, ou None."""
+        self._validar(peso)
+        if self._usa_hierarquia(origem, peso):
+            return self._par(origem, destino, peso, com_caminho=True)[1]
+
+        _, pais = self._arvore(origem, peso)
+        pesos = self.cidade.pesos_arestas()
+        atual = pesos.indice[destino]
+        if atual != pesos.indice[origem] and pais[atual] < 0: return None
+
+        caminho = []
+        while atual >= 0:
+            caminho.append(pesos.nos[atual])
+            atual = pais[atual]
+        return list(reversed(caminho))
+
+    def vetor(self, origem, peso='dist'):
+        """
+        Custos de 'origem' para todos os nós, num array NumPy indexado pelos ids
+        densos da cidade (Cidade.indexar; não modificar). Serve para montar
+        matrizes com indexação vetorizada em vez de uma consulta por par.
+        """
+        self._validar(peso)
+        return self._arvore(origem, peso)[0]
+
+    def matriz(self, origens, destinos):
+        """
+        Arrays (km, min) de cada origem (linhas) para cada destino (colunas) ao
+        longo do caminho mais curto em distância, o mesmo que rota() percorre.
+        Todas as origens num só Dijkstra do SciPy sobre o CSR, sem usar as caches.
+        """
+        pesos = self.cidade.pesos_arestas()
+        unicas, linhas = np.unique(self.cidade.indices(origens), return_inverse=True)
+        colunas = self.cidade.indices(destinos)
+        km, pais = csgraph.dijkstra(pesos.matriz('dist'), indices=unicas, return_predecessors=True)
+        minutos = _somar_na_arvore(pesos, pais, 'time')
+        minutos[~np.isfinite(km)] = np.inf
+        return km[np.ix_(linhas, colunas)], minutos[np.ix_(linhas, colunas)]
+
+    def viagem(self, origem, destino):
+        """
+        (km, min) de rota(origem, destino). As arestas do caminho ficam em cache
+        enquanto as distâncias não mudarem e o tempo é somado com os pesos atuais:
+        a viagem de um pedido é procurada uma só vez, mesmo com trânsito.
+        """
+        self._validar('dist')
+        chave = (origem, destino)
+        viagem = self.viagens.get(chave)
+        if viagem is not None:
+            self.hits += 1
+            self.viagens.move_to_end(chave)
+        else:
+            pesos = self.cidade.pesos_arestas()
+            caminho = self.caminho(origem, destino)
+            if caminho is None:
+                viagem = (float('inf'), None)
+            else:
+                ids = pesos.ids_arestas(self.cidade.indices(caminho[:-1]), self.cidade.indices(caminho[1:]))
+                viagem = (float(pesos.valores('dist')[ids].sum()), ids)
+            self.viagens[chave] = viagem
+            if len(self.viagens) > self.capacidade * 64:
+                self.viagens.popitem(last=False)
+
+        km, ids = viagem
+        if ids is None: return km, float('inf')
+        return km, float(self.cidade.pesos_arestas().valores('time')[ids].sum())
+
+    def rota(self, origem, destino, peso='dist'):
+        """
+        Caminho ótimo segundo 'peso' com os totais agregados ao longo dele.
+        Devolve (caminho, dist_km, tempo_min) ou None se não houver caminho.
+        """
+        caminho = self.caminho(origem, destino, peso)
+        if caminho is None: return None
+
+        pesos = self.cidade.pesos_arestas()
+        distancias, tempos = pesos.listas['dist'], pesos.listas['time']
+        dist = tempo = 0.0
+        for u, v in zip(caminho, caminho[1:]):
+            k = pesos.id_aresta(u, v)
+            dist += distancias[k]
+            tempo += tempos[k]
+        return caminho, dist, tempo
+
+    def estatisticas(self):
+        total = self.hits + self.misses
+        taxa = (self.hits / total * 100) if total > 0 else 0
+        return {'hits': self.hits, 'misses': self.misses, 'taxa_acerto': taxa, 'arvores': len(self.arvores),
+                'consultas_ch': self.consultas_ch}
@@ -1,17 +1,90 @@
 import time
+import math
+import heapq
 import random
 import threading
 from modelos import Pedido
 from problema import Estado
-from problema import CUSTO_MINUTO, CUSTO_KM_ELETRICO, CUSTO_KM_COMBUSTAO
+from problema import CUSTO_MINUTO, CUSTO_KM_ELETRICO, CUSTO_KM_COMBUSTAO, MODO_MICRO
 import algoritmos
+from planeador import PlaneadorProcessos
+import despacho
+from replaneamento import ReparadorRotas
+from historico import HistoricoSimulacao
+
+# Onde corre o planeador
+PLANEAMENTO_THREAD = "thread"      # thread no mesmo processo (partilha o GIL)
+PLANEAMENTO_PROCESSO = "processo"  # processo dedicado, com cancelamento real
+PLANEAMENTO_ATRIBUICAO = "atribuicao"  # atribuição veículo-pedido + rotas independentes (frotas grandes)
+
+# Na atribuição com muitos táxis livres por pedido, só entram os K mais próximos de cada pedido
+CANDIDATOS_POR_PEDIDO = 8
+
+# Probabilidade de o trânsito mudar em cada minuto simulado
+PROBABILIDADE_TRANSITO = 0.05
+
+# Tipos de evento do modo de eventos discretos; no mesmo minuto são tratados
+# por esta ordem, a mesma do ciclo minuto a minuto
+EVENTO_TRANSITO = 0
+EVENTO_PEDIDO = 1
+EVENTO_PRAZO = 2
+EVENTO_CHEGADA = 3  # veículo termina uma deslocação/operação
+EVENTO_CARGA = 4    # veículo termina uma recarga/abastecimento
+
+# Tempo real máximo (s) por planeamento no modo de eventos, se orcamento_planeamento for None
+ORCAMENTO_EVENTOS = 2.0
+
+
+class _PesquisaThread:
+    """
+    Planeador a correr numa thread do próprio processo, com a mesma interface
+    de TarefaPlaneamento (terminada, resultado, tempo_cpu, estatisticas, esperar).
+    """
+
+    def __init__(self, algoritmo, estado, cidade, funcao_heuristica, kwargs):
+        self.resultado = None
+        self.tempo_cpu = 0.0  # só a thread da pesquisa escreve
+        self.estatisticas = kwargs.get('estatisticas')
+        self.thread = threading.Thread(target=self._correr, args=(algoritmo, estado, cidade, funcao_heuristica, kwargs))
+        self.thread.start()
+
+    def _correr(self, algoritmo, estado, cidade, funcao_heuristica, kwargs):
+        t0 = time.time()
+        resultado = algoritmos.executar(algoritmo, estado, cidade, funcao_heuristica, **kwargs)
+        self.tempo_cpu = time.time() - t0
+        self.resultado = resultado
+
+    @property
+    def terminada(self):
+        return not self.thread.is_alive()
+
+    def esperar(self, timeout):
+        """Espera até 'timeout' segundos (None = sem limite). Devolve True se terminou."""
+        self.thread.join(timeout)
+        return self.terminada
 
 
 class Simulador:
-    def __init__(self, cidade, frota_inicial, algoritmo_escolhido=None):
+    def __init__(self, cidade, frota_inicial, algoritmo_escolhido=None, modo_sucessores=MODO_MICRO,
+                 funcao_heuristica=algoritmos.heuristica_taxi, orcamento_planeamento=None,
+                 planeamento=PLANEAMENTO_THREAD, recolher_estatisticas=False, ficheiro_replay=None):
         self.cidade = cidade
         self.frota = frota_inicial
         self.algoritmo = algoritmo_escolhido
+        self.modo_sucessores = modo_sucessores
+        self.funcao_heuristica = funcao_heuristica
+        # Tempo real máximo (s) por planeamento; None = até ao fim da simulação
+        self.orcamento_planeamento = orcamento_planeamento
+        self.planos_parciais = 0
+        self.pico_nos_planeamento = 0
+        # Estatísticas dos planeadores (algoritmos._Medidor) somadas por minuto simulado.
+        # Os planeadores com memória limitada medem sempre (pico de nós)
+        self.recolher_estatisticas = recolher_estatisticas
+        self.estatisticas_planeamento = []  # [(minuto, dict agregado)]
+        self.planeamento = planeamento
+        self.planeador = None
+        # Pesquisas (thread ou processo) canceladas por falta de tempo e ainda a correr: [(pesquisa, minuto)]
+        self.pesquisas_atrasadas = []
         self.tempo_atual = 0
         self.pedidos_pendentes = []
         self.pedidos_ativos = []
@@ -21,11 +94,23 @@ class Simulador:
         for v in self.frota:
             v.rota_planeada = []
             v.ocupado_ate = 0
-        self.historico_estados = []
+        # Com ficheiro_replay o histórico vai sendo escrito em disco (RAM limitada ao bloco atual)
+        self.historico_estados = HistoricoSimulacao(self.frota, cidade, ficheiro_replay)
         self.total_dinheiro_gasto = 0.0
         self.tempo_cpu_total = 0.0
+        self.despachos = 0
+        # Árvores D* Lite da perna em curso de cada veículo, reparadas quando há trânsito
+        self.reparador = ReparadorRotas(cidade)
+        self.trechos = {}  # {id_veiculo: (tempo estimado do trecho, minuto de partida)}
+        # Posição dos táxis numa grelha espacial, atualizada a cada movimento
+        self.indice_frota = cidade.criar_grelha()
+        for i, v in enumerate(self.frota):
+            self.indice_frota.atualizar(i, *cidade.nodes[v.local]['coords'])
         self.km_total_vazio = 0.0
         self.km_total_ocupado = 0.0
+        # Fila de eventos [(minuto, tipo, seq, dados)], só no modo de eventos discretos
+        self.eventos = None
+        self.seq_eventos = 0
 
     def executar_simulacao(self, segundos_reais_limite, probabilidade_pedido=0.1):
 
@@ -38,8 +123,9 @@ class Simulador:
             self.tempo_atual += 1
             alerta_visual = ""
 
-            if random.random() < 0.05 and hasattr(self.cidade, 'simular_transito_dinamico'):
-                self.cidade.simular_transito_dinamico()
+            if random.random() < PROBABILIDADE_TRANSITO and hasattr(self.cidade, 'simular_transito_dinamico'):
+                alteradas = self.cidade.simular_transito_dinamico()
+                if alteradas: self._reparar_trechos(alteradas)
                 alerta_visual = "[TRANSITO ALTERADO]"
 
             self._gerar_novos_eventos(probabilidade_pedido)
@@ -54,42 +140,143 @@ class Simulador:
 
             if self._precisa_de_intervencao():
                 tempo_restante = deadline - time.time()
+                if self.orcamento_planeamento is not None:
+                    tempo_restante = min(tempo_restante, self.orcamento_planeamento)
                 if tempo_restante > 0.1:
-                    self._atribuir_tarefas_com_ia_threaded(tempo_restante)
+                    self._atribuir_tarefas_com_ia(tempo_restante)
 
             self._gravar_snapshot(alerta_extra=alerta_visual)
 
+        self._recolher_pesquisas_atrasadas(esperar=True)
+        if self.planeador is not None:
+            self.planeador.encerrar()
+            self.planeador = None
+        self.historico_estados.fechar()
+
         tempo_total_corrido = time.time() - start_real_global
         print(f"\nFIM DO TEMPO (Passaram {tempo_total_corrido:.2f}s).")
         self._imprimir_estatisticas(tempo_total_corrido)
         return self.historico_estados
 
+    def executar_simulacao_eventos(self, minutos_simulados, probabilidade_pedido=0.1):
+        """
+        Modo de eventos discretos: em vez de avançar minuto a minuto ao ritmo do
+        relógio real, salta diretamente para o próximo evento da fila (chegada de
+        pedidos, fim de deslocações e recargas, prazos e mudanças de trânsito).
+        As chegadas de pedidos e de trânsito seguem a mesma probabilidade por
+        minuto do modo em tempo real (intervalos geométricos). Cada planeamento
+        tem orcamento_planeamento segundos reais (ORCAMENTO_EVENTOS se for None).
+        """
+        start_real_global = time.time()
+        fim = self.tempo_atual + minutos_simulados
+        self.eventos = []
+        self._gravar_snapshot()
+
+        for p in self.pedidos_pendentes:
+            self._agendar(p.prazo + 1, EVENTO_PRAZO, p)
+        self._agendar_proximo(EVENTO_PEDIDO, probabilidade_pedido)
+        if hasattr(self.cidade, 'simular_transito_dinamico'):
+            self._agendar_proximo(EVENTO_TRANSITO, PROBABILIDADE_TRANSITO)
+
+        self._passo_eventos(probabilidade_pedido)
+        while self.eventos and self.eventos[0][0] <= fim:
+            self._avancar_relogio(self.eventos[0][0])
+            self._passo_eventos(probabilidade_pedido)
+        self._avancar_relogio(fim)
+        self.eventos = None
+
+        self._recolher_pesquisas_atrasadas(esperar=True)
+        if self.planeador is not None:
+            self.planeador.encerrar()
+            self.planeador = None
+        self.historico_estados.fechar()
+
+        tempo_total_corrido = time.time() - start_real_global
+        print(f"\nFIM DA SIMULACAO ({minutos_simulados} min simulados em {tempo_total_corrido:.2f}s).")
+        self._imprimir_estatisticas(tempo_total_corrido)
+        return self.historico_estados
+
+    def _avancar_relogio(self, minuto):
+        # O custo fixo por minuto de cada veículo acumula-se pelo salto inteiro
+        self.total_dinheiro_gasto += CUSTO_MINUTO * len(self.frota) * (minuto - self.tempo_atual)
+        self.tempo_atual = minuto
+
+    def _passo_eventos(self, probabilidade_pedido):
+        alerta_visual = self._processar_eventos(probabilidade_pedido)
+        if self._precisa_de_intervencao():
+            orcamento = self.orcamento_planeamento
+            self._atribuir_tarefas_com_ia(ORCAMENTO_EVENTOS if orcamento is None else orcamento)
+            # Veículos livres que receberam um plano partem já neste minuto
+            for i, v in enumerate(self.frota):
+                if v.rota_planeada and v.ocupado_ate <= self.tempo_atual:
+                    self._agendar(self.tempo_atual, EVENTO_CHEGADA, i)
+            self._processar_eventos(probabilidade_pedido)
+        self._gravar_snapshot(alerta_extra=alerta_visual)
+
+    def _processar_eventos(self, probabilidade_pedido):
+        """Trata todos os eventos até ao minuto atual. Devolve o texto de alerta para o snapshot."""
+        alertas = []
+        while self.eventos and self.eventos[0][0] <= self.tempo_atual:
+            _, tipo, _, dados = heapq.heappop(self.eventos)
+            if tipo == EVENTO_TRANSITO:
+                alteradas = self.cidade.simular_transito_dinamico()
+                if alteradas: self._reparar_trechos(alteradas)
+                alertas.append("[TRANSITO ALTERADO]")
+                self._agendar_proximo(EVENTO_TRANSITO, PROBABILIDADE_TRANSITO)
+            elif tipo == EVENTO_PEDIDO:
+                pedido = self._criar_pedido()
+                self._agendar(pedido.prazo + 1, EVENTO_PRAZO, pedido)
+                self._agendar_proximo(EVENTO_PEDIDO, probabilidade_pedido)
+            elif tipo == EVENTO_PRAZO:
+                if dados in self.pedidos_pendentes:
+                    self.pedidos_pendentes.remove(dados)
+                    self.pedidos_falhados.append(dados)
+                    alertas.append(f"[FALHOU PEDIDO: {dados.id}]")
+            else:
+                # Eventos antigos (trecho reparado ou veículo já a meio de outro passo) são ignorados
+                v = self.frota[dados]
+                if v.ocupado_ate <= self.tempo_atual and v.rota_planeada:
+                    prox = v.rota_planeada.pop(0)
+                    self._aplicar_transicao_veiculo(dados, v, prox.veiculos[dados], prox)
+        return " | ".join(alertas)
+
+    def _agendar(self, minuto, tipo, dados):
+        if self.eventos is None: return
+        self.seq_eventos += 1
+        heapq.heappush(self.eventos, (minuto, tipo, self.seq_eventos, dados))
+
+    def _agendar_proximo(self, tipo, probabilidade):
+        """Próxima ocorrência de um evento com 'probabilidade' por minuto (intervalo geométrico)."""
+        if probabilidade <= 0: return
+        intervalo = 1
+        if probabilidade < 1:
+            intervalo += int(math.log(1.0 - random.random()) / math.log(1.0 - probabilidade))
+        self._agendar(self.tempo_atual + intervalo, tipo, None)
+
     def _gravar_snapshot(self, alerta_extra=None):
-        frota_copia = [v.clone() for v in self.frota]
-        ruas_engarrafadas = []
+        ruas_engarrafadas = frozenset()
         if hasattr(self.cidade, 'get_arestas_engarrafadas'):
             ruas_engarrafadas = self.cidade.get_arestas_engarrafadas()
 
-        snapshot = Estado(frota_copia, list(self.pedidos_pendentes), self.tempo_atual,
-                          alerta=alerta_extra, arestas_transito=ruas_engarrafadas)
-
-        snapshot.total_dinheiro = self.total_dinheiro_gasto
-        snapshot.acao_geradora = f"Min: {self.tempo_atual}"
-        if len(self.pedidos_pendentes) > 0:
-            snapshot.acao_geradora += f" | {len(self.pedidos_pendentes)} Pend"
-        self.historico_estados.append(snapshot)
+        # Só as diferenças face ao snapshot anterior são guardadas; o Estado é montado quando for pedido
+        self.historico_estados.gravar(self.tempo_atual, self.frota, self.pedidos_pendentes,
+                                      self.total_dinheiro_gasto, alerta_extra, ruas_engarrafadas)
 
     def _gerar_novos_eventos(self, probabilidade):
         if random.random() < probabilidade:
-            self.id_counter += 1
-            o = self.cidade.get_local_aleatorio()
-            d = self.cidade.get_local_aleatorio()
-            while d == o: d = self.cidade.get_local_aleatorio()
+            self._criar_pedido()
+
+    def _criar_pedido(self):
+        self.id_counter += 1
+        o = self.cidade.get_local_aleatorio()
+        d = self.cidade.get_local_aleatorio()
+        while d == o: d = self.cidade.get_local_aleatorio()
 
-            e_eco = random.random() < 0.25
+        e_eco = random.random() < 0.25
 
-            self.pedidos_pendentes.append(
-                Pedido(self.id_counter, o, d, 1, self.tempo_atual + 60, self.tempo_atual, prefere_eletrico=e_eco))
+        pedido = Pedido(self.id_counter, o, d, 1, self.tempo_atual + 60, self.tempo_atual, prefere_eletrico=e_eco)
+        self.pedidos_pendentes.append(pedido)
+        return pedido
 
     def _verificar_prazos(self):
         falhados_agora = []
@@ -106,35 +293,138 @@ class Simulador:
             if v.ocupado_ate > self.tempo_atual: continue
             if v.rota_planeada:
                 prox = v.rota_planeada.pop(0)
-                self._aplicar_transicao_veiculo(v, prox.veiculos[i], prox)
+                self._aplicar_transicao_veiculo(i, v, prox.veiculos[i], prox)
 
     def _precisa_de_intervencao(self):
         livres = [v for v in self.frota if not v.rota_planeada and v.ocupado_ate <= self.tempo_atual]
         return len(self.pedidos_pendentes) > 0 and len(livres) > 0
 
+    def _atribuir_tarefas_com_ia(self, tempo_limite):
+        self._recolher_pesquisas_atrasadas()
+        if self.planeamento == PLANEAMENTO_ATRIBUICAO:
+            self._atribuir_tarefas_por_atribuicao()
+        elif self.planeamento == PLANEAMENTO_PROCESSO:
+            self._atribuir_tarefas_com_ia_processo(tempo_limite)
+        else:
+            self._atribuir_tarefas_com_ia_threaded(tempo_limite)
+
     def _atribuir_tarefas_com_ia_threaded(self, tempo_limite_thread):
-        frota_snapshot = [v.clone() for v in self.frota]
-        estado_congelado = Estado(frota_snapshot, list(self.pedidos_pendentes), tempo_atual=self.tempo_atual)
-        resultado_container = [None]
-
-        def target_ia():
-            t0 = time.time()
-            if self.algoritmo in [algoritmos.bfs, algoritmos.dfs]:
-                res = self.algoritmo(estado_congelado, self.cidade)
+        estado_congelado = Estado(self.frota, self.pedidos_pendentes, tempo_atual=self.tempo_atual)
+        plano = algoritmos.PlanoAnytime()
+        parar = threading.Event()
+        kwargs = {'modo': self.modo_sucessores, 'parar': parar}
+        if self.algoritmo is algoritmos.a_star_anytime:
+            kwargs['plano'] = plano
+        if self.recolher_estatisticas or self.algoritmo in algoritmos.ALGORITMOS_MEMORIA_LIMITADA:
+            kwargs['estatisticas'] = {}
+        minuto = self.tempo_atual
+
+        pesquisa = _PesquisaThread(self.algoritmo, estado_congelado, self.cidade, self.funcao_heuristica, kwargs)
+        if not pesquisa.esperar(tempo_limite_thread):
+            # Sem tempo: parar a pesquisa (token cooperativo); o planeador anytime
+            # ainda pode ter um plano completo
+            parar.set()
+            # Pode acabar depois do minuto seguinte: é registada quando terminar (_recolher_pesquisas_atrasadas)
+            self.pesquisas_atrasadas.append((pesquisa, minuto))
+            melhor = plano.melhor()
+            if melhor is None: return
+            self.planos_parciais += 1
+            resultado = melhor[0], melhor[1]
+        else:
+            self._registar_pesquisa(pesquisa, minuto)
+            resultado = pesquisa.resultado
+        if not resultado: return
+        self._aplicar_plano(resultado[0])
+
+    def _recolher_pesquisas_atrasadas(self, esperar=False):
+        """
+        Regista, na thread do simulador, o tempo e as estatísticas das pesquisas
+        canceladas por falta de tempo que já terminaram (com esperar=True,
+        espera por todas). Contam no minuto em que começaram.
+        """
+        atrasadas = []
+        for pesquisa, minuto in self.pesquisas_atrasadas:
+            if pesquisa.esperar(None if esperar else 0):
+                self._registar_pesquisa(pesquisa, minuto)
             else:
-                res = self.algoritmo(estado_congelado, self.cidade, algoritmos.heuristica_taxi)
-            self.tempo_cpu_total += (time.time() - t0)
-            resultado_container[0] = res
-
-        thread_ia = threading.Thread(target=target_ia)
-        thread_ia.start()
-        thread_ia.join(timeout=tempo_limite_thread)
-
-        if thread_ia.is_alive(): return
-        resultado = resultado_container[0]
+                atrasadas.append((pesquisa, minuto))
+        self.pesquisas_atrasadas = atrasadas
+
+    def _registar_pesquisa(self, pesquisa, minuto):
+        self.tempo_cpu_total += pesquisa.tempo_cpu
+        self._registar_estatisticas(minuto, pesquisa.estatisticas)
+
+    def _atribuir_tarefas_com_ia_processo(self, tempo_limite):
+        if self.planeador is None:
+            self.planeador = PlaneadorProcessos(self.cidade)
+
+        estado_congelado = Estado(self.frota, self.pedidos_pendentes, tempo_atual=self.tempo_atual)
+        kwargs = {'modo': self.modo_sucessores}
+        if self.recolher_estatisticas or self.algoritmo in algoritmos.ALGORITMOS_MEMORIA_LIMITADA:
+            kwargs['estatisticas'] = {}
+        tarefa = self.planeador.submeter(self.algoritmo, estado_congelado, self.funcao_heuristica, **kwargs)
+
+        if tarefa.esperar(tempo_limite):
+            self._registar_pesquisa(tarefa, self.tempo_atual)
+            resultado = tarefa.resultado
+        else:
+            # Cancelamento real: o processo larga a pesquisa obsoleta; o tempo e
+            # as estatísticas chegam depois (_recolher_pesquisas_atrasadas)
+            tarefa.cancelar()
+            self.pesquisas_atrasadas.append((tarefa, self.tempo_atual))
+            if tarefa.parcial is None: return
+            self.planos_parciais += 1
+            resultado = tarefa.parcial[0], tarefa.parcial[1]
         if not resultado: return
-
-        caminho_completo, _ = resultado
+        self._aplicar_plano(resultado[0])
+
+    def _atribuir_tarefas_por_atribuicao(self):
+        # Só entram os pedidos que nenhum veículo já tem planeado recolher
+        reservados = {p.id for i, v in enumerate(self.frota) for est in v.rota_planeada
+                      for p in est.veiculos[i].passageiros_a_bordo}
+        pedidos = [p for p in self.pedidos_pendentes if p.id not in reservados]
+        livres = [i for i, v in enumerate(self.frota)
+                  if not v.ocupado and not v.rota_planeada and v.ocupado_ate <= self.tempo_atual]
+        if not pedidos or not livres: return
+
+        t0 = time.time()
+        if len(livres) > 4 * len(pedidos):
+            # Frota muito maior que a procura: a matriz só precisa dos táxis perto de algum pedido
+            candidatos = set(livres)
+            livres = sorted({i for p in pedidos
+                             for i, _ in self.taxis_livres_proximos(p.origem, CANDIDATOS_POR_PEDIDO, candidatos)})
+        estado = Estado(self.frota, pedidos, tempo_atual=self.tempo_atual)
+        planos = despacho.planear(estado, livres, self.cidade)
+        self.tempo_cpu_total += time.time() - t0
+        self.despachos += 1
+
+        for i, rota in planos.items():
+            self.frota[i].rota_planeada = rota
+
+    def taxis_livres_proximos(self, no, k, candidatos=None):
+        """
+        [(índice do veículo, distância)] dos k táxis livres mais perto de 'no' em
+        linha reta, pela grelha da frota. 'candidatos' restringe os índices aceites.
+        """
+        x, y = self.cidade.nodes[no]['coords']
+        if candidatos is None:
+            candidatos = {i for i, v in enumerate(self.frota) if not v.ocupado}
+        return self.indice_frota.mais_proximos(x, y, k, candidatos.__contains__)
+
+    def _registar_estatisticas(self, minuto, estatisticas):
+        if not estatisticas: return
+        self.pico_nos_planeamento = max(self.pico_nos_planeamento, estatisticas.get('pico_nos', 0))
+        if not self.recolher_estatisticas: return
+        # Por ordem de minuto (uma pesquisa atrasada regista-se depois das seguintes)
+        por_minuto = self.estatisticas_planeamento
+        i = len(por_minuto)
+        while i and por_minuto[i - 1][0] > minuto: i -= 1
+        if i and por_minuto[i - 1][0] == minuto:
+            algoritmos.agregar_estatisticas(por_minuto[i - 1][1], estatisticas)
+        else:
+            por_minuto.insert(i, (minuto, algoritmos.agregar_estatisticas({}, estatisticas)))
+
+    def _aplicar_plano(self, caminho_completo):
         for v in self.frota: v.rota_planeada = []
 
         for k in range(1, len(caminho_completo)):
@@ -147,10 +437,11 @@ class Simulador:
                 if mudou_local or mudou_ocupacao or (v_real.rota_planeada and v_real.rota_planeada[-1] != est_futuro):
                     v_real.rota_planeada.append(est_futuro)
 
-    def _aplicar_transicao_veiculo(self, v_real, v_sim, est_novo):
+    def _aplicar_transicao_veiculo(self, i, v_real, v_sim, est_novo):
         duracao = max(1, int(est_novo.tempo_atual - self.tempo_atual))
         v_real.ocupado_ate = self.tempo_atual + duracao
         diff = v_real.autonomia_atual - v_sim.autonomia_atual
+        self._agendar(v_real.ocupado_ate, EVENTO_CARGA if diff < 0 else EVENTO_CHEGADA, i)
         if diff > 0:
             custo = diff * (CUSTO_KM_ELETRICO if v_real.tipo == "eletrico" else CUSTO_KM_COMBUSTAO)
             self.total_dinheiro_gasto += custo
@@ -161,6 +452,16 @@ class Simulador:
         elif diff < 0:
             self.total_dinheiro_gasto += abs(diff) * 0.10
 
+        if v_sim.local != v_real.local:
+            perna = self._destino_perna(i, v_real, v_sim)
+            custo = self.reparador.seguir(v_real.id, v_real.local, v_sim.local, perna)
+            self.trechos[v_real.id] = (custo, self.tempo_atual)
+        else:
+            self.reparador.largar(v_real.id)
+            self.trechos.pop(v_real.id, None)
+
+        if v_sim.local != v_real.local:
+            self.indice_frota.atualizar(i, *self.cidade.nodes[v_sim.local]['coords'])
         v_real.local = v_sim.local
         v_real.autonomia_atual = v_sim.autonomia_atual
 
@@ -181,6 +482,39 @@ class Simulador:
             preal.tempo_conclusao = self.tempo_atual
             self.pedidos_concluidos.append(preal)
 
+    def _destino_perna(self, i, v_real, v_sim):
+        """
+        Onde acaba a perna que começa com o passo v_real -> v_sim: o último local
+        dos passos de movimento seguidos do plano, até à próxima operação
+        (recolha, entrega, recarga ou paragem no mesmo nó).
+        """
+        anterior, atual = v_real, v_sim
+        seguintes = iter(v_real.rota_planeada)
+        while True:
+            destino = atual.local
+            if atual.ocupado != anterior.ocupado or atual.autonomia_atual > anterior.autonomia_atual: return destino
+            est = next(seguintes, None)
+            if est is None or est.veiculos[i].local == destino: return destino
+            anterior, atual = atual, est.veiculos[i]
+
+    def _reparar_trechos(self, alteradas):
+        """
+        Repara as árvores D* Lite dos veículos em movimento e corrige a hora de
+        chegada pela variação do tempo do passo, na proporção que falta fazer.
+        """
+        por_id = {v.id: (i, v) for i, v in enumerate(self.frota)}
+        for id_veiculo, custo in self.reparador.atualizar(alteradas).items():
+            i, v = por_id[id_veiculo]
+            antigo, partida = self.trechos[id_veiculo]
+            if v.ocupado_ate <= self.tempo_atual or custo == float('inf'):
+                continue
+            falta = (v.ocupado_ate - self.tempo_atual) / max(1, v.ocupado_ate - partida)
+            chegada = max(self.tempo_atual + 1, v.ocupado_ate + round((custo - antigo) * falta))
+            if chegada != v.ocupado_ate:
+                v.ocupado_ate = chegada
+                self._agendar(chegada, EVENTO_CHEGADA, i)
+            self.trechos[id_veiculo] = (custo, partida)
+
     def _imprimir_estatisticas(self, tempo_real_execucao):
         total = len(self.pedidos_concluidos) + len(self.pedidos_pendentes) + len(self.pedidos_ativos) + len(self.pedidos_falhados)
         if total == 0: print("Sem dados."); return
@@ -214,4 +548,44 @@ class Simulador:
         if self.pedidos_concluidos:
             tempos = [p.get_tempo_espera() for p in self.pedidos_concluidos]
             print(f"Tempo Espera Medio: {sum(tempos) / len(tempos):.1f} min")
-        print("=" * 50)
\ No newline at end of file
+
+        if self.planos_parciais:
+            print(f"Planos Anytime:     {self.planos_parciais} usados antes de convergir")
+
+        if self.despachos:
+            print(f"Despacho Atribuicao: {self.despachos} rondas, {self.tempo_cpu_total / self.despachos * 1000:.2f} ms/ronda")
+
+        if self.reparador.eventos:
+            media = self.reparador.expansoes_reparacao / self.reparador.eventos
+            print(f"Reparacao D* Lite:  {self.reparador.eventos} eventos, {media:.0f} expansoes/evento")
+
+        if self.pico_nos_planeamento:
+            print(f"Pico de Nos (IA):   {self.pico_nos_planeamento} nos em memoria")
+
+        if self.estatisticas_planeamento:
+            self._imprimir_estatisticas_planeamento()
+
+        if hasattr(self.cidade, 'rotas'):
+            est = self.cidade.rotas.estatisticas()
+            print(f"Cache de Rotas:     {est['hits']} hits / {est['misses']} misses ({est['taxa_acerto']:.1f}%)")
+        print("=" * 50)
+
+    def _imprimir_estatisticas_planeamento(self):
+        total = {}
+        for _, est in self.estatisticas_planeamento:
+            algoritmos.agregar_estatisticas(total, est)
+        minutos = len(self.estatisticas_planeamento)
+        minuto_pior, pior = max(self.estatisticas_planeamento, key=lambda par: par[1].get('tempo', 0))
+        gerados = total.get('gerados', 0)
+        duplicados = (total.get('duplicados', 0) / gerados * 100) if gerados > 0 else 0
+
+        print("Planeamento (IA):")
+        print(f"   Minutos com IA:  {minutos} ({total['pesquisas']} pesquisas)")
+        print(f"   Expansoes:       {total.get('expansoes', 0)} ({total.get('expansoes', 0) / minutos:.0f}/min)")
+        print(f"   Gerados:         {gerados} ({duplicados:.1f}% duplicados)")
+        print(f"   Pico Fronteira:  {total.get('pico_abertos', 0)} abertos / {total.get('pico_fechados', 0)} fechados")
+        print(f"   Tempo Pesquisa:  {total.get('tempo', 0):.2f}s (heuristica {total.get('tempo_heuristica', 0):.2f}s,"
+              f" sucessores {total.get('tempo_sucessores', 0):.2f}s)")
+        print(f"   Pico Memoria:    +{total.get('pico_memoria_mb', 0):.1f} MB")
+        print(f"   Minuto + Lento:  {minuto_pior} ({pior.get('tempo', 0) * 1000:.0f} ms,"
+              f" {pior.get('expansoes', 0)} expansoes)")
\ No newline at end of file
@@ -0,0 +1,30 @@
+import os
+import sys
+
+import pytest
+
+# Os módulos de src/ importam-se uns aos outros sem pacote (como quando se corre a partir de src/)
+SRC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src')
+sys.path.insert(0, SRC)
+
+
+@pytest.fixture(scope='session')
+def cidade_grelha(tmp_path_factory):
+    """Grelha 6x6 do benchmark (semente fixa), com as tabelas ALT numa pasta temporária."""
+    from benchmark import gerar_cidade_grelha
+
+    anterior = os.getcwd()
+    os.chdir(tmp_path_factory.mktemp('cache'))
+    try:
+        return gerar_cidade_grelha(6, 1)
+    finally:
+        os.chdir(anterior)
+
+
+@pytest.fixture
+def grelha(tmp_path, monkeypatch):
+    """Gerador de grelhas novas, para os testes que alteram o mapa (caches em tmp_path)."""
+    from benchmark import gerar_cidade_grelha
+
+    monkeypatch.chdir(tmp_path)
+    return gerar_cidade_grelha
@@ -0,0 +1,136 @@
+import heapq
+
+import pytest
+
+import algoritmos
+from benchmark import gerar_cenario
+from problema import Estado, MODO_MICRO, MODO_MACRO
+
+CENARIOS = [(modo, veiculos, pedidos, seed)
+            for modo, veiculos, pedidos in ((MODO_MICRO, 1, 2), (MODO_MICRO, 2, 2), (MODO_MACRO, 2, 3),
+                                            (MODO_MACRO, 3, 3))
+            for seed in range(4)]
+
+
+def custo_uniforme(estado_inicial, cidade, modo):
+    """Referência: pesquisa de custo uniforme (Dijkstra sobre os estados), independente do a_star."""
+    melhor = {estado_inicial: estado_inicial.custo_acumulado}
+    heap = [(estado_inicial.custo_acumulado, 0, estado_inicial)]
+    fechados = set()
+    contador = 0
+    while heap:
+        g, _, n = heapq.heappop(heap)
+        if n in fechados or g > melhor[n]: continue
+        if n.is_objetivo(): return g
+        fechados.add(n)
+        for filho in n.gera_sucessores(cidade, modo):
+            if filho in fechados or filho.custo_acumulado >= melhor.get(filho, float('inf')): continue
+            melhor[filho] = filho.custo_acumulado
+            contador += 1
+            heapq.heappush(heap, (filho.custo_acumulado, contador, filho))
+    return None
+
+
+@pytest.mark.parametrize('modo, veiculos, pedidos, seed', CENARIOS)
+def test_a_star_com_heuristica_alt_e_otimo(cidade_grelha, modo, veiculos, pedidos, seed):
+    estado = gerar_cenario(cidade_grelha, Estado, veiculos, pedidos, seed)
+    otimo = custo_uniforme(estado, cidade_grelha, modo)
+
+    _, custo = algoritmos.a_star(estado, cidade_grelha, algoritmos.heuristica_alt, modo=modo)
+    assert custo == pytest.approx(otimo, abs=1e-9)
+    assert algoritmos.heuristica_alt(estado, cidade_grelha) <= otimo + 1e-9
+
+
+@pytest.mark.parametrize('heuristica', [algoritmos.heuristica_taxi, algoritmos.heuristica_alt])
+@pytest.mark.parametrize('modo, veiculos, pedidos, seed', CENARIOS[:8])
+def test_heuristicas_em_lote_iguais_a_estado_a_estado(cidade_grelha, heuristica, modo, veiculos, pedidos, seed):
+    estado = gerar_cenario(cidade_grelha, Estado, veiculos, pedidos, seed)
+    filhos = estado.gera_sucessores(cidade_grelha, modo)
+    netos = [neto for filho in filhos for neto in filho.gera_sucessores(cidade_grelha, modo)]
+
+    lote = algoritmos.HEURISTICAS_LOTE[heuristica](netos, cidade_grelha)
+    assert lote == pytest.approx([heuristica(e, cidade_grelha) for e in netos], rel=1e-12, abs=1e-12)
+
+
+class _PlanoRegistado(algoritmos.PlanoAnytime):
+    def __init__(self):
+        super().__init__()
+        self.publicados = []
+
+    def publicar(self, caminho, custo, epsilon):
+        super().publicar(caminho, custo, epsilon)
+        self.publicados.append((custo, epsilon))
+
+
+@pytest.mark.parametrize('modo, veiculos, pedidos, seed', CENARIOS)
+def test_a_star_anytime_respeita_o_limite_epsilon(cidade_grelha, modo, veiculos, pedidos, seed):
+    estado = gerar_cenario(cidade_grelha, Estado, veiculos, pedidos, seed)
+    otimo = custo_uniforme(estado, cidade_grelha, modo)
+
+    plano = _PlanoRegistado()
+    _, custo = algoritmos.a_star_anytime(estado, cidade_grelha, algoritmos.heuristica_alt, modo=modo, plano=plano)
+    assert plano.publicados
+    for custo_parcial, epsilon in plano.publicados:
+        assert custo_parcial <= epsilon * otimo + 1e-9
+    assert plano.epsilon == 1.0
+    assert custo == pytest.approx(otimo, abs=1e-9)
+
+
+def test_a_star_anytime_sem_heuristica_admissivel_nao_promete_limite(cidade_grelha):
+    estado = gerar_cenario(cidade_grelha, Estado, 2, 3, 0)
+    plano = _PlanoRegistado()
+    algoritmos.a_star_anytime(estado, cidade_grelha, algoritmos.heuristica_taxi, modo=MODO_MACRO, plano=plano)
+    assert plano.caminho is not None
+    assert plano.epsilon == float('inf')
+
+
+@pytest.mark.parametrize('modo, veiculos, pedidos, seed', CENARIOS[::2])
+def test_ida_star_classico_e_otimo(cidade_grelha, modo, veiculos, pedidos, seed):
+    estado = gerar_cenario(cidade_grelha, Estado, veiculos, pedidos, seed)
+    otimo = custo_uniforme(estado, cidade_grelha, modo)
+
+    _, custo = algoritmos.ida_star(estado, cidade_grelha, algoritmos.heuristica_alt, modo=modo, crescimento_minimo=0)
+    assert custo == pytest.approx(otimo, abs=1e-9)
+    _, custo = algoritmos.ida_star(estado, cidade_grelha, algoritmos.heuristica_alt, modo=modo)
+    assert otimo - 1e-9 <= custo <= 1.02 * otimo + 1e-9
+
+
+@pytest.mark.parametrize('modo, veiculos, pedidos, seed', CENARIOS[::2])
+def test_sma_star_com_memoria_suficiente_e_otimo(cidade_grelha, modo, veiculos, pedidos, seed):
+    estado = gerar_cenario(cidade_grelha, Estado, veiculos, pedidos, seed)
+    otimo = custo_uniforme(estado, cidade_grelha, modo)
+
+    _, custo = algoritmos.sma_star(estado, cidade_grelha, algoritmos.heuristica_alt, modo=modo, memoria_max=10**6)
+    assert custo == pytest.approx(otimo, abs=1e-9)
+
+    estatisticas = {}
+    res = algoritmos.sma_star(estado, cidade_grelha, algoritmos.heuristica_alt, modo=modo, memoria_max=200,
+                              estatisticas=estatisticas)
+    # O orçamento só é ultrapassado pelos filhos de uma expansão, antes de esquecer
+    # (por veículo: 4 ruas da grelha, recolher cada pedido, entregar e recarregar)
+    assert estatisticas['pico_nos'] <= 200 + veiculos * (pedidos + 6)
+    if res: assert res[1] >= otimo - 1e-9
+
+
+def plano_valido(caminho, cidade, modo):
+    """Cada passo do caminho é um sucessor do anterior e o último é objetivo."""
+    for pai, filho in zip(caminho, caminho[1:]):
+        assert filho in pai.gera_sucessores(cidade, modo)
+    assert caminho[-1].is_objetivo()
+
+
+@pytest.mark.parametrize('modo, veiculos, pedidos, seed', CENARIOS[::2])
+def test_beam_search_largo_e_otimo_e_estreito_e_valido(cidade_grelha, modo, veiculos, pedidos, seed):
+    estado = gerar_cenario(cidade_grelha, Estado, veiculos, pedidos, seed)
+    otimo = custo_uniforme(estado, cidade_grelha, modo)
+
+    _, custo = algoritmos.beam_search(estado, cidade_grelha, algoritmos.heuristica_alt, modo=modo, largura=10**6)
+    assert custo == pytest.approx(otimo, abs=1e-9)
+
+    # Estreito pode não encontrar plano (não é completo), mas o que devolve é válido
+    for largura in (1, 3):
+        res = algoritmos.beam_search(estado, cidade_grelha, algoritmos.heuristica_taxi, modo=modo, largura=largura)
+        if res is None: continue
+        caminho, custo = res
+        plano_valido(caminho, cidade_grelha, modo)
+        assert custo == caminho[-1].custo_acumulado >= otimo - 1e-9
@@ -0,0 +1,43 @@
+import argparse
+import json
+
+import numpy as np
+
+import benchmark
+from problema import MODO_MICRO, MODO_MACRO
+
+
+def test_grelha_reprodutivel(grelha):
+    a, b = grelha(5, 3), grelha(5, 3)
+    assert a.nodes == b.nodes
+    assert (a.garagem, a.carregadores, a.bombas) == (b.garagem, b.carregadores, b.bombas)
+    for peso in ('dist', 'time'):
+        assert np.array_equal(a.pesos_arestas().valores(peso), b.pesos_arestas().valores(peso))
+
+
+def test_suite_grava_json_e_compara_com_a_referencia(grelha, monkeypatch, capsys):
+    monkeypatch.setattr(benchmark, 'TAMANHOS', {MODO_MICRO: [(1, 1), (1, 2)], MODO_MACRO: [(2, 2)]})
+    args = argparse.Namespace(seed=5, mapa='grelha', lado=5, algoritmos=['a_star', 'greedy'],
+                              modos=[MODO_MICRO, MODO_MACRO], tempo=10.0, memoria=1024.0,
+                              saida='primeira.json', referencia=None)
+    benchmark.correr_suite(args)
+    with open('primeira.json') as f:
+        relatorio = json.load(f)
+
+    assert relatorio['versao'] == benchmark.VERSAO_RESULTADOS
+    assert relatorio['mapa']['nos'] == 25
+    resultados = relatorio['resultados']
+    assert [(r['algoritmo'], r['modo'], r['veiculos'], r['pedidos']) for r in resultados] == [
+        ('a_star', MODO_MICRO, 1, 1), ('a_star', MODO_MICRO, 1, 2),
+        ('greedy', MODO_MICRO, 1, 1), ('greedy', MODO_MICRO, 1, 2),
+        ('a_star', MODO_MACRO, 2, 2), ('greedy', MODO_MACRO, 2, 2)]
+    assert all(r['resultado'] == 'ok' and r['custo'] is not None for r in resultados)
+
+    # A mesma semente dá os mesmos cenários e custos
+    args.saida, args.referencia = 'segunda.json', 'primeira.json'
+    benchmark.correr_suite(args)
+    with open('segunda.json') as f:
+        segunda = json.load(f)
+    assert [r['custo'] for r in segunda['resultados']] == [r['custo'] for r in resultados]
+    saida = capsys.readouterr().out
+    assert "Comparação com primeira.json" in saida and "| custo" not in saida
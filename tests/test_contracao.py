@@ -0,0 +1,49 @@
+import itertools
+import os
+
+import pytest
+
+from contracao import HierarquiaContracao
+from rotas import dijkstra
+
+
+@pytest.mark.parametrize('peso', ['dist', 'time'])
+def test_hierarquia_responde_como_dijkstra(cidade_grelha, peso):
+    pesos = cidade_grelha.pesos_arestas()
+    hierarquia = HierarquiaContracao(pesos, peso)
+    valores = pesos.listas[peso]
+    for origem in pesos.nos[::5]:
+        custos, _ = dijkstra(pesos, origem, peso)
+        for destino in pesos.nos:
+            custo, caminho = hierarquia.rota(origem, destino)
+            assert custo == pytest.approx(custos[pesos.indice[destino]], abs=1e-9)
+            assert (caminho[0], caminho[-1]) == (origem, destino)
+            soma = sum(valores[pesos.id_aresta(u, v)] for u, v in zip(caminho, caminho[1:]))
+            assert soma == pytest.approx(custo, abs=1e-9)
+
+
+@pytest.mark.parametrize('peso', ['dist', 'time'])
+def test_hierarquia_guardada_responde_como_a_contraida(cidade_grelha, tmp_path, peso):
+    pesos = cidade_grelha.pesos_arestas()
+    contraida = HierarquiaContracao.carregar_ou_calcular(pesos, peso, pasta=str(tmp_path))
+    assert len(os.listdir(tmp_path)) == 1
+    carregada = HierarquiaContracao.carregar_ou_calcular(pesos, peso, pasta=str(tmp_path))
+
+    assert carregada.rank == contraida.rank
+    assert carregada.num_atalhos == contraida.num_atalhos
+    for origem, destino in itertools.islice(itertools.permutations(pesos.nos, 2), 0, None, 37):
+        custo, caminho = carregada.rota(origem, destino)
+        assert (custo, caminho) == contraida.rota(origem, destino)
+        assert custo == pytest.approx(cidade_grelha.rotas.vetor(origem, peso)[pesos.indice[destino]], abs=1e-9)
+
+
+def test_oraculo_so_usa_a_hierarquia_de_dist(grelha):
+    cidade = grelha(5, 3)
+    cidade.preparar_hierarquias()
+    assert set(cidade.rotas.hierarquias) == {'dist'}
+
+    pesos = cidade.pesos_arestas()
+    for origem, destino in zip(pesos.nos, reversed(pesos.nos)):
+        custos, _ = dijkstra(pesos, origem, 'dist')
+        assert cidade.rotas.distancia(origem, destino) == pytest.approx(custos[pesos.indice[destino]], abs=1e-9)
+    assert cidade.rotas.consultas_ch > 0
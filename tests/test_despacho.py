@@ -0,0 +1,31 @@
+import pytest
+
+import despacho
+from benchmark import gerar_cenario
+from problema import Estado
+
+
+@pytest.mark.parametrize('seed', range(4))
+def test_matriz_custos_igual_ao_custo_de_rota_servico(cidade_grelha, seed):
+    estado = gerar_cenario(cidade_grelha, Estado, 4, 5, seed)
+    livres = list(range(len(estado.veiculos)))
+    pedidos = list(estado.pedidos_pendentes)
+    custos = despacho.matriz_custos(estado, livres, pedidos, cidade_grelha)
+
+    base = estado.com_pedidos(())
+    for i in livres:
+        for j, pedido in enumerate(pedidos):
+            entrega = despacho.rota_servico(base, i, pedido, cidade_grelha)[-1]
+            assert custos[i, j] == pytest.approx(entrega.custo_acumulado - base.custo_acumulado, abs=1e-9)
+
+
+def test_matriz_do_oraculo_segue_o_caminho_mais_curto(cidade_grelha):
+    rotas = cidade_grelha.rotas
+    nos = sorted(cidade_grelha.nodes)
+    origens, destinos = nos[::7], nos[::3]
+    km, minutos = rotas.matriz(origens, destinos)
+    for i, origem in enumerate(origens):
+        for j, destino in enumerate(destinos):
+            _, dist, tempo = rotas.rota(origem, destino)
+            assert (km[i, j], minutos[i, j]) == pytest.approx((dist, tempo), abs=1e-9)
+            assert rotas.viagem(origem, destino) == pytest.approx((dist, tempo), abs=1e-9)
@@ -0,0 +1,76 @@
+import math
+import random
+
+import pytest
+
+import algoritmos
+from espacial import IndiceKD, GrelhaEspacial
+from modelos import Pedido, Veiculo
+from problema import Estado
+
+
+def mais_proximos_forca_bruta(pontos, x, y, k):
+    return sorted((math.hypot(px - x, py - y), i) for i, (px, py) in pontos.items())[:k]
+
+
+def test_indice_kd_igual_a_forca_bruta():
+    rng = random.Random(0)
+    pontos = {f"p{i}": (rng.uniform(0, 10), rng.uniform(0, 10)) for i in range(200)}
+    indice = IndiceKD(pontos, list(pontos.values()))
+    for _ in range(50):
+        x, y = rng.uniform(-2, 12), rng.uniform(-2, 12)
+        for k in (1, 5):
+            esperado = mais_proximos_forca_bruta(pontos, x, y, k)
+            obtido = indice.mais_proximos(x, y, k)
+            assert [d for _, d in obtido] == pytest.approx([d for d, _ in esperado])
+    assert IndiceKD([], []).mais_proximos(0, 0) == []
+
+
+def test_grelha_espacial_igual_a_forca_bruta_com_pontos_a_mexer():
+    rng = random.Random(1)
+    grelha = GrelhaEspacial(0.7)
+    pontos = {}
+    for passo in range(500):
+        i = rng.randrange(60)
+        if i in pontos and rng.random() < 0.2:
+            grelha.remover(i)
+            del pontos[i]
+        else:
+            pontos[i] = (rng.uniform(0, 10), rng.uniform(0, 10))
+            grelha.atualizar(i, *pontos[i])
+        assert len(grelha) == len(pontos)
+
+        if passo % 10 == 0:
+            x, y = rng.uniform(0, 10), rng.uniform(0, 10)
+            aceitar = lambda id_ponto: id_ponto % 3 != 0
+            filtrados = {i: p for i, p in pontos.items() if aceitar(i)}
+            esperado = mais_proximos_forca_bruta(filtrados, x, y, 4)
+            obtido = grelha.mais_proximos(x, y, 4, aceitar)
+            assert [d for _, d in obtido] == pytest.approx([d for d, _ in esperado])
+
+
+def test_nos_e_postos_mais_proximos_na_cidade(cidade_grelha):
+    rng = random.Random(2)
+    nos = {n: dados['coords'] for n, dados in cidade_grelha.nodes.items()}
+    carregadores = {n: nos[n] for n in cidade_grelha.carregadores}
+    for _ in range(30):
+        x, y = rng.uniform(0, 1.25), rng.uniform(0, 1.25)
+        no = cidade_grelha.no_mais_proximo(x, y)
+        assert math.hypot(nos[no][0] - x, nos[no][1] - y) == pytest.approx(mais_proximos_forca_bruta(nos, x, y, 1)[0][0])
+
+        no = rng.choice(list(nos))
+        esperado = mais_proximos_forca_bruta(carregadores, *nos[no], 2)
+        obtido = cidade_grelha.postos_proximos(no, 'recarga', k=2)
+        assert [math.dist(nos[no], carregadores[p]) for p in obtido] == pytest.approx([d for d, _ in esperado])
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_heuristica_taxi_com_kd_igual_a_estado_a_estado(cidade_grelha, seed):
+    rng = random.Random(seed)
+    livres = cidade_grelha.locais_livres
+    frota = [Veiculo(i, "eletrico" if i % 2 else "combustao", rng.choice(livres), 200, 4)
+             for i in range(algoritmos.LIMIAR_KD + 8)]
+    pedidos = [Pedido(1000 + j, *rng.sample(livres, 2), 1, 10_000) for j in range(10)]
+    estado = Estado(frota, pedidos)
+    assert algoritmos.heuristica_taxi(estado, cidade_grelha) == pytest.approx(
+        algoritmos._estimar_custo_restante(estado, cidade_grelha.get_heuristic), rel=1e-12)
@@ -0,0 +1,85 @@
+import random
+
+import pytest
+
+from cidade import Cidade
+from historico import FRAMES_POR_BLOCO, HistoricoSimulacao, LeitorReplay
+from modelos import Pedido, Veiculo
+
+
+def cidade_com_nomes():
+    cidade = Cidade()
+    for i, nome in enumerate(("Central_Taxi", "Baixa", "Estacao_Comboio", "Super_Charger", "Aeroporto")):
+        cidade.add_node(nome, i, i)
+    return cidade
+
+
+def simular(historico, cidade, frames, seed=0):
+    """Grava 'frames' frames de uma frota a mover-se entre nós com ids em texto; devolve o esperado."""
+    rng = random.Random(seed)
+    nos = list(cidade.nodes)
+    frota = [Veiculo(i, "eletrico", nos[i], 200, 4) for i in range(3)]
+    pedido = Pedido(100, nos[0], nos[4], 1, 500)
+    esperado = []
+    for t in range(frames):
+        for v in frota:
+            if rng.random() < 0.5:
+                v.local = rng.choice(nos)
+                v.autonomia_atual -= 1
+        frota[0].ocupado = t % 10 < 5
+        frota[0].passageiros_a_bordo = [pedido] if frota[0].ocupado else []
+        pendentes = [] if t % 7 else [Pedido(200 + t, nos[1], nos[2], 1, 500)]
+        historico.gravar(t, frota, pendentes, float(t))
+        esperado.append(([v.local for v in frota], [v.autonomia_atual for v in frota],
+                         [p.id for p in pendentes]))
+    return frota, esperado
+
+
+def verificar(frames, esperado):
+    assert len(frames) == len(esperado)
+    for i, (locais, autonomias, pendentes) in enumerate(esperado):
+        estado = frames[i]
+        assert [v.local for v in estado.veiculos] == locais
+        assert [v.autonomia_atual for v in estado.veiculos] == autonomias
+        assert [p.id for p in estado.pedidos_pendentes] == pendentes
+
+
+def test_historico_em_memoria_com_ids_de_texto():
+    cidade = cidade_com_nomes()
+    historico = HistoricoSimulacao([Veiculo(i, "eletrico", "Baixa", 200, 4) for i in range(3)], cidade)
+    _, esperado = simular(historico, cidade, 2 * FRAMES_POR_BLOCO + 5)
+    verificar(historico, esperado)
+
+
+@pytest.mark.parametrize('fechar', [True, False])
+def test_replay_em_disco_com_ids_de_texto(tmp_path, fechar):
+    cidade = cidade_com_nomes()
+    caminho = str(tmp_path / "replay.bin")
+    historico = HistoricoSimulacao([Veiculo(i, "eletrico", "Baixa", 200, 4) for i in range(3)], cidade, caminho)
+    _, esperado = simular(historico, cidade, 2 * FRAMES_POR_BLOCO + 5)
+    verificar(historico, esperado)
+
+    if fechar:
+        historico.fechar()
+    else:
+        # Sem índice (simulação interrompida): só os blocos completos
+        historico.escritor.descarregar()
+        esperado = esperado[:2 * FRAMES_POR_BLOCO]
+    leitor = LeitorReplay(caminho)
+    verificar(leitor, esperado)
+    leitor.fechar()
+
+
+def test_replay_so_corresponde_ao_mapa_onde_foi_gravado(tmp_path):
+    cidade = cidade_com_nomes()
+    caminho = str(tmp_path / "replay.bin")
+    historico = HistoricoSimulacao([Veiculo(i, "eletrico", "Baixa", 200, 4) for i in range(3)], cidade, caminho)
+    simular(historico, cidade, 5)
+    historico.fechar()
+
+    leitor = LeitorReplay(caminho)
+    assert leitor.corresponde(cidade)
+    outra = cidade_com_nomes()
+    outra.add_node("Hospital", 9, 9)
+    assert not leitor.corresponde(outra)
+    leitor.fechar()
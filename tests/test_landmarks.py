@@ -0,0 +1,35 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from landmarks import Landmarks
+
+
+def test_limites_no_mapa_de_exemplo_que_nao_e_fortemente_conexo(tmp_path):
+    from cidade import cidade as mapa
+
+    landmarks = Landmarks.carregar_ou_calcular(mapa, k=4, pasta=str(tmp_path))
+    pares = list(itertools.permutations(mapa.nodes, 2))
+    iu = np.array([landmarks.indice[u] for u, _ in pares])
+    it = np.array([landmarks.indice[t] for _, t in pares])
+    with np.errstate(all='raise'):
+        lote = landmarks.limites_pares(iu, it)
+    assert not np.isnan(lote).any()
+
+    for (u, t), limite in zip(pares, lote):
+        assert limite == landmarks.limite_inferior(u, t)
+        assert limite <= mapa.rotas.distancia(u, t) + 1e-9
+
+    for t in mapa.nodes:
+        origens = list(mapa.nodes)
+        with np.errstate(all='raise'):
+            limites = landmarks.limites_inferiores(origens, t)
+        assert limites.tolist() == [landmarks.limite_inferior(u, t) for u in origens]
+
+
+def test_limites_sao_admissiveis_na_grelha(cidade_grelha):
+    landmarks = cidade_grelha.landmarks
+    for u in sorted(cidade_grelha.nodes)[::5]:
+        for t in cidade_grelha.nodes:
+            assert landmarks.limite_inferior(u, t) <= cidade_grelha.rotas.distancia(u, t) + 1e-9
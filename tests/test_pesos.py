@@ -0,0 +1,89 @@
+import random
+
+import numpy as np
+import pytest
+
+from pesos import LIMIAR_ENGARRAFAMENTO
+from rotas import dijkstra
+
+
+def test_sobreposicao_versionada_do_transito(grelha):
+    cidade = grelha(4, 1)
+    pesos = cidade.pesos_arestas()
+    arestas = list(pesos.pares())
+    versao = cidade.versao_pesos('time')
+
+    assert cidade.aplicar_transito({arestas[0]: 2.0, arestas[1]: 1.0}) == [arestas[0]]
+    assert cidade.versao_pesos('time') == versao + 1
+    assert cidade.aplicar_transito({arestas[0]: 2.0}) == []
+    assert cidade.versao_pesos('time') == versao + 1
+    assert np.array_equal(pesos.valores('dist'), pesos.base['dist'])
+
+    fatores = {arestas[2]: 3.0, arestas[5]: 1.5}
+    assert sorted(cidade.aplicar_transito(fatores)) == sorted([arestas[0], *fatores])
+    esperado = pesos.base['time'].copy()
+    for (u, v), f in fatores.items():
+        esperado[pesos.id_aresta(u, v)] *= f
+    assert np.allclose(pesos.valores('time'), esperado)
+    assert np.allclose(pesos.listas['time'], esperado)
+    assert pesos.fatores() == fatores
+
+
+def test_oraculo_esquece_os_tempos_antigos_quando_ha_transito(grelha):
+    cidade = grelha(4, 1)
+    pesos = cidade.pesos_arestas()
+    caminho = cidade.rotas.caminho(0, 15, 'time')
+    tempo = cidade.rotas.tempo(0, 15)
+    distancia = cidade.rotas.distancia(0, 15)
+
+    cidade.aplicar_transito({(u, v): 4.0 for u, v in zip(caminho, caminho[1:])})
+    distancias, _ = dijkstra(pesos, 0, 'time')
+    assert cidade.rotas.tempo(0, 15) == pytest.approx(distancias[pesos.indice[15]])
+    assert cidade.rotas.tempo(0, 15) > tempo
+    assert cidade.rotas.distancia(0, 15) == distancia
+
+
+def test_ritmo_minimo_segue_a_sobreposicao(grelha):
+    cidade = grelha(4, 1)
+    pesos = cidade.pesos_arestas()
+    ritmo = pesos.ritmo_minimo()
+    pesos.sobrepor({a: 2.0 for a in pesos.pares()}, 'dist')
+    assert pesos.ritmo_minimo() == pytest.approx(ritmo / 2)
+    pesos.sobrepor({}, 'dist')
+    assert pesos.ritmo_minimo() == pytest.approx(ritmo)
+
+
+def test_engarrafadas_incrementais_iguais_a_varrer_tudo(grelha):
+    cidade = grelha(5, 2)
+    arestas = list(cidade.pesos_arestas().pares())
+    rng = random.Random(0)
+    fatores = {}
+    for _ in range(500):
+        aresta = rng.choice(arestas)
+        if rng.random() < 0.3:
+            fatores.pop(aresta, None)
+        else:
+            fatores[aresta] = rng.choice([1.0, 1.2, LIMIAR_ENGARRAFAMENTO, 2.0, 3.5])
+        antes = cidade.get_arestas_engarrafadas()
+        alteradas = cidade.aplicar_transito(fatores)
+
+        varrimento = {a for a in arestas if fatores.get(a, 1.0) > LIMIAR_ENGARRAFAMENTO}
+        assert cidade.get_arestas_engarrafadas() == varrimento
+        if not alteradas: assert cidade.get_arestas_engarrafadas() is antes
+
+
+def test_aresta_nova_reconstroi_o_csr_com_o_mesmo_transito(grelha):
+    cidade = grelha(4, 1)
+    pesos = cidade.pesos_arestas()
+    engarrafada = pesos.aresta(3)
+    cidade.aplicar_transito({engarrafada: 2.0})
+    tempo = pesos.listas['time'][3]
+
+    cidade.add_edge(0, 15, 0.5, 0.5)
+    novos = cidade.pesos_arestas()
+    assert novos is not pesos and len(novos) == len(pesos) + 1
+    assert novos.versao_base == pesos.versao_base + 1
+    assert novos.vizinhos(0)[-1] == 15 and novos.listas['dist'][novos.id_aresta(0, 15)] == 0.5
+    assert novos.fatores() == {engarrafada: 2.0}
+    assert novos.listas['time'][novos.id_aresta(*engarrafada)] == pytest.approx(tempo)
+    assert cidade.get_arestas_engarrafadas() == {engarrafada}
@@ -0,0 +1,81 @@
+import pickle
+import time
+
+import pytest
+
+import algoritmos
+from planeador import PlaneadorProcessos
+from problema import Estado, MODO_MICRO, MODO_MACRO
+from benchmark import gerar_cenario
+
+
+def _pesos_no_processo(estado, cidade, funcao_heuristica, parar=None):
+    """'Planeador' de teste: devolve o que o processo vê da cidade."""
+    pesos = cidade.pesos_arestas()
+    return len(pesos), pesos.fatores('dist'), pesos.fatores('time')
+
+
+def _ignorar_paragem(estado, cidade, funcao_heuristica, parar=None):
+    time.sleep(60)
+
+
+@pytest.fixture
+def planeador(grelha):
+    planeador = PlaneadorProcessos(grelha(4, 3))
+    yield planeador
+    planeador.encerrar()
+
+
+def consultar(planeador):
+    tarefa = planeador.submeter(_pesos_no_processo, Estado([], []))
+    assert tarefa.esperar(10)
+    return tarefa.resultado
+
+
+def test_processo_ve_a_sobreposicao_de_todos_os_pesos(planeador):
+    cidade = planeador.cidade
+    pesos = cidade.pesos_arestas()
+    a, b = pesos.aresta(0), pesos.aresta(1)
+    pesos.sobrepor({a: 2.0}, 'dist')
+    cidade.aplicar_transito({b: 3.0})
+    assert consultar(planeador) == (len(pesos), {a: 2.0}, {b: 3.0})
+
+    cidade.aplicar_transito({})
+    assert consultar(planeador) == (len(pesos), {a: 2.0}, {})
+
+
+def test_processos_substituidos_quando_a_rede_muda(planeador):
+    cidade = planeador.cidade
+    arestas = len(cidade.pesos_arestas())
+    cidade.add_edge(0, 15, 0.1, 0.1)
+    assert consultar(planeador)[0] == arestas + 1
+
+
+def test_cancelar_nao_espera_pelo_processo(planeador):
+    presa = planeador.submeter(_ignorar_paragem, Estado([], []))
+    assert not presa.esperar(0.2)
+    t0 = time.time()
+    presa.cancelar()
+    assert time.time() - t0 < 0.1
+
+    # A recolha seguinte substitui o processo que não respeitou o token
+    assert consultar(planeador)
+    assert presa.terminada and presa.resultado is None
+    assert planeador.cancelamentos_forcados == 1
+
+
+def test_cancelamento_cooperativo(planeador):
+    estado = gerar_cenario(planeador.cidade, Estado, 3, 4, 0)
+    tarefa = planeador.submeter(algoritmos.bfs, estado, modo=MODO_MICRO)
+    assert not tarefa.esperar(0.2)
+    tarefa.cancelar()
+    assert tarefa.esperar(planeador.TOLERANCIA_CANCELAMENTO)
+    assert planeador.cancelamentos_forcados == 0
+
+
+def test_estado_serializado_sem_a_cadeia_de_pais(cidade_grelha):
+    estado = gerar_cenario(cidade_grelha, Estado, 2, 2, 0)
+    filho = estado.gera_sucessores(cidade_grelha, MODO_MACRO)[0]
+    copia = pickle.loads(pickle.dumps(filho))
+    assert copia == filho and copia.pai is None
+    assert (copia.custo_acumulado, copia.tempo_atual) == (filho.custo_acumulado, filho.tempo_atual)
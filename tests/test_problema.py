@@ -0,0 +1,114 @@
+import random
+
+import pytest
+
+from modelos import Pedido, Veiculo
+from problema import Estado, MODO_MICRO, MODO_MACRO
+
+
+def cenario(cidade, seed, num_veiculos=2, num_pedidos=2):
+    """Frota mista em ruas ao acaso; o primeiro veículo já com autonomia para ir recarregar."""
+    rng = random.Random(seed)
+    livres = sorted(n for n, dados in cidade.nodes.items() if dados['type'] == 'rua')
+    frota = []
+    for i in range(1, num_veiculos + 1):
+        tipo = "eletrico" if i % 2 else "combustao"
+        frota.append(Veiculo(i, tipo, rng.choice(livres), 200 if tipo == "eletrico" else 600, 4))
+    frota[0].autonomia_atual = 100
+    pedidos = [Pedido(100 + j, *rng.sample(livres, 2), 1, 10_000) for j in range(num_pedidos)]
+    return Estado(frota, pedidos)
+
+
+def veiculo_da_acao(estado, acao):
+    """Índice do veículo que executou 'acao' ("[id] ...")."""
+    id_veiculo = int(acao[1:acao.index(']')])
+    return next(i for i, v in enumerate(estado.veiculos) if v.id == id_veiculo)
+
+
+def resumo(veiculo):
+    return veiculo.local, veiculo.ocupado, [p.id for p in veiculo.passageiros_a_bordo]
+
+
+def em_micro(estado, cidade, i, caminho, operacao):
+    """Percorre 'caminho' com o veículo i passo a passo e executa a 'operacao' no fim."""
+    for destino in caminho[1:]:
+        estado = next(f for f in estado.gera_sucessores(cidade, MODO_MICRO) if f.veiculos[i].local == destino)
+    prefixo = f"[{estado.veiculos[i].id}] {operacao}"
+    return next(f for f in estado.gera_sucessores(cidade, MODO_MICRO) if f.acao_geradora.startswith(prefixo))
+
+
+@pytest.mark.parametrize('seed', range(4))
+def test_acoes_macro_custam_o_mesmo_que_os_passos_micro(cidade_grelha, seed):
+    inicial = cenario(cidade_grelha, seed)
+    for estado in [inicial] + inicial.gera_sucessores(cidade_grelha, MODO_MACRO):
+        for macro in estado.gera_sucessores(cidade_grelha, MODO_MACRO):
+            i = veiculo_da_acao(estado, macro.acao_geradora)
+            caminho = cidade_grelha.rotas.caminho(estado.veiculos[i].local, macro.veiculos[i].local)
+            micro = em_micro(estado, cidade_grelha, i, caminho, macro.acao_geradora.split()[1])
+
+            assert micro.custo_acumulado == pytest.approx(macro.custo_acumulado, abs=1e-9)
+            assert micro.tempo_atual == pytest.approx(macro.tempo_atual, abs=1e-9)
+            assert micro.total_dinheiro == pytest.approx(macro.total_dinheiro, abs=1e-9)
+            assert micro.total_co2 == pytest.approx(macro.total_co2, abs=1e-9)
+            assert micro.veiculos[i].autonomia_atual == pytest.approx(macro.veiculos[i].autonomia_atual, abs=1e-9)
+            assert resumo(micro.veiculos[i]) == resumo(macro.veiculos[i])
+            assert [p.id for p in micro.pedidos_pendentes] == [p.id for p in macro.pedidos_pendentes]
+
+
+@pytest.mark.parametrize('seed', range(4))
+def test_recarga_macro_vai_ao_posto_mais_perto_na_rede(cidade_grelha, seed):
+    estado = cenario(cidade_grelha, seed)
+    recargas = [f for f in estado.gera_sucessores(cidade_grelha, MODO_MACRO) if "Recarregou" in f.acao_geradora]
+    assert len(recargas) == 1
+
+    local = estado.veiculos[0].local
+    postos = [n for n, dados in cidade_grelha.nodes.items() if dados['type'] == 'recarga']
+    mais_perto = min(cidade_grelha.rotas.distancia(local, p) for p in postos)
+    posto = recargas[0].veiculos[0].local
+    assert cidade_grelha.rotas.distancia(local, posto) == pytest.approx(mais_perto, abs=1e-9)
+
+
+def test_sucessores_partilham_o_que_a_acao_nao_alterou(cidade_grelha):
+    estado = cenario(cidade_grelha, 0, num_veiculos=3)
+    for modo in (MODO_MICRO, MODO_MACRO):
+        for filho in estado.gera_sucessores(cidade_grelha, modo):
+            alterados = [i for i, v in enumerate(filho.veiculos) if v is not estado.veiculos[i]]
+            assert len(alterados) == 1
+            assert "Recolheu" in filho.acao_geradora or filho.pedidos_pendentes is estado.pedidos_pendentes
+    # O estado do pai não é tocado pelos filhos
+    assert estado == cenario(cidade_grelha, 0, num_veiculos=3)
+
+
+def descendentes(estado, cidade, profundidade):
+    nivel = [estado]
+    for _ in range(profundidade):
+        nivel = [filho for e in nivel for modo in (MODO_MICRO, MODO_MACRO) for filho in e.gera_sucessores(cidade, modo)]
+        yield from nivel
+
+
+def test_hash_incremental_igual_ao_calculado_de_raiz(cidade_grelha):
+    for estado in descendentes(cenario(cidade_grelha, 1), cidade_grelha, 2):
+        assert estado._hash == estado._hash_completo()
+        assert hash(estado) == hash(Estado(estado.veiculos, estado.pedidos_pendentes))
+
+
+def test_estados_iguais_por_caminhos_diferentes(cidade_grelha):
+    estado = cenario(cidade_grelha, 2)
+    movimentos = {}
+    for filho in estado.gera_sucessores(cidade_grelha, MODO_MICRO):
+        for neto in filho.gera_sucessores(cidade_grelha, MODO_MICRO):
+            if all(v.local != v0.local for v, v0 in zip(neto.veiculos, estado.veiculos)):
+                movimentos.setdefault(tuple(v.local for v in neto.veiculos), []).append(neto)
+    repetidos = [netos for netos in movimentos.values() if len(netos) > 1]
+    assert repetidos
+    for a, b in repetidos:
+        assert a is not b and a == b and hash(a) == hash(b)
+        assert len({a, b}) == 1
+
+
+def test_colisao_de_hash_nao_torna_estados_iguais(cidade_grelha):
+    estado = cenario(cidade_grelha, 3)
+    a, b = estado.gera_sucessores(cidade_grelha, MODO_MICRO)[:2]
+    b._hash = a._hash
+    assert a != b
+    assert len({a, b}) == 2
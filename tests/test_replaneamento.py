@@ -0,0 +1,65 @@
+import random
+
+import pytest
+
+from replaneamento import DStarLite, ReparadorRotas
+from rotas import dijkstra
+
+
+def custo_dijkstra(cidade, origem, destino, peso):
+    pesos = cidade.pesos_arestas()
+    distancias, _ = dijkstra(pesos, origem, peso)
+    return float(distancias[pesos.indice[destino]])
+
+
+@pytest.mark.parametrize('peso', ['dist', 'time'])
+def test_d_star_lite_reparado_igual_a_dijkstra(grelha, peso):
+    cidade = grelha(6, 3)
+    rng = random.Random(0)
+    arestas = list(cidade.pesos_arestas().pares())
+    origem, destino = 0, 35
+    arvore = DStarLite(cidade.pesos_arestas(), origem, destino, peso,
+                       cidade.landmarks.limite_inferior if peso == 'dist' else None)
+    arvore.calcular()
+    assert arvore.custo() == pytest.approx(custo_dijkstra(cidade, origem, destino, peso))
+
+    for _ in range(10):
+        # O veículo avança um passo e há trânsito novo em 'time' (ou obras em 'dist')
+        caminho = arvore.caminho()
+        if len(caminho) > 1: arvore.mover_origem(caminho[1])
+        fatores = {a: rng.uniform(1.0, 4.0) for a in rng.sample(arestas, 15)}
+        arvore.atualizar_arestas(cidade.pesos_arestas().sobrepor(fatores, peso))
+        arvore.calcular()
+
+        assert arvore.custo() == pytest.approx(custo_dijkstra(cidade, arvore.origem, destino, peso))
+        caminho = arvore.caminho()
+        assert (caminho[0], caminho[-1]) == (arvore.origem, destino)
+
+
+def test_reparador_reaproveita_a_arvore_da_perna_e_repara_o_tempo_do_passo(grelha):
+    cidade = grelha(6, 3)
+    reparador = ReparadorRotas(cidade)
+    perna = cidade.rotas.caminho(0, 35)
+    pesos = cidade.pesos_arestas()
+    tempos = pesos.listas['time']
+    base = tempos[pesos.id_aresta(perna[-2], perna[-1])]
+
+    arvore = None
+    for origem, destino in zip(perna, perna[1:]):
+        tempo = reparador.seguir(1, origem, destino, perna[-1])
+        assert arvore is None or reparador.arvores[1] is arvore
+        arvore = reparador.arvores[1]
+        assert tempo == pytest.approx(tempos[pesos.id_aresta(origem, destino)])
+
+    # Trânsito no passo em curso: o novo tempo é devolvido sem replanear de raiz
+    origem, destino = perna[-2], perna[-1]
+    alteradas = cidade.aplicar_transito({(origem, destino): 3.0})
+    novos = reparador.atualizar(alteradas)
+    assert reparador.arvores[1] is arvore
+    assert novos == {1: pytest.approx(3.0 * base)}
+
+    # Outra perna começa uma árvore nova
+    reparador.seguir(1, destino, perna[-2], 0)
+    assert reparador.arvores[1] is not arvore
+    reparador.largar(1)
+    assert not reparador.arvores and not reparador.passos
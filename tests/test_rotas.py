@@ -0,0 +1,46 @@
+import heapq
+
+import pytest
+
+
+def dijkstra_referencia(cidade, origem):
+    """Distâncias de 'origem' por um Dijkstra simples sobre get_neighbors / get_distance."""
+    distancias = {origem: 0.0}
+    heap = [(0.0, origem)]
+    while heap:
+        d, u = heapq.heappop(heap)
+        if d > distancias[u]: continue
+        for v in cidade.get_neighbors(u):
+            nd = d + cidade.get_distance(u, v)
+            if nd < distancias.get(v, float('inf')):
+                distancias[v] = nd
+                heapq.heappush(heap, (nd, v))
+    return distancias
+
+
+def test_oraculo_responde_como_dijkstra(cidade_grelha):
+    rotas = cidade_grelha.rotas
+    nos = sorted(cidade_grelha.nodes)
+    for origem in nos[::7]:
+        referencia = dijkstra_referencia(cidade_grelha, origem)
+        for destino in nos:
+            assert rotas.distancia(origem, destino) == pytest.approx(referencia[destino], abs=1e-9)
+            caminho, km, _ = rotas.rota(origem, destino)
+            assert (caminho[0], caminho[-1]) == (origem, destino)
+            assert km == pytest.approx(referencia[destino], abs=1e-9)
+
+
+def test_oraculo_reutiliza_arvores_e_esquece_as_antigas_quando_o_grafo_muda(grelha):
+    cidade = grelha(4, 2)
+    rotas = cidade.rotas
+    origem, destino = 0, 15
+    tempo = rotas.tempo(origem, destino)
+    misses, hits = rotas.misses, rotas.hits
+    assert rotas.tempo(origem, destino) == tempo
+    assert rotas.caminho(origem, 5, 'time') is not None
+    assert (rotas.misses, rotas.hits) == (misses, hits + 2)
+
+    cidade.add_edge(origem, destino, 0.01, 0.01)
+    assert rotas.tempo(origem, destino) == pytest.approx(0.01)
+    assert rotas.distancia(origem, destino) == pytest.approx(0.01)
+    assert rotas.rota(origem, destino)[0] == [origem, destino]
@@ -0,0 +1,78 @@
+import random
+
+import algoritmos
+import simulador
+from modelos import Veiculo
+from problema import MODO_MACRO
+from simulador import Simulador, PLANEAMENTO_ATRIBUICAO, PLANEAMENTO_THREAD
+
+
+def cidade_com_transito(grelha, seed):
+    """Grelha com os métodos que o simulador pede ao mapa real (locais aleatórios e trânsito)."""
+    cidade = grelha(6, seed)
+    cidade.get_local_aleatorio = lambda: random.choice(cidade.locais_livres)
+
+    def simular_transito_dinamico():
+        pesos = cidade.pesos_arestas()
+        return cidade.aplicar_transito({pesos.aresta(i): 3.0 for i in random.sample(range(len(pesos)), 10)})
+    cidade.simular_transito_dinamico = simular_transito_dinamico
+    return cidade
+
+
+def simular_eventos(cidade, seed, minutos=240, **kwargs):
+    random.seed(seed)
+    frota = [Veiculo(i, "eletrico" if i % 2 else "combustao", cidade.locais_livres[3 * i], 200, 4) for i in range(4)]
+    kwargs.setdefault('planeamento', PLANEAMENTO_ATRIBUICAO)
+    sim = Simulador(cidade, frota, **kwargs)
+    historico = sim.executar_simulacao_eventos(minutos, probabilidade_pedido=0.1)
+    return sim, [(e.tempo_atual, [(v.local, v.autonomia_atual, v.ocupado) for v in e.veiculos],
+                  [p.id for p in e.pedidos_pendentes], e.total_dinheiro) for e in historico]
+
+
+def test_modo_eventos_e_deterministico(grelha, monkeypatch):
+    monkeypatch.setattr(simulador, 'PROBABILIDADE_TRANSITO', 0.2)
+    sim_a, frames_a = simular_eventos(cidade_com_transito(grelha, 4), seed=7)
+    sim_b, frames_b = simular_eventos(cidade_com_transito(grelha, 4), seed=7)
+
+    assert frames_a == frames_b
+    assert sim_a.pedidos_concluidos and sim_a.reparador.eventos
+    assert [p.id for p in sim_a.pedidos_concluidos] == [p.id for p in sim_b.pedidos_concluidos]
+    assert sim_a.tempo_atual == 240
+    # Só há frames nos minutos com eventos, por ordem
+    tempos = [t for t, *_ in frames_a]
+    assert tempos == sorted(tempos) and len(set(tempos)) < 240
+
+
+def test_modo_eventos_da_um_orcamento_a_cada_planeamento(grelha, monkeypatch):
+    orcamentos = []
+    monkeypatch.setattr(Simulador, '_atribuir_tarefas_com_ia', lambda self, tempo_limite: orcamentos.append(tempo_limite))
+    simular_eventos(cidade_com_transito(grelha, 4), seed=1, minutos=60)
+    assert orcamentos and set(orcamentos) == {simulador.ORCAMENTO_EVENTOS}
+
+    orcamentos.clear()
+    simular_eventos(cidade_com_transito(grelha, 4), seed=1, minutos=60, orcamento_planeamento=0.5)
+    assert orcamentos and set(orcamentos) == {0.5}
+
+
+def test_estatisticas_do_planeador_por_minuto(grelha):
+    sim, _ = simular_eventos(cidade_com_transito(grelha, 4), seed=2, minutos=90, planeamento=PLANEAMENTO_THREAD,
+                             algoritmo_escolhido=algoritmos.greedy, modo_sucessores=MODO_MACRO,
+                             orcamento_planeamento=1.0, recolher_estatisticas=True)
+    minutos = [m for m, _ in sim.estatisticas_planeamento]
+    assert minutos and minutos == sorted(set(minutos))
+    for _, est in sim.estatisticas_planeamento:
+        assert est['pesquisas'] >= 1 and est['expansoes'] >= 0 and 'tempo' in est
+    assert sim.tempo_cpu_total > 0
+
+
+def test_pesquisa_atrasada_conta_no_minuto_em_que_comecou(grelha):
+    sim = Simulador(grelha(4, 1), [], recolher_estatisticas=True)
+    for minuto, expansoes in ((3, 10), (9, 5), (5, 7), (9, 1), (1, 2)):
+        sim._registar_estatisticas(minuto, {'expansoes': expansoes, 'pico_nos': expansoes})
+    assert sim.estatisticas_planeamento == [
+        (1, {'expansoes': 2, 'pico_nos': 2, 'pesquisas': 1}),
+        (3, {'expansoes': 10, 'pico_nos': 10, 'pesquisas': 1}),
+        (5, {'expansoes': 7, 'pico_nos': 7, 'pesquisas': 1}),
+        (9, {'expansoes': 6, 'pico_nos': 5, 'pesquisas': 2}),
+    ]
+    assert sim.pico_nos_planeamento == 10
@@ -0,0 +1,66 @@
+import matplotlib
+
+matplotlib.use('Agg')
+
+import matplotlib.pyplot as plt
+import numpy as np
+import pytest
+
+import main
+from modelos import Pedido, Veiculo
+from problema import Estado
+
+
+@pytest.fixture(autouse=True)
+def fechar_figuras():
+    yield
+    plt.close('all')
+
+
+def frames(cidade, num_frames=5):
+    """Estados com a frota a andar pelas ruas livres e o minuto a saltar, como no modo de eventos."""
+    livres = cidade.locais_livres
+    frota = [Veiculo(i, "eletrico" if i % 2 else "combustao", livres[i], 200, 4) for i in range(3)]
+    estados = []
+    for k in range(num_frames):
+        for i, v in enumerate(frota): v.local = livres[(i + 2 * k) % len(livres)]
+        pedidos = [Pedido(100 + k, livres[k], livres[-1 - k], 1, 500, prefere_eletrico=k % 2 == 0)]
+        estados.append(Estado(frota, pedidos, tempo_atual=7 * k))
+    return estados
+
+
+def test_cada_frame_atualiza_os_mesmos_artistas(cidade_grelha):
+    estados = frames(cidade_grelha)
+    vis = main.VisualizadorInterativo(cidade_grelha, estados, "A*")
+    artistas = list(vis.animados)
+    vis.fig.canvas.draw()
+    assert vis._fundo is not None
+
+    for k, estado in enumerate(estados):
+        vis.update(k)
+        vis._blit()
+        assert vis.animados == artistas
+        esperado = cidade_grelha.coords[cidade_grelha.indices([v.local for v in estado.veiculos])]
+        assert np.array_equal(vis.taxis_scatter.get_offsets(), esperado)
+        # O título mostra o minuto gravado no snapshot, não o nº do frame
+        assert f"Sim: {7 * k}m" in vis.titulo_obj.get_text()
+        assert f"Frame {k + 1}/{len(estados)}" in vis.titulo_obj.get_text()
+
+
+def test_fundo_em_cache_nao_depende_dos_pois(grelha, tmp_path):
+    cidade = grelha(5, 1)
+    cidade.pasta_mapa = str(tmp_path)
+    estados = frames(cidade, 2)
+    main.VisualizadorInterativo(cidade, estados, "A*")
+    pngs = list(tmp_path.glob("fundo_*.png"))
+    assert len(pngs) == 1
+    modificado = pngs[0].stat().st_mtime_ns
+
+    # Novo sorteio dos postos: o fundo (só as ruas) continua a servir
+    cidade.carregadores, cidade.bombas = cidade.bombas, cidade.carregadores
+    imagem, _ = main.carregar_fundo(cidade)
+    vis = main.VisualizadorInterativo(cidade, estados, "A*")
+    assert sorted(t.get_text() for t in vis.ax.texts if t.get_text() in ('G', 'B', 'C')) == ['B'] * 4 + ['C'] * 4 + ['G']
+    assert list(tmp_path.glob("fundo_*.png")) == pngs
+    assert pngs[0].stat().st_mtime_ns == modificado
+    assert np.array_equal(imagem, main.rasterizar_fundo(cidade)[0])